@@ -0,0 +1,128 @@
+"""
+Benchmark single-pass feature extraction against the original multi-pass one.
+
+The multi-pass reference runs `ASTAnalyzer`, a second `ast.walk` to count
+statements and hashes the structure string built by `ast_structure` for
+every function, like `CodeAnalyzer` did before. Both paths must produce
+identical `FunctionMetrics`; the script exits with an error if they do not.
+
+Usage:
+    python benchmarks/bench_analyzer.py [DIRECTORY ...] [--repeat N]
+"""
+
+import argparse
+import ast
+import hashlib
+import os
+import sys
+import sysconfig
+import time
+
+from deepcsim.core.analyzer import ASTAnalyzer, CodeAnalyzer
+from deepcsim.core.metrics import FunctionMetrics
+
+
+def ast_structure(node: ast.AST) -> str:
+    """Structure string of a subtree: node classes and fields, without names."""
+    if isinstance(node, ast.AST):
+        fields = []
+        for field, value in ast.iter_fields(node):
+            if field in ('name', 'id', 'arg', 's', 'n'):
+                continue
+            if isinstance(value, list):
+                fields.append(f"{field}:[{','.join(ast_structure(item) for item in value)}]")
+            else:
+                fields.append(f"{field}:{ast_structure(value)}")
+        return f"{node.__class__.__name__}({','.join(fields)})"
+    return ""
+
+
+def multi_pass_analyze(source: str, filename: str):
+    """Reference implementation: one ASTAnalyzer visit, walk and structure pass per function."""
+    functions = {}
+    tree = ast.parse(source, filename=filename)
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            visitor = ASTAnalyzer()
+            visitor.visit(node)
+            structure = ast_structure(node)
+            functions[node.name] = FunctionMetrics(
+                name=node.name,
+                source=ast.get_source_segment(source, node) or "",
+                line_start=node.lineno,
+                line_end=node.end_lineno or node.lineno,
+                num_statements=len([n for n in ast.walk(node) if isinstance(n, ast.stmt)]) - 1,
+                num_args=len(node.args.args),
+                cyclomatic_complexity=visitor.complexity,
+                nesting_depth=visitor.max_depth,
+                node_types=dict(visitor.node_counts),
+                called_functions=visitor.function_calls,
+                variables_used=visitor.variables,
+                ast_hash=hashlib.md5(structure.encode()).hexdigest(),
+            )
+    return functions
+
+
+def single_pass_analyze(source: str, filename: str):
+    analyzer = CodeAnalyzer(source, filename)
+    analyzer.analyze()
+    return analyzer.functions
+
+
+def load_sources(directories):
+    sources = []
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for file in sorted(files):
+                if not file.endswith(".py"):
+                    continue
+                path = os.path.join(root, file)
+                with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                    source = f.read()
+                try:
+                    ast.parse(source)
+                except (SyntaxError, ValueError):
+                    continue
+                sources.append((path, source))
+    return sources
+
+
+def best_time(func, sources, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path, source in sources:
+            func(source, path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directories", nargs="*",
+                        default=[sysconfig.get_paths()["stdlib"] + "/email"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sources = load_sources(args.directories)
+    for path, source in sources:
+        if multi_pass_analyze(source, path) != single_pass_analyze(source, path):
+            sys.exit(f"Metrics differ for {path}")
+
+    total_bytes = sum(len(source) for _, source in sources)
+    multi = best_time(multi_pass_analyze, sources, args.repeat)
+    single = best_time(single_pass_analyze, sources, args.repeat)
+
+    # Largest files dominate, and are where nested functions cost the most
+    largest = sorted(sources, key=lambda item: len(item[1]), reverse=True)[:10]
+    multi_large = best_time(multi_pass_analyze, largest, args.repeat)
+    single_large = best_time(single_pass_analyze, largest, args.repeat)
+
+    print(f"{len(sources)} files, {total_bytes / 1e6:.1f} MB, identical metrics")
+    print(f"multi-pass:  {multi:.3f}s  ({total_bytes / multi / 1e6:.2f} MB/s)")
+    print(f"single-pass: {single:.3f}s  ({total_bytes / single / 1e6:.2f} MB/s)")
+    print(f"speedup:     {multi / single:.2f}x (10 largest files: {multi_large / single_large:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
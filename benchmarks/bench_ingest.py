@@ -0,0 +1,94 @@
+"""
+Measure how much the ingestion pipeline overlaps I/O with parsing.
+
+Ingests (walks, reads and analyzes, without scoring) a generated corpus
+with files read serially (`readers=1`, the behaviour before the pipeline)
+and by a thread pool, on a cold page cache:
+before every run the corpus is evicted from the cache with
+`posix_fadvise(DONTNEED)`. On local disks eviction may be cheap to undo;
+`--latency` adds a fixed delay to every read to mimic a network
+filesystem.
+
+Usage:
+    python benchmarks/bench_ingest.py [--files N] [--readers N ...] [--jobs N]
+        [--latency MS] [--repeat N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from deepcsim.bench.corpus import generate_sources, write_corpus
+from deepcsim.core import pipeline
+from deepcsim.core.scanner import _analyze_directory
+
+
+def evict(directory):
+    """Drop the files of a directory from the page cache, where supported."""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for root, _, files in os.walk(directory):
+        for file in files:
+            fd = os.open(os.path.join(root, file), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+
+def slow_reads(latency):
+    """Make every file read take at least `latency` seconds longer."""
+    read = pipeline._read_source
+
+    def delayed(path):
+        time.sleep(latency)
+        return read(path)
+    pipeline._read_source = delayed
+
+
+def timed_ingest(directory, readers, jobs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        evict(directory)
+        start = time.perf_counter()
+        reports = _analyze_directory(directory, workers=jobs, readers=readers)
+        best = min(best, time.perf_counter() - start)
+    return best, {path: report["file_hash"] for path, report in reports.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--functions-per-file", type=int, default=10)
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Extra milliseconds per read")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.latency:
+        slow_reads(args.latency / 1000)
+    sources, stats = generate_sources(args.files, args.functions_per_file)
+    with tempfile.TemporaryDirectory(prefix="deepcsim-ingest-") as directory:
+        write_corpus(directory, sources)
+        print(f"{stats['files']} files, {stats['bytes'] / 1e6:.1f} MB, jobs={args.jobs}, "
+              f"latency={args.latency:g} ms, page cache eviction: "
+              f"{'yes' if evict(directory) else 'unsupported'}")
+
+        baseline = reference = None
+        for readers in args.readers:
+            seconds, result = timed_ingest(directory, readers, args.jobs, args.repeat)
+            if reference is None:
+                baseline, reference = seconds, result
+            elif result != reference:
+                raise SystemExit(f"Results differ with readers={readers}")
+            print(f"readers={readers:<3} {seconds:7.3f}s  {stats['files'] / seconds:8.1f} files/s  "
+                  f"{baseline / seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
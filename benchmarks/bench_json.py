@@ -0,0 +1,117 @@
+"""
+Benchmark JSON serialization paths for API responses.
+
+Serializes the result of scanning a directory (and an /api/analyze-style
+payload) with the previous paths (pydantic validation round-trip, stdlib
+json with indent=4) and with `dumps_json` on every available backend,
+then compresses the compact payload with gzip and brotli. Every backend
+must decode to the same value; the script exits with an error otherwise.
+
+Usage:
+    python benchmarks/bench_json.py [DIRECTORY] [--threshold T] [--repeat N]
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import sysconfig
+import time
+
+from deepcsim.api import responses
+from deepcsim.api.schemas import AnalyzeResponse
+from deepcsim.core.comparator import compare_source
+from deepcsim.core.scanner import scan_directory
+
+
+def best_time(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def backend_dumps(name):
+    """Return dumps_json restricted to one backend."""
+    saved = responses.orjson
+
+    def dumps(content):
+        if name == "json":
+            responses.orjson = None
+        try:
+            return responses.dumps_json(content)
+        finally:
+            responses.orjson = saved
+    return dumps
+
+
+def report(label, seconds, size):
+    print(f"  {label:<28} {seconds * 1000:9.1f} ms  {size / 1e6:9.2f} MB")
+
+
+def bench_payload(title, payload, repeat, pydantic_model=None):
+    print(title)
+    reference = json.loads(json.dumps(payload))
+
+    if pydantic_model is not None:
+        seconds, body = best_time(
+            lambda: json.dumps(pydantic_model.model_validate(payload).model_dump()).encode(), repeat)
+        report("pydantic round-trip + json", seconds, len(body))
+
+    seconds, body = best_time(lambda: responses.dumps_json(payload, pretty=True), repeat)
+    report("json indent=4 (previous)", seconds, len(body))
+
+    backends = ["json"] + (["orjson"] if responses.orjson else [])
+    compact = None
+    for name in backends:
+        dumps = backend_dumps(name)
+        seconds, body = best_time(lambda: dumps(payload), repeat)
+        if json.loads(body) != reference:
+            sys.exit(f"{name} output differs")
+        report(f"dumps_json ({name})", seconds, len(body))
+        compact = body
+
+    seconds, body = best_time(lambda: gzip.compress(compact, compresslevel=responses.GZIP_LEVEL), repeat)
+    report(f"+ gzip level {responses.GZIP_LEVEL}", seconds, len(body))
+    if responses.brotli is not None:
+        seconds, body = best_time(
+            lambda: responses.brotli.compress(compact, quality=responses.BROTLI_QUALITY), repeat)
+        report(f"+ brotli quality {responses.BROTLI_QUALITY}", seconds, len(body))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directory", nargs="?", default=sysconfig.get_paths()["stdlib"] + "/json")
+    parser.add_argument("--threshold", type=float, default=50.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"JSON backend: {responses.JSON_BACKEND}")
+    scan = scan_directory(args.directory, args.threshold)
+    bench_payload(f"scan_directory ({scan['count']} pairs)", scan, args.repeat)
+    compact = scan_directory(args.directory, args.threshold, compact=True)
+    bench_payload("scan_directory, compact", compact, args.repeat)
+
+    # /api/analyze payload for the two largest files of the scan
+    if scan["results"]:
+        entry = max(scan["results"], key=lambda item: len(item["comparisons"]))
+        with open(entry["file1"], encoding="utf-8") as f1, open(entry["file2"], encoding="utf-8") as f2:
+            result = compare_source(f1.read(), f2.read(), entry["file1"], entry["file2"])["results"][0]
+        payload = {
+            "file1_name": result["file1"],
+            "file2_name": result["file2"],
+            "file1_functions": result["file1_functions"],
+            "file2_functions": result["file2_functions"],
+            "comparisons": result["comparisons"],
+            "avg_similarity": result["avg_similarity"],
+            "high_similarity_count": result["high_similarity_count"],
+        }
+        bench_payload(f"/api/analyze ({len(payload['comparisons'])} comparisons)",
+                      payload, args.repeat, AnalyzeResponse)
+
+
+if __name__ == "__main__":
+    main()
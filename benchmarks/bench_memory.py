@@ -0,0 +1,130 @@
+"""
+Measure the memory held by analyzed functions.
+
+Compares the compact `FunctionMetrics` (with in-memory and with lazily read
+sources) against the previous representation: a dataclass holding the
+source string, a dict of node type counts and two sets of names. Memory is
+the growth reported by `tracemalloc` while the analyses are alive.
+
+Usage:
+    python benchmarks/bench_memory.py [DIRECTORY ...]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import sysconfig
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Dict, Set
+
+from deepcsim.core.analyzer import CodeAnalyzer
+
+
+@dataclass
+class LegacyFunctionMetrics:
+    """The representation FunctionMetrics used before it was made compact."""
+
+    name: str
+    source: str
+    line_start: int
+    line_end: int
+    num_statements: int = 0
+    num_args: int = 0
+    cyclomatic_complexity: int = 1
+    nesting_depth: int = 0
+    node_types: Dict[str, int] = field(default_factory=dict)
+    called_functions: Set[str] = field(default_factory=set)
+    variables_used: Set[str] = field(default_factory=set)
+    ast_hash: str = ""
+
+
+def load_sources(directories):
+    sources = []
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for file in sorted(files):
+                if file.endswith(".py"):
+                    path = os.path.join(root, file)
+                    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                        sources.append((path, f.read()))
+    return sources
+
+
+def analyze_all(sources, lazy_source=False):
+    analyses = []
+    for path, source in sources:
+        analyzer = CodeAnalyzer(source, path, lazy_source=lazy_source)
+        try:
+            analyzer.analyze()
+        except ValueError:
+            continue
+        analyses.append(analyzer.functions)
+    return analyses
+
+
+def to_legacy(analyses):
+    return [
+        {
+            name: LegacyFunctionMetrics(
+                name=m.name,
+                source=m.source,
+                line_start=m.line_start,
+                line_end=m.line_end,
+                num_statements=m.num_statements,
+                num_args=m.num_args,
+                cyclomatic_complexity=m.cyclomatic_complexity,
+                nesting_depth=m.nesting_depth,
+                node_types=m.node_types,
+                called_functions=set(m.called_functions),
+                variables_used=set(m.variables_used),
+                ast_hash=m.ast_hash,
+            )
+            for name, m in functions.items()
+        }
+        for functions in analyses
+    ]
+
+
+def measure(build):
+    """Return (result, bytes allocated by `build` and still alive)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directories", nargs="*", default=[sysconfig.get_paths()["stdlib"]])
+    args = parser.parse_args()
+
+    sources = load_sources(args.directories)
+    # Warm up the symbol tables so that every variant is measured alike
+    reference = analyze_all(sources)
+    count = sum(len(functions) for functions in reference)
+    if not count:
+        sys.exit("No functions found")
+
+    legacy, legacy_bytes = measure(lambda: to_legacy(analyze_all(sources)))
+    del legacy
+    compact, compact_bytes = measure(lambda: analyze_all(sources))
+    del compact
+    lazy, lazy_bytes = measure(lambda: analyze_all(sources, lazy_source=True))
+    del lazy
+
+    print(f"{len(sources)} files, {count} functions")
+    for label, size in (("legacy dataclass", legacy_bytes),
+                        ("compact", compact_bytes),
+                        ("compact, lazy source", lazy_bytes)):
+        print(f"{label:<22} {size / 1e6:8.1f} MB  {size / count:6.0f} B/function  "
+              f"{legacy_bytes / size:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
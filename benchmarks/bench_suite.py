@@ -0,0 +1,24 @@
+"""
+Run the benchmark suite on a synthetic corpus, like `deepcsim-cli bench`.
+
+Times `CodeAnalyzer.analyze`, `SimilarityCalculator.calculate_all`,
+`scan_directory`, `find_matches_for_file` and the HTTP endpoints, and
+reports throughput and peak memory. Save a JSON report on one commit and
+compare another commit against it:
+
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --compare before.json --max-slowdown 1.2
+
+Usage:
+    python benchmarks/bench_suite.py [--files N] [--functions-per-file N]
+        [--clone-rate R] [--mutation-rate R] [--seed S] [--repeat N]
+        [--only NAME ...] [--json] [--output FILE] [--compare BASELINE]
+"""
+
+import sys
+
+from deepcsim.cli import bench_main
+
+
+if __name__ == "__main__":
+    bench_main(sys.argv[1:])
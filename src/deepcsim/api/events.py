@@ -0,0 +1,101 @@
+"""Server-sent event streams of scan progress and results."""
+
+import json
+import time
+import queue
+import threading
+from typing import Any, AsyncIterator, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from deepcsim.core.compact import FunctionTable
+from deepcsim.core.progress import ScanCancelled, ScanProgress
+from deepcsim.core.scanner import iter_scan_directory
+
+# Seconds between two progress events
+PROGRESS_INTERVAL = 0.5
+# Results buffered between the scan and a slow client before the scan waits
+MAX_PENDING_EVENTS = 256
+
+_DONE = object()
+
+
+def format_event(event: str, data: Any) -> str:
+    """Serialize one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _produce(events: queue.Queue, directory: str, threshold: float, progress: ScanProgress,
+             table: Optional[FunctionTable]) -> None:
+    """Run a scan, putting (event, data) tuples on `events` as pairs are found."""
+    status, error = "completed", None
+    sent_functions = 0
+    try:
+        for entry in iter_scan_directory(directory, threshold, progress=progress, table=table):
+            if table is not None and len(table.rows) > sent_functions:
+                item = ("functions", table.rows[sent_functions:])
+                sent_functions = len(table.rows)
+                _put(events, item, progress)
+            _put(events, ("result", entry), progress)
+    except ScanCancelled:
+        status = "cancelled"
+    except Exception as e:
+        status, error = "failed", str(e)
+    try:
+        _put(events, ("done", {"status": status, "error": error, "count": progress.pairs_reported}), progress)
+        _put(events, _DONE, progress)
+    except ScanCancelled:
+        pass
+
+
+def _put(events: queue.Queue, item: Any, progress: ScanProgress) -> None:
+    # Block while the client is behind, giving up once the stream is gone
+    while True:
+        try:
+            events.put(item, timeout=PROGRESS_INTERVAL)
+            return
+        except queue.Full:
+            progress.check()
+
+
+async def stream_scan_events(directory: str, threshold: float, compact: bool = False) -> AsyncIterator[str]:
+    """
+    Scan a directory in a background thread and yield server-sent events.
+
+    Emits a first `progress` event, `result` events for each similar file
+    pair as soon as it is scored, `progress` events every PROGRESS_INTERVAL
+    seconds and a final `done` event. Compact streams send `functions` events with new side
+    table rows before the results referencing them. Results are not kept
+    once sent, and the scan is cancelled when the client disconnects.
+    """
+    progress = ScanProgress()
+    table = FunctionTable() if compact else None
+    events: queue.Queue = queue.Queue(maxsize=MAX_PENDING_EVENTS)
+    thread = threading.Thread(
+        target=_produce, args=(events, directory, threshold, progress, table),
+        name="deepcsim-stream", daemon=True)
+    thread.start()
+
+    last_progress = time.monotonic()
+    try:
+        # Clients see the state of the scan before its first result
+        yield format_event("progress", progress.to_dict())
+        while True:
+            try:
+                item = await run_in_threadpool(events.get, True, PROGRESS_INTERVAL)
+            except queue.Empty:
+                item = None
+
+            final = item is not None and item is not _DONE and item[0] == "done"
+            if item is None or final or time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                yield format_event("progress", progress.to_dict())
+            if item is None:
+                continue
+            if item is _DONE:
+                break
+            event, data = item
+            yield format_event(event, data)
+    finally:
+        # Stops the scan if the client went away before it finished
+        progress.cancel()
@@ -0,0 +1,130 @@
+"""Background scan jobs, run in a thread pool off the event loop."""
+
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from deepcsim.core.compact import FunctionTable
+from deepcsim.core.progress import ScanCancelled, ScanProgress
+from deepcsim.core.scanner import iter_scan_directory
+
+# Number of scans run at the same time; further jobs are queued
+MAX_RUNNING_JOBS = 2
+# Finished jobs kept around for polling before the oldest are forgotten
+MAX_FINISHED_JOBS = 32
+
+
+class ScanJob:
+    """A directory scan running in the background."""
+
+    def __init__(self, directory: str, threshold: float, compact: bool = False):
+        self.id = uuid.uuid4().hex
+        self.directory = directory
+        self.threshold = threshold
+        self.table = FunctionTable() if compact else None
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.progress = ScanProgress()
+        # Grows while the scan runs: partial results can be read at any time
+        self.results: List[Dict[str, Any]] = []
+
+    def run(self) -> None:
+        if self.progress.cancelled:
+            self.status = "cancelled"
+            self.finished = time.time()
+            return
+
+        self.status = "running"
+        try:
+            for entry in iter_scan_directory(
+                    self.directory, self.threshold, progress=self.progress, table=self.table):
+                self.results.append(entry)
+            self.status = "completed"
+        except ScanCancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished = time.time()
+
+    def cancel(self) -> None:
+        self.progress.cancel()
+        if self.status == "queued":
+            self.status = "cancelled"
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "cancelled", "failed")
+
+    def to_dict(self, offset: int = 0, limit: Optional[int] = None, function_offset: int = 0) -> Dict[str, Any]:
+        """
+        Describe the job, including results from `offset` on.
+
+        Pollers can pass the number of results (and, for compact jobs,
+        functions) they already have as `offset` (`function_offset`) to only
+        receive new ones.
+        """
+        end = len(self.results) if limit is None else offset + limit
+        # Results are read before functions, so every function they reference is listed
+        results = self.results[offset:end]
+        info = {
+            "id": self.id,
+            "directory": self.directory,
+            "threshold": self.threshold,
+            "status": self.status,
+            "cancel_requested": self.progress.cancelled,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+            "progress": self.progress.to_dict(),
+            "count": len(self.results),
+            "offset": offset,
+            "results": results,
+        }
+        if self.table is not None:
+            info["function_offset"] = function_offset
+            info["functions"] = self.table.rows[function_offset:]
+        return info
+
+
+class JobManager:
+    """Registry of scan jobs executed by a bounded thread pool."""
+
+    def __init__(self, max_running: int = MAX_RUNNING_JOBS, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix="deepcsim-job")
+        self._jobs: Dict[str, ScanJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, directory: str, threshold: float, compact: bool = False) -> ScanJob:
+        job = ScanJob(directory, threshold, compact)
+        with self._lock:
+            self._forget_finished()
+            self._jobs[job.id] = job
+        self._pool.submit(job.run)
+        return job
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[ScanJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _forget_finished(self) -> None:
+        finished = sorted(
+            (job for job in self._jobs.values() if job.done), key=lambda job: job.finished)
+        for job in finished[:max(0, len(finished) - self.max_finished + 1)]:
+            del self._jobs[job.id]
+
+    def shutdown(self) -> None:
+        """Cancel every job and stop the pool."""
+        for job in self.list():
+            job.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
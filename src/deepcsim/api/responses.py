@@ -1,16 +1,86 @@
+import gzip
 import json
 import typing
+from starlette.requests import Request
 from starlette.responses import Response
 
+# Optional fast JSON encoder (deepcsim[json])
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-class PrettyJSONResponse(Response):
-    media_type = "application/json"
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-    def render(self, content: typing.Any) -> bytes:
+JSON_BACKEND = "orjson" if orjson else "json"
+
+# Payloads smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 64 * 1024
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 4
+
+
+def dumps_json(content: typing.Any, pretty: bool = False) -> bytes:
+    """
+    Serialize `content` to UTF-8 JSON with the fastest available backend.
+
+    Compact by default; `pretty` indents like the stdlib with indent=4.
+    """
+    if pretty:
         return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=4,
-            separators=(", ", ": "),
+            content, ensure_ascii=False, allow_nan=False, indent=4, separators=(", ", ": ")
         ).encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def encode_body(body: bytes, accept_encoding: str) -> typing.Tuple[bytes, typing.Optional[str]]:
+    """Compress a large body with brotli or gzip if the client accepts it."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    encodings = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+    if brotli is not None and "br" in encodings:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if "gzip" in encodings:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response serialized by `dumps_json` and compressed when large.
+
+    Built with `json_response`, which reads the `pretty` query parameter
+    and the Accept-Encoding header of the request.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, content: typing.Any, pretty: bool = False, accept_encoding: str = "", **kwargs):
+        self.pretty = pretty
+        self.accept_encoding = accept_encoding
+        self.content_encoding: typing.Optional[str] = None
+        super().__init__(content, **kwargs)
+
+    def render(self, content: typing.Any) -> bytes:
+        body, self.content_encoding = encode_body(dumps_json(content, self.pretty), self.accept_encoding)
+        return body
+
+    def init_headers(self, headers: typing.Optional[typing.Mapping[str, str]] = None) -> None:
+        super().init_headers(headers)
+        if self.content_encoding is not None:
+            self.raw_headers.append((b"content-encoding", self.content_encoding.encode("latin-1")))
+        self.raw_headers.append((b"vary", b"Accept-Encoding"))
+
+
+def json_response(request: Request, content: typing.Any, **kwargs) -> FastJSONResponse:
+    """Return `content` as a FastJSONResponse, pretty-printed on `?pretty=1`."""
+    pretty = request.query_params.get("pretty", "").lower() in ("1", "true", "yes")
+    return FastJSONResponse(
+        content, pretty=pretty, accept_encoding=request.headers.get("accept-encoding", ""), **kwargs)
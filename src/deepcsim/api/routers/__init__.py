@@ -3,5 +3,7 @@
 from .analysis import router as analysis_router
 from .explorer import router as explorer_router
 from .files import router as files_router
+from .index import router as index_router
+from .metrics import router as metrics_router
 
-__all__ = ["analysis_router", "explorer_router", "files_router"]
+__all__ = ["analysis_router", "explorer_router", "files_router", "index_router", "metrics_router"]
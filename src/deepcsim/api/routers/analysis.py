@@ -1,23 +1,36 @@
 """Analysis router - endpoints for file comparison and analysis."""
 
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request
 
 from deepcsim.core.analyzer import CodeAnalyzer
+from deepcsim.core.compact import FunctionTable
 from deepcsim.core.similarity import SimilarityCalculator
 from deepcsim.api.schemas import AnalyzeResponse
+from deepcsim.api.responses import json_response
 
 router = APIRouter(prefix="/api", tags=["analysis"])
 
 
-@router.post("/analyze", response_model=AnalyzeResponse)
+@router.post("/analyze", response_model=AnalyzeResponse, response_model_exclude_none=True)
 async def analyze(
+    request: Request,
     file1: UploadFile = File(...),
     file2: UploadFile = File(...),
+    compact: bool = False,
+    function_threshold: Optional[float] = None,
 ):
     """
     Analyze and compare two Python files for similarity.
 
-    Returns detailed function-level comparison metrics.
+    Returns detailed function-level comparison metrics. With `compact`,
+    functions and their sources are listed once in `functions` and
+    comparisons refer to them by id; only comparisons scoring at least
+    `function_threshold` are returned.
+
+    The response is serialized directly (compact unless `?pretty=1`); the
+    response model only documents its shape.
     """
     try:
         # Read files
@@ -32,10 +45,27 @@ async def analyze(
         analyzer2.analyze()
 
         # Calculate similarities
+        similarities = SimilarityCalculator.calculate_matrix(
+            list(analyzer1.functions.values()),
+            list(analyzer2.functions.values()),
+        )
+
         comparisons = []
-        for fname1, func1 in analyzer1.functions.items():
-            for fname2, func2 in analyzer2.functions.items():
-                similarity = SimilarityCalculator.calculate_all(func1, func2)
+        composite_scores = []
+        table = FunctionTable(include_source=True) if compact else None
+        for i, (fname1, func1) in enumerate(analyzer1.functions.items()):
+            for j, (fname2, func2) in enumerate(analyzer2.functions.items()):
+                similarity = similarities[i][j]
+                composite_scores.append(similarity["composite"])
+
+                if table is not None:
+                    if function_threshold is None or similarity["composite"] >= function_threshold:
+                        comparisons.append({
+                            "func1": table.ref(file1.filename, fname1, func1, "file1"),
+                            "func2": table.ref(file2.filename, fname2, func2, "file2"),
+                            "similarity": similarity,
+                        })
+                    continue
 
                 comparisons.append(
                     {
@@ -50,19 +80,16 @@ async def analyze(
                 )
 
         # Calculate statistics
-        composite_scores = [
-            c["similarity"]["composite"] for c in comparisons
-        ]
         avg_similarity = (
             sum(composite_scores) / len(composite_scores)
             if composite_scores
-            else 0
+            else 0.0
         )
         high_similarity_count = sum(
             1 for score in composite_scores if score >= 80
         )
 
-        return {
+        result = {
             "file1_name": file1.filename,
             "file2_name": file2.filename,
             "file1_functions": len(analyzer1.functions),
@@ -71,6 +98,9 @@ async def analyze(
             "avg_similarity": avg_similarity,
             "high_similarity_count": high_similarity_count,
         }
+        if table is not None:
+            result["functions"] = table.rows
+        return json_response(request, result)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
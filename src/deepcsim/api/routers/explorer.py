@@ -1,13 +1,16 @@
 """Explorer router - endpoints for file exploration and scanning."""
 
 import os
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
-from deepcsim.core.scanner import scan_directory
+from deepcsim.api.events import stream_scan_events
+from deepcsim.api.services import get_job_manager
 from deepcsim.api.schemas import ScanProjectRequest
-from deepcsim.api.responses import PrettyJSONResponse
+from deepcsim.api.responses import json_response
 
 router = APIRouter(tags=["explorer"])
 
@@ -23,17 +26,79 @@ async def explorer(request: Request):
     return templates.TemplateResponse("explorer.html", {"request": request})
 
 
-@router.post("/scan-project", response_class=PrettyJSONResponse)
+@router.post("/scan-project", status_code=202)
 async def scan_project_endpoint(request: ScanProjectRequest):
     """
-    Scan a directory recursively for duplicate/similar Python files.
+    Start a recursive scan of a directory for duplicate/similar Python files.
+
+    The scan runs in the background; returns the id of the job, whose
+    progress and (partial) results are available from `GET /jobs/{id}`.
+    """
+    if not os.path.isdir(request.directory):
+        raise HTTPException(status_code=400, detail="Directory does not exist")
+
+    job = get_job_manager().submit(request.directory, request.threshold, request.compact)
+    return {"job_id": job.id, "status": job.status, "url": f"/jobs/{job.id}"}
+
 
-    Returns a list of file pairs with high similarity scores.
+@router.get("/scan-project/stream")
+async def scan_project_stream(
+    directory: str,
+    threshold: float = Query(80.0, ge=0, le=100),
+    compact: bool = True,
+):
     """
-    try:
-        result = scan_directory(request.directory, request.threshold)
-        return result
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    Scan a directory, streaming results and progress as server-sent events.
+
+    Each similar file pair is sent as a `result` event as soon as it is
+    found, `progress` events are sent periodically and a `done` event ends
+    the stream. Disconnecting cancels the scan.
+    """
+    if not os.path.isdir(directory):
+        raise HTTPException(status_code=400, detail="Directory does not exist")
+
+    return StreamingResponse(
+        stream_scan_events(directory, threshold, compact),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/jobs")
+async def list_jobs():
+    """List scan jobs with their status and progress, without results."""
+    return [
+        {key: value for key, value in job.to_dict().items() if key != "results"}
+        for job in get_job_manager().list()
+    ]
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    request: Request,
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=0),
+    function_offset: int = Query(0, ge=0),
+):
+    """
+    Return the status, progress and results of a scan job.
+
+    Results found so far are included while the scan is running; pass the
+    number of results (and functions, for compact jobs) already received as
+    `offset` (`function_offset`) to only get new ones.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return json_response(request, job.to_dict(offset, limit, function_offset))
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running scan job; results found so far are kept."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.cancel()
+    return {"job_id": job.id, "status": job.status}
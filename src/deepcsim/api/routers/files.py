@@ -1,12 +1,22 @@
 """Files router - endpoints for file listing and metadata."""
 
 import os
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 
-from deepcsim.core.scanner import find_matches_for_file
+from deepcsim.api.services import get_project_index
+from deepcsim.core.analyzer import CodeAnalyzer
 from deepcsim.utils.file_info import get_file_type
-from deepcsim.constants import is_ignored
-from deepcsim.api.schemas import FileInfoRequest, FileInfoResponse
+from deepcsim.core.discovery import default_discovery
+from deepcsim.api.responses import json_response
+from deepcsim.api.schemas import (
+    FileInfoRequest,
+    FileInfoResponse,
+    FunctionSourceRequest,
+    FunctionSourceResponse,
+    SimilarFunctionsRequest,
+    SimilarFunctionsResponse,
+)
 
 router = APIRouter(prefix="/api", tags=["files"])
 
@@ -39,26 +49,23 @@ async def list_files(path: str = ""):
 
     children = []
     try:
-        with os.scandir(target_dir) as entries:
-            for entry in entries:
-                # Skip ignored files and directories
-                if is_ignored(entry.name):
-                    continue
-
-                file_type = get_file_type(entry.name, entry.is_dir())
-                rel_path = os.path.relpath(entry.path, root_dir)
-
-                # Normalize path separators to forward slashes
-                rel_path = rel_path.replace("\\", "/")
-
-                children.append(
-                    {
-                        "name": entry.name,
-                        "path": rel_path if rel_path != "." else "",
-                        "isDirectory": entry.is_dir(),
-                        "type": file_type,
-                    }
-                )
+        # Ignored entries are skipped; unchanged directories are listed from cache
+        discovery = default_discovery(root_dir)
+        for entry in await run_in_threadpool(discovery.list_entries, target_dir):
+            file_type = get_file_type(entry.name, entry.is_dir)
+            rel_path = os.path.relpath(os.path.join(target_dir, entry.name), root_dir)
+
+            # Normalize path separators to forward slashes
+            rel_path = rel_path.replace("\\", "/")
+
+            children.append(
+                {
+                    "name": entry.name,
+                    "path": rel_path if rel_path != "." else "",
+                    "isDirectory": entry.is_dir,
+                    "type": file_type,
+                }
+            )
 
         # Sort: directories first, then files
         children.sort(key=lambda x: (not x["isDirectory"], x["name"].lower()))
@@ -74,7 +81,7 @@ async def list_files(path: str = ""):
 
 
 @router.post("/file-info/", response_model=FileInfoResponse)
-async def get_file_info(request: FileInfoRequest):
+async def get_file_info(request: FileInfoRequest, http_request: Request):
     """
     Get detailed information about a specific file or directory.
 
@@ -95,17 +102,21 @@ async def get_file_info(request: FileInfoRequest):
     file_type = get_file_type(target_path, is_dir)
 
     matches = []
+    functions = [] if request.compact else None
     if file_type == "python":
         try:
-            # Find similar files for Python modules
-            matches = find_matches_for_file(
-                target_path, root_dir, threshold=40.0
+            # Find similar files for Python modules from the project index
+            matches = await run_in_threadpool(
+                get_project_index().find_matches, target_path,
+                threshold=40.0, compact=request.compact
             )
+            if request.compact:
+                matches, functions = matches["matches"], matches["functions"]
         except Exception:
             # Silently skip if matching fails
             pass
 
-    return {
+    info = {
         "name": os.path.basename(target_path),
         "path": request.path,
         "type": file_type,
@@ -114,4 +125,96 @@ async def get_file_info(request: FileInfoRequest):
         "created": stats.st_ctime,
         "modified": stats.st_mtime,
         "similar_files": matches,
+        "functions": functions,
+    }
+    # Serialized directly: similar_files can be several megabytes
+    return json_response(http_request, info)
+
+
+@router.post("/function-source/", response_model=FunctionSourceResponse)
+async def get_function_source(request: FunctionSourceRequest):
+    """
+    Get the source code of a single function.
+
+    Used to fetch sources lazily for compact results, which only reference
+    functions by path and name.
+    """
+    root_dir = os.getcwd()
+    target_path = os.path.abspath(os.path.join(root_dir, request.path))
+
+    # Security check
+    if not target_path.startswith(root_dir):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if not os.path.isfile(target_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    def lookup():
+        metrics = get_project_index().get_function(target_path, request.name)
+        if metrics is None:
+            # Not indexed (e.g. an ignored directory): analyze the file directly
+            with open(target_path, "r", encoding="utf-8", errors="ignore") as f:
+                analyzer = CodeAnalyzer(f.read(), target_path)
+            analyzer.analyze()
+            metrics = analyzer.functions.get(request.name)
+        return metrics
+
+    try:
+        metrics = await run_in_threadpool(lookup)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Function not found")
+
+    return {
+        "path": request.path,
+        "name": request.name,
+        "lines": f"{metrics.line_start}-{metrics.line_end}",
+        "source": metrics.source,
     }
+
+
+@router.post("/similar-functions/", response_model=SimilarFunctionsResponse)
+async def get_similar_functions(request: SimilarFunctionsRequest, http_request: Request):
+    """
+    Find the project functions most similar to a function.
+
+    Query either a project function by `path` and `name` (it is left out
+    of its own results), or every function defined in `source`.
+    """
+    index = get_project_index()
+
+    if request.source is not None:
+        analyzer = CodeAnalyzer(request.source, "query")
+        try:
+            analyzer.analyze()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        queries = [(name, metrics, None) for name, metrics in analyzer.functions.items()]
+    elif request.path and request.name:
+        root_dir = os.getcwd()
+        target_path = os.path.abspath(os.path.join(root_dir, request.path))
+
+        # Security check
+        if not target_path.startswith(root_dir):
+            raise HTTPException(status_code=403, detail="Access denied")
+
+        if not os.path.isfile(target_path):
+            raise HTTPException(status_code=404, detail="File not found")
+
+        metrics = await run_in_threadpool(index.get_function, target_path, request.name)
+        if metrics is None:
+            raise HTTPException(status_code=404, detail="Function not found")
+        queries = [(request.name, metrics, (target_path, request.name))]
+    else:
+        raise HTTPException(status_code=400, detail="Provide either source, or path and name")
+
+    def search():
+        return [
+            {"name": name, "matches": index.similar_functions(metrics, request.k, exclude)}
+            for name, metrics, exclude in queries
+        ]
+
+    results = await run_in_threadpool(search)
+    return json_response(http_request, {"results": results})
@@ -0,0 +1,25 @@
+"""Index router - endpoints for inspecting the project index."""
+
+from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
+
+from deepcsim.api.services import get_index_watcher, get_project_index
+
+router = APIRouter(prefix="/api/index", tags=["index"])
+
+
+@router.get("/status")
+async def index_status():
+    """Return the size, build time and staleness of the project index, and the state of its watcher."""
+    status = get_project_index().status()
+    watcher = get_index_watcher()
+    status["watcher"] = watcher.status() if watcher is not None else None
+    return status
+
+
+@router.post("/refresh")
+async def refresh_index():
+    """Re-analyze files added or modified since the last refresh."""
+    index = get_project_index()
+    await run_in_threadpool(index.refresh)
+    return index.status()
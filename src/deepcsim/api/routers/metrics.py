@@ -0,0 +1,23 @@
+"""Metrics router - profiling data in the Prometheus text format."""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from deepcsim.core import profiling
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Return the phase timings and counters recorded since the server started.
+
+    Only available when the server runs with `--profile`.
+    """
+    profiler = profiling.current()
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled, start the server with --profile")
+    return PlainTextResponse(profiler.prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
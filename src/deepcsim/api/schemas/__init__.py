@@ -2,17 +2,35 @@
 API Schemas module - Pydantic models for request/response validation.
 """
 
-from .file import FileInfoRequest, FileInfoResponse, FileNode
-from .analysis import AnalyzeRequest, AnalyzeResponse, ComparisonResult
+from .file import (
+    FileInfoRequest,
+    FileInfoResponse,
+    FileNode,
+    FunctionSourceRequest,
+    FunctionSourceResponse,
+    SimilarFunctionsRequest,
+    SimilarFunctionsResponse,
+)
+from .analysis import (
+    AnalyzeRequest,
+    AnalyzeResponse,
+    ComparisonResult,
+    CompactComparisonResult,
+)
 from .scan import ScanProjectRequest, ScanProjectResponse, SimilarFilePair
 
 __all__ = [
     "FileInfoRequest",
     "FileInfoResponse",
     "FileNode",
+    "FunctionSourceRequest",
+    "FunctionSourceResponse",
+    "SimilarFunctionsRequest",
+    "SimilarFunctionsResponse",
     "AnalyzeRequest",
     "AnalyzeResponse",
     "ComparisonResult",
+    "CompactComparisonResult",
     "ScanProjectRequest",
     "ScanProjectResponse",
     "SimilarFilePair",
@@ -1,7 +1,7 @@
 """Analysis and comparison schemas."""
 
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
 
 
 class ComparisonResult(BaseModel):
@@ -37,6 +37,16 @@ class ComparisonResult(BaseModel):
         }
 
 
+class CompactComparisonResult(BaseModel):
+    """Result of comparing two functions listed in the functions side table."""
+
+    func1: int = Field(..., description="Id of the first function")
+    func2: int = Field(..., description="Id of the second function")
+    similarity: Dict[str, Any] = Field(
+        ..., description="Similarity metrics (structural, semantic, composite)"
+    )
+
+
 class AnalyzeRequest(BaseModel):
     """Request body for file analysis endpoint."""
 
@@ -55,13 +65,16 @@ class AnalyzeResponse(BaseModel):
     file2_functions: int = Field(
         ..., description="Number of functions in file 2"
     )
-    comparisons: List[ComparisonResult] = Field(
+    comparisons: List[Union[ComparisonResult, CompactComparisonResult]] = Field(
         ..., description="Function comparison results"
     )
     avg_similarity: float = Field(..., description="Average similarity score")
     high_similarity_count: int = Field(
         ..., description="Count of high similarity matches (>= 80)"
     )
+    functions: Optional[List[Dict[str, Any]]] = Field(
+        None, description="Functions referenced by compact comparisons"
+    )
 
     class Config:
         schema_extra = {
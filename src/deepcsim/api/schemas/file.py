@@ -1,7 +1,7 @@
 """File and Explorer schemas."""
 
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
 
 class FileNode(BaseModel):
@@ -29,6 +29,10 @@ class FileInfoRequest(BaseModel):
     """Request body for file information endpoint."""
 
     path: str = Field(..., description="Path to the file or directory")
+    compact: bool = Field(
+        False,
+        description="Reference functions by id in a side table instead of embedding sources",
+    )
 
     class Config:
         schema_extra = {"example": {"path": "src/deepcsim/core/analyzer.py"}}
@@ -47,6 +51,9 @@ class FileInfoResponse(BaseModel):
     similar_files: List[dict] = Field(
         default_factory=list, description="List of similar files"
     )
+    functions: Optional[List[dict]] = Field(
+        None, description="Functions referenced by compact comparisons"
+    )
 
     class Config:
         schema_extra = {
@@ -61,3 +68,58 @@ class FileInfoResponse(BaseModel):
                 "similar_files": [],
             }
         }
+
+
+class FunctionSourceRequest(BaseModel):
+    """Request body for the function source endpoint."""
+
+    path: str = Field(..., description="Path of the file defining the function")
+    name: str = Field(..., description="Function name, as listed in results (methods without their class)")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "path": "src/deepcsim/core/analyzer.py",
+                "name": "analyze",
+            }
+        }
+
+
+class FunctionSourceResponse(BaseModel):
+    """Source code of a single function."""
+
+    path: str = Field(..., description="Path of the file defining the function")
+    name: str = Field(..., description="Function name")
+    lines: str = Field(..., description="Line range of the function")
+    source: str = Field(..., description="Source code of the function")
+
+
+class SimilarFunctionsRequest(BaseModel):
+    """Request body for the similar functions endpoint."""
+
+    path: Optional[str] = Field(None, description="Path of a project file defining the function")
+    name: Optional[str] = Field(
+        None, description="Name of the function in `path` (methods without their class)"
+    )
+    source: Optional[str] = Field(
+        None, description="Code to analyze instead; every function it defines is queried"
+    )
+    k: int = Field(5, ge=1, le=100, description="Number of similar functions to return")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "path": "src/deepcsim/core/analyzer.py",
+                "name": "analyze",
+                "k": 5,
+            }
+        }
+
+
+class SimilarFunctionsResponse(BaseModel):
+    """Most similar project functions of each queried function."""
+
+    results: List[dict] = Field(
+        default_factory=list,
+        description="One entry per queried function, with its name and matches",
+    )
@@ -33,6 +33,10 @@ class ScanProjectRequest(BaseModel):
         le=100,
         description="Similarity threshold percentage",
     )
+    compact: bool = Field(
+        default=False,
+        description="Return results in the compact format, with a functions side table",
+    )
 
     class Config:
         schema_extra = {
@@ -1,5 +1,7 @@
 import os
+import argparse
 import uvicorn
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,13 +13,28 @@ from deepcsim.api.routers import (
     analysis_router,
     explorer_router,
     files_router,
+    index_router,
+    metrics_router,
 )
+from deepcsim.api import services
+from deepcsim.core import profiling
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the project index in the background so the first request is fast
+    services.start_project_index()
+    yield
+    services.stop_job_manager()
+    services.stop_project_index()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="DeepCSIM - Code Similarity Analyzer",
     description="Analyze and detect code similarity in Python projects",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Setup templates
@@ -48,6 +65,8 @@ if os.path.exists(css_dir):
 app.include_router(analysis_router)
 app.include_router(explorer_router)
 app.include_router(files_router)
+app.include_router(index_router)
+app.include_router(metrics_router)
 
 
 @app.get("/e", response_class=HTMLResponse)
@@ -58,7 +77,22 @@ async def home(request: Request):
 
 def main():
     """Run the development server."""
-    uvicorn.run(app, port=8000)
+    parser = argparse.ArgumentParser(description="DeepCSIM - Code Similarity Analyzer Server")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--watch", action="store_true",
+                        help="Watch the served directory and re-analyze modified files as they change")
+    parser.add_argument("--polling", action="store_true",
+                        help="With --watch, poll the tree instead of using inotify")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record phase timings and counters, served in the Prometheus format at /metrics")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable(profiling.Profiler())
+
+    services.watch_settings["enabled"] = args.watch
+    services.watch_settings["polling"] = args.polling
+    uvicorn.run(app, port=args.port)
 
 
 if __name__ == "__main__":
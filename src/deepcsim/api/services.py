@@ -0,0 +1,74 @@
+"""Long-lived services shared by the API routers."""
+
+import os
+import threading
+from typing import Optional
+
+from deepcsim.api.jobs import JobManager
+from deepcsim.core.project_index import ProjectIndex
+from deepcsim.core.watcher import IndexWatcher
+
+_project_index: Optional[ProjectIndex] = None
+_project_index_lock = threading.Lock()
+_index_watcher: Optional[IndexWatcher] = None
+_job_manager: Optional[JobManager] = None
+_job_manager_lock = threading.Lock()
+
+# Set by `deepcsim-server --watch`
+watch_settings = {"enabled": False, "polling": False}
+
+
+def get_project_index() -> ProjectIndex:
+    """Return the index of the served directory (the working directory)."""
+    global _project_index
+    root_dir = os.getcwd()
+    with _project_index_lock:
+        if _project_index is None or _project_index.directory != root_dir:
+            # A watched index is kept fresh by events instead of re-stat'ing the tree
+            max_age = None if watch_settings["enabled"] else 5.0
+            _project_index = ProjectIndex(root_dir, max_age=max_age)
+        return _project_index
+
+
+def get_index_watcher() -> Optional[IndexWatcher]:
+    """Return the running index watcher, if watch mode is enabled."""
+    return _index_watcher
+
+
+def start_project_index() -> threading.Thread:
+    """Start the index watcher (in watch mode) and build the index in the background."""
+    global _index_watcher
+    index = get_project_index()
+    if watch_settings["enabled"] and _index_watcher is None:
+        # Watch before building, so no change made during the build is lost
+        _index_watcher = IndexWatcher(index, polling=watch_settings["polling"]).start()
+
+    thread = threading.Thread(target=index.refresh, name="deepcsim-index", daemon=True)
+    thread.start()
+    return thread
+
+
+def stop_project_index() -> None:
+    """Stop the index watcher, if any."""
+    global _index_watcher
+    if _index_watcher is not None:
+        _index_watcher.stop()
+        _index_watcher = None
+
+
+def get_job_manager() -> JobManager:
+    """Return the manager running background scan jobs."""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager()
+        return _job_manager
+
+
+def stop_job_manager() -> None:
+    """Cancel running scan jobs and stop their pool."""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is not None:
+            _job_manager.shutdown()
+            _job_manager = None
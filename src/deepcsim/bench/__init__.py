@@ -0,0 +1,10 @@
+from .corpus import generate_sources, write_corpus
+from .suite import BENCHMARKS, compare_reports, run_suite
+
+__all__ = [
+    "generate_sources",
+    "write_corpus",
+    "BENCHMARKS",
+    "compare_reports",
+    "run_suite",
+]
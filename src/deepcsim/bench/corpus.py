@@ -0,0 +1,162 @@
+"""
+Deterministic synthetic Python corpus for benchmarks.
+
+Functions are built from random statements (assignments, calls, `if` and
+`for` blocks). A share of them, `clone_rate`, are copies of an earlier
+function of another file, each of whose lines is then mutated with
+probability `mutation_rate`: a literal or operator is changed, or a
+statement is inserted. The same parameters and seed always produce the
+same files.
+"""
+
+import os
+import random
+import re
+from typing import Dict, List, Tuple
+
+NAMES = (
+    "total", "count", "items", "value", "result", "index", "data", "buffer",
+    "offset", "key", "name", "limit", "size", "node", "item", "state",
+)
+CALLS = (
+    "len", "sum", "min", "max", "sorted", "abs", "str", "int",
+    "process", "transform", "validate", "normalize", "lookup", "emit",
+)
+VERBS = ("get", "load", "parse", "build", "update", "compute", "merge", "check")
+NOUNS = ("config", "record", "entry", "batch", "table", "request", "token", "graph")
+OPERATORS = ("+", "-", "*", "//", "%")
+
+_INT = re.compile(r"\b\d+\b")
+_OPERATOR = re.compile(r" (\+|-|\*|//|%) ")
+
+
+def _expression(rng: random.Random, scope: List[str]) -> str:
+    kind = rng.random()
+    if kind < 0.4:
+        return f"{rng.choice(scope)} {rng.choice(OPERATORS)} {rng.randint(1, 99)}"
+    if kind < 0.7:
+        return f"{rng.choice(CALLS)}({rng.choice(scope)})"
+    return f"{rng.choice(scope)} {rng.choice(OPERATORS)} {rng.choice(scope)}"
+
+
+def _simple_statement(rng: random.Random, scope: List[str], indent: str) -> str:
+    kind = rng.random()
+    if kind < 0.6:
+        target = rng.choice(NAMES)
+        line = f"{indent}{target} = {_expression(rng, scope)}"
+        if target not in scope:
+            scope.append(target)
+        return line
+    if kind < 0.8:
+        return f"{indent}{rng.choice(scope)} += {rng.randint(1, 9)}"
+    return f"{indent}{rng.choice(CALLS)}({rng.choice(scope)}, {rng.randint(0, 9)})"
+
+
+def _block(rng: random.Random, lines: List[str], scope: List[str], depth: int, size: int) -> None:
+    indent = "    " * depth
+    for _ in range(size):
+        kind = rng.random()
+        if depth < 3 and kind < 0.2:
+            lines.append(f"{indent}if {rng.choice(scope)} > {rng.randint(0, 99)}:")
+            _block(rng, lines, scope, depth + 1, rng.randint(1, 3))
+            if rng.random() < 0.5:
+                lines.append(f"{indent}else:")
+                _block(rng, lines, scope, depth + 1, rng.randint(1, 2))
+        elif depth < 3 and kind < 0.35:
+            variable = rng.choice(NAMES)
+            lines.append(f"{indent}for {variable} in range({rng.choice(scope)}):")
+            scope.append(variable)
+            _block(rng, lines, scope, depth + 1, rng.randint(1, 3))
+        else:
+            lines.append(_simple_statement(rng, scope, indent))
+
+
+def _random_function(rng: random.Random, name: str) -> List[str]:
+    args = rng.sample(NAMES, rng.randint(0, 3))
+    lines = [f"def {name}({', '.join(args)}):"]
+    scope = list(args)
+    if not scope:
+        lines.append(f"    value = {rng.randint(0, 99)}")
+        scope.append("value")
+    _block(rng, lines, scope, 1, rng.randint(2, 8))
+    lines.append(f"    return {rng.choice(scope)}")
+    return lines
+
+
+def _mutate(rng: random.Random, lines: List[str], name: str, mutation_rate: float) -> List[str]:
+    """Copy a function under a new name, mutating each body line with probability `mutation_rate`."""
+    mutated = [re.sub(r"^def \w+", f"def {name}", lines[0])]
+    for line in lines[1:]:
+        if rng.random() >= mutation_rate:
+            mutated.append(line)
+            continue
+        kind = rng.random()
+        if kind < 0.4 and _INT.search(line):
+            mutated.append(_INT.sub(str(rng.randint(0, 99)), line, count=1))
+        elif kind < 0.7 and _OPERATOR.search(line):
+            mutated.append(_OPERATOR.sub(f" {rng.choice(OPERATORS)} ", line, count=1))
+        else:
+            mutated.append(line)
+            indent = line[:len(line) - len(line.lstrip())]
+            if line.rstrip().endswith(":"):
+                indent += "    "
+            elif line.lstrip().startswith("return"):
+                continue
+            mutated.append(_simple_statement(rng, list(NAMES[:4]), indent))
+    return mutated
+
+
+def generate_sources(
+    files: int = 50,
+    functions_per_file: int = 10,
+    clone_rate: float = 0.2,
+    mutation_rate: float = 0.1,
+    seed: int = 0,
+) -> Tuple[Dict[str, str], Dict[str, int]]:
+    """
+    Generate a corpus in memory.
+
+    Returns ({relative path: source}, stats), where stats counts files,
+    functions, clones and bytes.
+    """
+    if not 0.0 <= clone_rate <= 1.0 or not 0.0 <= mutation_rate <= 1.0:
+        raise ValueError("clone_rate and mutation_rate must be between 0 and 1")
+    if files < 1 or functions_per_file < 1:
+        raise ValueError("files and functions_per_file must be at least 1")
+
+    rng = random.Random(seed)
+    generated: List[Tuple[int, List[str]]] = []
+    sources: Dict[str, str] = {}
+    clones = 0
+    for file_index in range(files):
+        blocks = []
+        for function_index in range(functions_per_file):
+            name = f"{rng.choice(VERBS)}_{rng.choice(NOUNS)}_{function_index}"
+            originals = [lines for owner, lines in generated if owner != file_index]
+            if originals and rng.random() < clone_rate:
+                lines = _mutate(rng, rng.choice(originals), name, mutation_rate)
+                clones += 1
+            else:
+                lines = _random_function(rng, name)
+            generated.append((file_index, lines))
+            blocks.append("\n".join(lines))
+        # Spread files over packages, so scans walk nested directories
+        path = f"package_{file_index // 20}/module_{file_index}.py"
+        sources[path] = f'"""Synthetic module {file_index}."""\n\n\n' + "\n\n\n".join(blocks) + "\n"
+
+    stats = {
+        "files": files,
+        "functions": files * functions_per_file,
+        "clones": clones,
+        "bytes": sum(len(source.encode()) for source in sources.values()),
+    }
+    return sources, stats
+
+
+def write_corpus(directory: str, sources: Dict[str, str]) -> None:
+    """Write generated sources below `directory`."""
+    for relative, source in sources.items():
+        path = os.path.join(directory, *relative.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
@@ -0,0 +1,268 @@
+"""
+Benchmark suite over a synthetic corpus.
+
+Each benchmark is set up once, timed over `repeat` runs (the best run is
+reported) and then run once more under `tracemalloc` for its peak memory,
+so tracing does not slow down the timed runs. Results are a
+JSON-serializable report that `compare_reports` diffs against a report of
+another commit.
+"""
+
+import contextlib
+import io
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from importlib import metadata
+from itertools import combinations, islice
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from deepcsim.bench.corpus import generate_sources, write_corpus
+from deepcsim.core.analyzer import CodeAnalyzer
+from deepcsim.core.batch import HAS_NUMPY
+from deepcsim.core.scanner import find_matches_for_file, scan_directory
+from deepcsim.core.similarity import SimilarityCalculator
+
+# Bump whenever the layout of reports changes
+REPORT_FORMAT = 1
+
+# Upper bounds keeping single benchmarks short on large corpora
+MAX_PAIRS = 20000
+HTTP_REQUESTS = 20
+
+
+class BenchmarkSkipped(Exception):
+    """Raised by a benchmark setup when the benchmark cannot run here."""
+
+
+# A setup prepares a benchmark untimed and returns (run, items, unit)
+Setup = Callable[[str, Dict[str, str]], Tuple[Callable[[], Any], int, str]]
+
+
+def _setup_analyze(directory, sources):
+    def run():
+        for path, source in sources.items():
+            CodeAnalyzer(source, path).analyze()
+    return run, len(sources), "files"
+
+
+def _setup_calculate_all(directory, sources):
+    functions = []
+    for path, source in sources.items():
+        analyzer = CodeAnalyzer(source, path)
+        analyzer.analyze()
+        functions.extend(analyzer.functions.values())
+    pairs = list(islice(combinations(functions, 2), MAX_PAIRS))
+
+    def run():
+        for func1, func2 in pairs:
+            SimilarityCalculator.calculate_all(func1, func2)
+    return run, len(pairs), "pairs"
+
+
+def _setup_scan_directory(directory, sources):
+    def run():
+        # scan_directory reports progress on stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            scan_directory(directory)
+    return run, len(sources), "files"
+
+
+def _setup_find_matches_for_file(directory, sources):
+    target = os.path.join(directory, *next(iter(sources)).split("/"))
+
+    def run():
+        find_matches_for_file(target, directory)
+    return run, len(sources), "files"
+
+
+def _test_client():
+    try:
+        from fastapi.testclient import TestClient
+        from deepcsim.api.server import app
+    except ImportError as e:
+        raise BenchmarkSkipped(f"server dependencies are not installed ({e.name})") from None
+    return TestClient(app)
+
+
+def _setup_http_analyze(directory, sources):
+    client = _test_client()
+    pair = list(islice(sources.items(), 2))
+    (path1, source1), (path2, source2) = pair[0], pair[-1]
+
+    def run():
+        for _ in range(HTTP_REQUESTS):
+            response = client.post("/api/analyze", files={
+                "file1": (path1, source1.encode()),
+                "file2": (path2, source2.encode()),
+            })
+            response.raise_for_status()
+    return run, HTTP_REQUESTS, "requests"
+
+
+def _setup_http_file_info(directory, sources):
+    client = _test_client()
+    paths = list(islice(sources, HTTP_REQUESTS))
+    # The first request builds the project index
+    client.post("/api/file-info/", json={"path": paths[0]}).raise_for_status()
+
+    def run():
+        for path in paths:
+            client.post("/api/file-info/", json={"path": path}).raise_for_status()
+    return run, len(paths), "requests"
+
+
+def _setup_http_similar_functions(directory, sources):
+    client = _test_client()
+    queries = []
+    for path in islice(sources, HTTP_REQUESTS):
+        analyzer = CodeAnalyzer(sources[path], path)
+        analyzer.analyze()
+        queries.append({"path": path, "name": next(iter(analyzer.functions))})
+    client.post("/api/similar-functions/", json=queries[0]).raise_for_status()
+
+    def run():
+        for query in queries:
+            client.post("/api/similar-functions/", json=query).raise_for_status()
+    return run, len(queries), "requests"
+
+
+BENCHMARKS: Dict[str, Setup] = {
+    "analyze": _setup_analyze,
+    "calculate_all": _setup_calculate_all,
+    "scan_directory": _setup_scan_directory,
+    "find_matches_for_file": _setup_find_matches_for_file,
+    "http_analyze": _setup_http_analyze,
+    "http_file_info": _setup_http_file_info,
+    "http_similar_functions": _setup_http_similar_functions,
+}
+
+
+@contextlib.contextmanager
+def _working_directory(directory: str):
+    # The server serves its working directory
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _run_benchmark(setup: Setup, directory: str, sources: Dict[str, str], repeat: int) -> Dict[str, Any]:
+    try:
+        run, items, unit = setup(directory, sources)
+    except BenchmarkSkipped as e:
+        return {"skipped": str(e)}
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": best,
+        "items": items,
+        "unit": unit,
+        "per_second": items / best if best > 0 else None,
+        "peak_memory_bytes": peak,
+    }
+
+
+def _package_version() -> Optional[str]:
+    try:
+        return metadata.version("deepcsim")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def run_suite(
+    files: int = 50,
+    functions_per_file: int = 10,
+    clone_rate: float = 0.2,
+    mutation_rate: float = 0.1,
+    seed: int = 0,
+    repeat: int = 3,
+    only: Optional[Sequence[str]] = None,
+    corpus_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Generate a corpus and run the benchmarks on it.
+
+    `only` restricts the run to some of the `BENCHMARKS`. The corpus is
+    written to `corpus_dir` if given (and kept), else to a temporary
+    directory. Returns a JSON-serializable report.
+    """
+    names = list(only) if only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(unknown)}")
+    if repeat < 1:
+        raise ValueError("repeat must be at least 1")
+
+    sources, stats = generate_sources(files, functions_per_file, clone_rate, mutation_rate, seed)
+    with contextlib.ExitStack() as stack:
+        if corpus_dir is None:
+            corpus_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="deepcsim-bench-"))
+        corpus_dir = os.path.abspath(corpus_dir)
+        write_corpus(corpus_dir, sources)
+        stack.enter_context(_working_directory(corpus_dir))
+
+        results = {name: _run_benchmark(BENCHMARKS[name], corpus_dir, sources, repeat)
+                   for name in names}
+
+    return {
+        "format": REPORT_FORMAT,
+        "deepcsim": _package_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": HAS_NUMPY,
+        "repeat": repeat,
+        "corpus": {
+            "seed": seed,
+            "clone_rate": clone_rate,
+            "mutation_rate": mutation_rate,
+            "functions_per_file": functions_per_file,
+            **stats,
+        },
+        "benchmarks": results,
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Compare the timings of two reports.
+
+    Returns one row per benchmark timed in both, with `ratio` the current
+    time over the baseline time (above 1 is slower). Raises ValueError if
+    the reports were run on different corpora, whose timings are not
+    comparable.
+    """
+    for report in (baseline, current):
+        if report.get("format") != REPORT_FORMAT:
+            raise ValueError("Unsupported benchmark report format")
+    if baseline["corpus"] != current["corpus"]:
+        raise ValueError("Reports were run on different corpora")
+
+    rows = []
+    for name, result in current["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None or "seconds" not in previous or "seconds" not in result:
+            continue
+        rows.append({
+            "name": name,
+            "baseline": previous["seconds"],
+            "current": result["seconds"],
+            "ratio": result["seconds"] / previous["seconds"] if previous["seconds"] else None,
+        })
+    return rows
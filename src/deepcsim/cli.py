@@ -2,10 +2,178 @@ import os
 import argparse
 import sys
 import json
-from deepcsim.core.scanner import scan_directory
+from deepcsim.bench import BENCHMARKS, compare_reports, run_suite
+from deepcsim.core.cache import AnalysisCache
+from deepcsim.core.changes import git_changed_files, read_file_list
+from deepcsim.core.discovery import FileDiscovery
+from deepcsim.core.pipeline import DEFAULT_READERS
+from deepcsim.core.profiling import Profiler, profiling
+from deepcsim.core.incremental import ScanState
+from deepcsim.core.scanner import (
+    find_clone_clusters,
+    find_exact_duplicates,
+    iter_scan_directory,
+    iter_scan_store,
+    scan_directory,
+    scan_store,
+    verify_pruning_recall,
+    write_directory_store,
+)
+from deepcsim.core.sharding import merge_shards, parse_shard, scan_shard
+from deepcsim.core.store import MetricsStore
+from deepcsim.constants import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES
+
+
+def _print_results(results, source, as_json, state=None):
+    """Print a scan result as JSON or as a human-readable report."""
+    if as_json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"DeepCSIM Scan Results for: {source}")
+        print(f"Total Similar Pairs Found: {results['count']}")
+        if "cache" in results:
+            print(
+                f"Cache: {results['cache']['hits']} hits, {results['cache']['misses']} misses")
+        if "identical" in results:
+            print(
+                f"Identical File Groups: {len(results['identical'])} (only the first file of each is compared)")
+        if state is not None:
+            print(
+                f"Incremental: {len(state.changed)} of {len(state.files)} files re-analyzed")
+        if "changed_files" in results:
+            print(
+                f"Changed Files: {len(results['changed_files'])} (only pairs involving them are compared)")
+        print("-" * 50)
+        for res in results['results']:
+            print(f"File 1: {res['file1']}")
+            print(f"File 2: {res['file2']}")
+            print(f"Similarity: {res['similarity']}%")
+            print(f"Reason: {res['reason']}")
+            print("-" * 50)
+        for group in results.get('identical', []):
+            print("Identical files:")
+            for path in group['files']:
+                print(f"  {path}")
+            print("-" * 50)
+
+
+def merge_main(argv):
+    """Entry point of `deepcsim-cli merge`: combine the outputs of sharded scans."""
+    parser = argparse.ArgumentParser(
+        prog="deepcsim-cli merge",
+        description="Combine the JSON outputs of deepcsim-cli --shard runs into one result")
+    parser.add_argument("shards", nargs="+", help="Shard output files")
+    parser.add_argument("--directory", default=None,
+                        help="Directory to report paths in (default: the directory the first shard scanned)")
+    parser.add_argument("--json", action="store_true",
+                        help="Output results as JSON")
+    args = parser.parse_args(argv)
+
+    shards = []
+    for path in args.shards:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                shards.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot read shard {path}: {e}", file=sys.stderr)
+            sys.exit(1)
+    try:
+        results = merge_shards(shards, args.directory)
+    except (ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    _print_results(results, args.directory or shards[0].get("directory"), args.json)
+
+
+def bench_main(argv):
+    """Entry point of `deepcsim-cli bench`: time the hot paths on a synthetic corpus."""
+    parser = argparse.ArgumentParser(
+        prog="deepcsim-cli bench",
+        description="Benchmark DeepCSIM on a generated corpus and report throughput and peak memory")
+    parser.add_argument("--files", type=int, default=50,
+                        help="Number of generated files")
+    parser.add_argument("--functions-per-file", type=int, default=10,
+                        help="Number of functions per generated file")
+    parser.add_argument("--clone-rate", type=float, default=0.2,
+                        help="Share of functions copied from another file (0-1)")
+    parser.add_argument("--mutation-rate", type=float, default=0.1,
+                        help="Probability that a line of a copied function is mutated (0-1)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed of the corpus generator")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timed runs per benchmark; the best one is reported")
+    parser.add_argument("--only", action="append", choices=list(BENCHMARKS), default=None,
+                        help="Run only this benchmark (repeatable)")
+    parser.add_argument("--corpus", metavar="DIR", default=None,
+                        help="Write the corpus to DIR and keep it (default: a temporary directory)")
+    parser.add_argument("--json", action="store_true",
+                        help="Output the report as JSON")
+    parser.add_argument("--output", metavar="FILE", default=None,
+                        help="Also write the JSON report to FILE")
+    parser.add_argument("--compare", metavar="BASELINE", default=None,
+                        help="Compare timings with a JSON report written by a previous run")
+    parser.add_argument("--max-slowdown", type=float, default=None,
+                        help="With --compare, exit with status 1 if a benchmark is slower than "
+                             "the baseline by more than this factor")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot read baseline {args.compare}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    try:
+        report = run_suite(
+            files=args.files, functions_per_file=args.functions_per_file,
+            clone_rate=args.clone_rate, mutation_rate=args.mutation_rate, seed=args.seed,
+            repeat=args.repeat, only=args.only, corpus_dir=args.corpus)
+        rows = compare_reports(baseline, report) if baseline is not None else None
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        corpus = report["corpus"]
+        print(f"DeepCSIM Benchmarks: {corpus['files']} files, {corpus['functions']} functions "
+              f"({corpus['clones']} clones), {corpus['bytes'] / 1e6:.2f} MB")
+        print("-" * 50)
+        for name, result in report["benchmarks"].items():
+            if "skipped" in result:
+                print(f"{name:<24} skipped: {result['skipped']}")
+                continue
+            print(f"{name:<24} {result['seconds']:8.3f}s  {result['per_second']:10.1f} "
+                  f"{result['unit']}/s  peak {result['peak_memory_bytes'] / 1e6:7.1f} MB")
+        if rows:
+            print("-" * 50)
+            for row in rows:
+                print(f"{row['name']:<24} {row['baseline']:8.3f}s -> {row['current']:8.3f}s  "
+                      f"{row['ratio']:.2f}x")
+
+    if rows and args.max_slowdown is not None:
+        slower = [row["name"] for row in rows if row["ratio"] and row["ratio"] > args.max_slowdown]
+        if slower:
+            print(f"Error: slower than the baseline: {', '.join(slower)}", file=sys.stderr)
+            sys.exit(1)
 
 
 def main():
+    if sys.argv[1:2] == ["merge"]:
+        merge_main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["bench"]:
+        bench_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
         description="DeepCSIM - Code Similarity Analyzer Code Scanner")
 
@@ -16,27 +184,311 @@ def main():
                         default=80.0, help="Similarity threshold (0-100)")
     parser.add_argument("--json", action="store_true",
                         help="Output results as JSON")
+    parser.add_argument("--compact", action="store_true",
+                        help="List functions once in a side table and reference them by id in comparisons")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Stream results as newline-delimited JSON, one file pair per line")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of processes used to analyze files (0 = all cores)")
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS,
+                        help="Number of threads reading files while earlier ones are analyzed (1 = read serially)")
+    parser.add_argument("--include", metavar="GLOB", action="append", default=None,
+                        help="Only scan Python files matching GLOB (gitignore syntax, repeatable)")
+    parser.add_argument("--exclude", metavar="GLOB", action="append", default=None,
+                        help="Skip files and directories matching GLOB (gitignore syntax, repeatable)")
+    parser.add_argument("--max-file-size", type=float, default=None, metavar="KB",
+                        help="Skip Python files larger than KB kilobytes")
+    parser.add_argument("--no-ignore-files", action="store_true",
+                        help="Do not honour .gitignore and .deepcsimignore files")
+    parser.add_argument("--prune", action="store_true",
+                        help="Only compare file pairs the candidate index cannot rule out (same results). "
+                             "Off by default: with NumPy, scoring every pair is about as fast. Worth trying "
+                             "without NumPy at thresholds of 80 or more; has no effect at 50 or less")
+    parser.add_argument("--exact-only", action="store_true",
+                        help="Only report groups of files and functions with identical AST structure (no similarity scoring)")
+    parser.add_argument("--clusters", action="store_true",
+                        help="Group similar functions into clone classes and report each class once "
+                             "(with --exact-only: identical AST structure only)")
+    parser.add_argument("--skip-identical", action="store_true",
+                        help="Report identical files as groups and only compare the first file of each group")
+    parser.add_argument("--verify-recall", action="store_true",
+                        help="Check that candidate pruning finds every pair of a brute-force scan")
+    parser.add_argument("--changed-since", metavar="REV", default=None,
+                        help="Only compare pairs involving files changed since git revision REV "
+                             "(committed since the merge base, uncommitted or untracked)")
+    parser.add_argument("--changed-files", metavar="FILE", default=None,
+                        help="Only compare pairs involving the files listed in FILE, one per line ('-' for stdin)")
+    parser.add_argument("--incremental", metavar="STATE_FILE", default=None,
+                        help="Load the previous scan state from STATE_FILE, rescan only changes and save it back")
+    parser.add_argument("--shard", metavar="K/N", default=None,
+                        help="Scan only shard K of N of the file pairs and print a partial JSON result "
+                             "for 'deepcsim-cli merge'")
+    parser.add_argument("--write-store", metavar="STORE_DIR", default=None,
+                        help="Analyze the directory into a memory-mapped metrics store and exit")
+    parser.add_argument("--store", metavar="STORE_DIR", default=None,
+                        help="Scan the functions of a metrics store instead of analyzing the directory")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse analyses of unchanged files from the on-disk cache")
+    parser.add_argument("--cache-dir", default=None,
+                        help=f"Cache directory (default: {DEFAULT_CACHE_DIR}, implies --cache)")
+    parser.add_argument("--cache-max-size", type=float,
+                        default=DEFAULT_CACHE_MAX_BYTES / (1024 * 1024),
+                        help="Maximum cache size in MB before old entries are evicted")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Remove all cached analyses and exit")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print where the scan spent its time (phases, counters, slowest files) to stderr")
+    parser.add_argument("--profile-output", metavar="FILE", default=None,
+                        help="Write the profile as JSON to FILE (implies --profile)")
 
     args = parser.parse_args()
 
+    if not (args.profile or args.profile_output):
+        _run(parser, args)
+        return
+
+    with profiling(Profiler()) as profiler:
+        try:
+            _run(parser, args)
+        finally:
+            _print_profile(profiler, args.profile_output)
+
+
+def _print_profile(profiler, output=None):
+    """Print a profile to stderr, and write it as JSON to `output` if given."""
+    report = profiler.report()
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    out = sys.stderr
+    print("DeepCSIM Profile", file=out)
+    print("-" * 50, file=out)
+    print(f"{'phase':<28} {'calls':>8} {'wall (s)':>10} {'cpu (s)':>10}", file=out)
+    for name, totals in report["phases"].items():
+        print(f"{name:<28} {totals['calls']:>8} {totals['wall_seconds']:>10.3f} "
+              f"{totals['cpu_seconds']:>10.3f}", file=out)
+    print("-" * 50, file=out)
+    for name, value in report["counters"].items():
+        print(f"{name:<28} {value:>8}", file=out)
+    if report["slowest_files"]:
+        print("-" * 50, file=out)
+        print("Slowest files:", file=out)
+        for entry in report["slowest_files"]:
+            print(f"  {entry['seconds']:8.3f}s  {entry['bytes']:>9} B  {entry['path']}", file=out)
+
+
+def _run(parser, args):
+    """Run the scan mode selected by the parsed command line."""
+    cache = None
+    if args.cache or args.cache_dir or args.clear_cache:
+        cache = AnalysisCache(
+            args.cache_dir, max_bytes=int(args.cache_max_size * 1024 * 1024))
+
+    if args.clear_cache:
+        cache.clear()
+        print(f"Cleared analysis cache: {cache.path}")
+        cache.close()
+        return
+
+    discovery = FileDiscovery(
+        args.directory, include=args.include or (), exclude=args.exclude or (),
+        max_file_size=int(args.max_file_size * 1024) if args.max_file_size is not None else None,
+        ignore_files=not args.no_ignore_files)
+
+    if args.clusters and (args.shard or args.write_store or args.store or args.verify_recall
+                          or args.incremental or args.ndjson or args.skip_identical
+                          or args.changed_since or args.changed_files):
+        parser.error("--clusters cannot be combined with other scan modes, --ndjson, "
+                     "--skip-identical, --changed-since or --changed-files")
+
+    changed_files = None
+    if args.changed_since or args.changed_files:
+        if args.changed_since and args.changed_files:
+            parser.error("--changed-since cannot be combined with --changed-files")
+        if args.shard or args.write_store or args.store or args.verify_recall or args.exact_only \
+                or args.incremental:
+            parser.error("--changed-since and --changed-files cannot be combined with --shard, "
+                         "--write-store, --store, --verify-recall, --exact-only or --incremental")
+        try:
+            if args.changed_since:
+                changed_files = git_changed_files(args.directory, args.changed_since)
+            else:
+                changed_files = read_file_list(args.changed_files)
+        except ValueError as e:
+            if cache is not None:
+                cache.close()
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.shard:
+        if args.incremental or args.skip_identical or args.exact_only or args.verify_recall \
+                or args.store or args.write_store or args.ndjson or args.compact:
+            parser.error("--shard cannot be combined with other scan modes or --compact")
+        try:
+            shard, shard_count = parse_shard(args.shard)
+            partial = scan_shard(
+                args.directory, shard, shard_count, args.threshold, cache=cache,
+                workers=args.jobs, prune=args.prune, readers=args.readers,
+                discovery=discovery)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if cache is not None:
+                cache.close()
+        print(json.dumps(partial))
+        return
+
+    if args.write_store:
+        try:
+            store = write_directory_store(
+                args.directory, args.write_store, cache=cache, workers=args.jobs,
+                readers=args.readers, discovery=discovery)
+        except (ValueError, ImportError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if cache is not None:
+                cache.close()
+        print(f"Wrote {len(store)} functions of {len(store.paths)} files to {args.write_store}")
+        return
+
+    store = None
+    if args.store:
+        if args.incremental or args.skip_identical or args.exact_only or args.verify_recall:
+            parser.error("--store cannot be combined with --incremental, --skip-identical, "
+                         "--exact-only or --verify-recall")
+        try:
+            store = MetricsStore(args.store)
+        except (ValueError, ImportError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.verify_recall:
+        try:
+            report = verify_pruning_recall(
+                args.directory, args.threshold, cache=cache, workers=args.jobs,
+                readers=args.readers, discovery=discovery)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if cache is not None:
+                cache.close()
+
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print(f"Pruned scan pairs: {report['pruned_count']}")
+            print(f"Brute-force scan pairs: {report['brute_force_count']}")
+            print(f"Recall: {report['recall'] * 100:.2f}%")
+            for missed in report['missed']:
+                print(f"Missed: {missed['file1']} <-> {missed['file2']}")
+        sys.exit(1 if report['missed'] else 0)
+
+    if args.clusters:
+        try:
+            report = find_clone_clusters(
+                args.directory, args.threshold, cache=cache, workers=args.jobs,
+                exact=args.exact_only, readers=args.readers, discovery=discovery)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if cache is not None:
+                cache.close()
+
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print(f"DeepCSIM Clone Clusters for: {args.directory}")
+            print(f"Clusters: {report['count']} ({report['functions_clustered']} functions)")
+            print("-" * 50)
+            for cluster in report['clusters']:
+                kind = "identical" if cluster['exact'] else "similar"
+                print(f"{cluster['size']} {kind} functions in {cluster['files']} files:")
+                for member in cluster['members']:
+                    print(f"  {member['file']}:{member['lines']} {member['name']}")
+                print("-" * 50)
+        return
+
+    if args.exact_only:
+        try:
+            groups = find_exact_duplicates(
+                args.directory, cache=cache, workers=args.jobs, readers=args.readers,
+                discovery=discovery)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if cache is not None:
+                cache.close()
+
+        if args.json:
+            print(json.dumps(groups, indent=2))
+        else:
+            print(f"DeepCSIM Exact Duplicates for: {args.directory}")
+            print(f"Identical File Groups: {len(groups['files'])}")
+            print(f"Identical Function Groups: {len(groups['functions'])}")
+            print("-" * 50)
+            for group in groups['files']:
+                for path in group['files']:
+                    print(f"File: {path}")
+                print("-" * 50)
+            for group in groups['functions']:
+                for func in group['functions']:
+                    print(f"Function: {func['file']}:{func['lines']} {func['name']}")
+                print("-" * 50)
+        return
+
+    if args.skip_identical and (args.ndjson or args.incremental):
+        parser.error("--skip-identical cannot be combined with --ndjson or --incremental")
+
+    if args.ndjson:
+        if args.incremental or args.compact:
+            parser.error("--ndjson cannot be combined with --incremental or --compact")
+        try:
+            if store is not None:
+                entries = iter_scan_store(store, args.threshold)
+            else:
+                entries = iter_scan_directory(
+                    args.directory, args.threshold, cache=cache, workers=args.jobs,
+                    prune=args.prune, readers=args.readers, discovery=discovery,
+                    changed_files=changed_files)
+            for entry in entries:
+                sys.stdout.write(json.dumps(entry) + "\n")
+                sys.stdout.flush()
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
+    state = ScanState.load(args.incremental) if args.incremental else None
+
     try:
-        results = scan_directory(args.directory, args.threshold)
+        if store is not None:
+            results = scan_store(store, args.threshold, compact=args.compact)
+        else:
+            results = scan_directory(
+                args.directory, args.threshold, cache=cache, workers=args.jobs,
+                prune=args.prune, state=state, compact=args.compact,
+                skip_identical=args.skip_identical, readers=args.readers,
+                discovery=discovery, changed_files=changed_files)
     except ValueError as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
 
-    if args.json:
-        print(json.dumps(results, indent=2))
-    else:
-        print(f"DeepCSIM Scan Results for: {args.directory}")
-        print(f"Total Similar Pairs Found: {results['count']}")
-        print("-" * 50)
-        for res in results['results']:
-            print(f"File 1: {res['file1']}")
-            print(f"File 2: {res['file2']}")
-            print(f"Similarity: {res['similarity']}%")
-            print(f"Reason: {res['reason']}")
-            print("-" * 50)
+    if state is not None:
+        state.save(args.incremental)
+
+    _print_results(results, args.store or args.directory, args.json, state)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,21 @@
-from typing import Set
+import os
+from typing import Set, Tuple
 
 # Default directories and files to ignore during scans
-IGNORED_NAMES: Set[str] = {'.venv', 'venv', '__pycache__'}
+IGNORED_NAMES: Set[str] = {'.venv', 'venv', '__pycache__', 'node_modules', 'site-packages'}
+
+# Files with gitignore-style patterns of paths to leave out of scans
+IGNORE_FILES: Tuple[str, ...] = ('.gitignore', '.deepcsimignore')
+
+# Generated files left out of scans (gitignore-style patterns)
+DEFAULT_EXCLUDES: Tuple[str, ...] = ('*_pb2.py', '*_pb2_grpc.py')
+
+# Default location and size bound of the persistent analysis cache
+DEFAULT_CACHE_DIR: str = os.environ.get(
+    'DEEPCSIM_CACHE_DIR',
+    os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'deepcsim'),
+)
+DEFAULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
 
 def is_ignored(name: str) -> bool:
     """
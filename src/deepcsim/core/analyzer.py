@@ -1,9 +1,14 @@
 import ast
+import re
 import hashlib
 from collections import defaultdict
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
+from . import profiling
 from .metrics import FunctionMetrics
 
+# Bump whenever the extracted metrics change so cached analyses are invalidated
+ANALYZER_VERSION = "1"
+
 class ASTAnalyzer(ast.NodeVisitor):
     def __init__(self):
         self.current_depth = 0
@@ -55,58 +60,236 @@ class ASTAnalyzer(ast.NodeVisitor):
         self.generic_visit(node)
 
 
+# Fields left out of the structural hash so that renamed code hashes the same
+_SKIPPED_FIELDS = frozenset(('name', 'id', 'arg', 's', 'n'))
+_FUNCTION_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef)
+_BRANCH_TYPES = frozenset(('If', 'While', 'For'))
+
+# Mirrors the line splitting used by ast.get_source_segment
+_LINE_PATTERN = re.compile(r'(.*?(?:\r\n|\n|\r|$))')
+
+
+class _FunctionFrame:
+    """Features accumulated for one function while the tree is traversed."""
+
+    __slots__ = (
+        'node', 'tree_depth', 'order', 'depth_base', 'max_depth', 'complexity',
+        'statements', 'node_counts', 'function_calls', 'variables', 'hasher',
+    )
+
+    def __init__(self, node: ast.AST, tree_depth: int, order: int, depth_base: int):
+        self.node = node
+        self.tree_depth = tree_depth
+        self.order = order
+        self.depth_base = depth_base
+        self.max_depth = 0
+        self.complexity = 1
+        self.statements = 0
+        self.node_counts: Dict[str, int] = {}
+        self.function_calls = set()
+        self.variables = set()
+        self.hasher = hashlib.md5()
+
+
+class _FeatureExtractor:
+    """
+    Single-pass extraction of the features of every function in a tree.
+
+    Produces the same values as running `ASTAnalyzer`, counting statements
+    with `ast.walk` and hashing the structure string of each function (node
+    classes and fields, without names) separately, in one traversal. Every
+    node updates all enclosing functions, so nested functions are never
+    traversed twice, and the structural hash is streamed into MD5 in bounded
+    chunks instead of building the whole structure string.
+    """
+
+    # Number of buffered structure pieces flushed into the hashes at once
+    FLUSH_PIECES = 4096
+
+    def __init__(self):
+        self.frames: List[_FunctionFrame] = []
+        self.finished: List[_FunctionFrame] = []
+        self.pieces: List[str] = []
+        self.loop_depth = 0
+        self.order = 0
+
+    def run(self, tree: ast.AST) -> List[_FunctionFrame]:
+        """Traverse `tree` and return the frames of its functions in `ast.walk` order."""
+        self._visit(tree, 0, True)
+        # ast.walk is breadth-first, which orders nodes by depth, then preorder
+        return sorted(self.finished, key=lambda frame: (frame.tree_depth, frame.order))
+
+    def _flush(self) -> None:
+        if self.pieces:
+            if self.frames:
+                chunk = "".join(self.pieces).encode()
+                for frame in self.frames:
+                    frame.hasher.update(chunk)
+            self.pieces.clear()
+
+    def _visit(self, node: ast.AST, tree_depth: int, emit: bool) -> None:
+        frame = None
+        if isinstance(node, _FUNCTION_TYPES):
+            # Pieces so far belong to the enclosing functions only
+            self._flush()
+            frame = _FunctionFrame(node, tree_depth, self.order, self.loop_depth)
+            self.frames.append(frame)
+        self.order += 1
+
+        frames = self.frames
+        name = type(node).__name__
+        branch = name in _BRANCH_TYPES
+        if branch:
+            self.loop_depth += 1
+
+        if frames:
+            is_stmt = isinstance(node, ast.stmt)
+            call_name = None
+            if name == 'Call':
+                if isinstance(node.func, ast.Name):
+                    call_name = node.func.id
+                elif isinstance(node.func, ast.Attribute):
+                    call_name = node.func.attr
+            variable = node.id if name == 'Name' and isinstance(node.ctx, ast.Load) else None
+
+            for active in frames:
+                counts = active.node_counts
+                counts[name] = counts.get(name, 0) + 1
+                if is_stmt:
+                    active.statements += 1
+                if branch:
+                    active.complexity += 1
+                    depth = self.loop_depth - active.depth_base
+                    if depth > active.max_depth:
+                        active.max_depth = depth
+                elif name == 'ExceptHandler':
+                    active.complexity += 1
+                if call_name is not None:
+                    active.function_calls.add(call_name)
+                if variable is not None:
+                    active.variables.add(variable)
+
+        pieces = self.pieces
+        emitting = emit and bool(frames)
+        if emitting:
+            pieces.append(name + "(")
+
+        first = True
+        for field, value in ast.iter_fields(node):
+            hashed = emit and field not in _SKIPPED_FIELDS
+            keep = emitting and hashed
+            if keep:
+                pieces.append(field + ":" if first else "," + field + ":")
+                first = False
+            if isinstance(value, list):
+                if keep:
+                    pieces.append("[")
+                for position, item in enumerate(value):
+                    if keep and position:
+                        pieces.append(",")
+                    if isinstance(item, ast.AST):
+                        self._visit(item, tree_depth + 1, hashed)
+                if keep:
+                    pieces.append("]")
+            elif isinstance(value, ast.AST):
+                self._visit(value, tree_depth + 1, hashed)
+
+        if emitting:
+            pieces.append(")")
+            if len(pieces) >= self.FLUSH_PIECES:
+                self._flush()
+
+        if branch:
+            self.loop_depth -= 1
+
+        if frame is not None:
+            self._flush()
+            frames.pop()
+            self.finished.append(frame)
+
+
 class CodeAnalyzer:
-    def __init__(self, source: str, filename: str):
+    def __init__(self, source: str, filename: str, lazy_source: bool = False):
+        """
+        With `lazy_source`, function sources are not kept in memory but read
+        back from `filename` when accessed; `source` must then be the text
+        of that file as read by the scanner.
+        """
         self.source = source
         self.filename = filename
+        self.lazy_source = lazy_source
         self.functions: Dict[str, FunctionMetrics] = {}
         self.lines = source.split('\n')
+        self._source_lines: Optional[List[str]] = None
+        self._line_offsets: Optional[List[int]] = None
     
     def analyze(self):
         try:
-            tree = ast.parse(self.source, filename=self.filename)
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                    metrics = self._extract_metrics(node)
-                    self.functions[node.name] = metrics
+            with profiling.phase("analyze.parse"):
+                tree = ast.parse(self.source, filename=self.filename)
         except SyntaxError as e:
             raise ValueError(f"Syntax error: {e}")
+
+        # One pass extracts every metric, including the structure hash
+        with profiling.phase("analyze.extract"):
+            for frame in _FeatureExtractor().run(tree):
+                self.functions[frame.node.name] = self._build_metrics(frame)
+        profiling.count("functions", len(self.functions))
     
-    def _extract_metrics(self, func_node: ast.FunctionDef) -> FunctionMetrics:
-        func_source = ast.get_source_segment(self.source, func_node)
-        analyzer = ASTAnalyzer()
-        analyzer.visit(func_node)
-        
-        num_args = len(func_node.args.args)
-        num_statements = len([n for n in ast.walk(func_node) if isinstance(n, ast.stmt)]) - 1
-        
-        ast_structure = self._get_ast_structure(func_node)
-        ast_hash = hashlib.md5(ast_structure.encode()).hexdigest()
-        
+    def _build_metrics(self, frame: _FunctionFrame) -> FunctionMetrics:
+        func_node = frame.node
+        source_span = self._get_byte_span(func_node) if self.lazy_source else None
+        if source_span is None:
+            func_source = self._get_source_segment(func_node) or ""
+        else:
+            func_source = None
+
         return FunctionMetrics(
             name=func_node.name,
-            source=func_source or "",
+            source=func_source,
+            source_path=self.filename if source_span is not None else None,
+            source_span=source_span,
             line_start=func_node.lineno,
             line_end=func_node.end_lineno or func_node.lineno,
-            num_statements=num_statements,
-            num_args=num_args,
-            cyclomatic_complexity=analyzer.complexity,
-            nesting_depth=analyzer.max_depth,
-            node_types=dict(analyzer.node_counts),
-            called_functions=analyzer.function_calls,
-            variables_used=analyzer.variables,
-            ast_hash=ast_hash
+            num_statements=frame.statements - 1,
+            num_args=len(func_node.args.args),
+            cyclomatic_complexity=frame.complexity,
+            nesting_depth=frame.max_depth,
+            node_types=frame.node_counts,
+            called_functions=frame.function_calls,
+            variables_used=frame.variables,
+            ast_hash=frame.hasher.hexdigest()
         )
-    
-    def _get_ast_structure(self, node: ast.AST) -> str:
-        if isinstance(node, ast.AST):
-            fields = []
-            for field, value in ast.iter_fields(node):
-                if field in ('name', 'id', 'arg', 's', 'n'):
-                    continue
-                if isinstance(value, list):
-                    fields.append(f"{field}:[{','.join(self._get_ast_structure(item) for item in value)}]")
-                else:
-                    fields.append(f"{field}:{self._get_ast_structure(value)}")
-            return f"{node.__class__.__name__}({','.join(fields)})"
-        return ""
+
+    def _get_byte_span(self, node: ast.AST) -> Optional[Tuple[int, int]]:
+        """Offsets of the source of `node` in the UTF-8 encoded source."""
+        if node.end_lineno is None or node.end_col_offset is None:
+            return None
+        if self._line_offsets is None:
+            if self._source_lines is None:
+                self._source_lines = _LINE_PATTERN.findall(self.source)
+            offsets = [0]
+            for line in self._source_lines:
+                offsets.append(offsets[-1] + len(line.encode()))
+            self._line_offsets = offsets
+
+        offsets = self._line_offsets
+        return (offsets[node.lineno - 1] + node.col_offset,
+                offsets[node.end_lineno - 1] + node.end_col_offset)
+
+    def _get_source_segment(self, node: ast.AST) -> Optional[str]:
+        """Same as `ast.get_source_segment`, without re-splitting the source for every node."""
+        if node.end_lineno is None or node.end_col_offset is None:
+            return None
+        if self._source_lines is None:
+            self._source_lines = _LINE_PATTERN.findall(self.source)
+
+        lines = self._source_lines
+        lineno = node.lineno - 1
+        end_lineno = node.end_lineno - 1
+        if end_lineno == lineno:
+            return lines[lineno].encode()[node.col_offset:node.end_col_offset].decode()
+
+        first = lines[lineno].encode()[node.col_offset:].decode()
+        last = lines[end_lineno].encode()[:node.end_col_offset].decode()
+        return ''.join([first, *lines[lineno + 1:end_lineno], last])
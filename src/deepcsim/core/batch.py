@@ -0,0 +1,336 @@
+"""
+Vectorized batch scoring of function pairs.
+
+`MetricsMatrix` packs the metrics of many functions into NumPy arrays
+(node-type count matrix, metric columns, CSR arrays of called-function ids)
+and scores whole blocks of pairs at once. Every operation mirrors the scalar
+code in `SimilarityCalculator` step by step, so rounded scores are
+bit-for-bit identical to `calculate_all`. Without NumPy the same interface
+falls back to the scalar implementation.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from . import profiling
+from .metrics import FunctionMetrics
+from .similarity import METRIC_WEIGHTS, ROUNDING_SLACK, SimilarityCalculator
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is an optional dependency
+    np = None
+
+HAS_NUMPY = np is not None
+
+# Number of pairs scored per vectorized step; bounds temporary memory
+CHUNK_SIZE = 8192
+
+SCORE_KEYS = ('structural', 'semantic', 'metric', 'composite')
+
+
+def _gather_rows(indptr, indices, rows):
+    """Concatenate the CSR rows `rows` and return (values, owning position)."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    owner = np.repeat(np.arange(len(rows)), lengths)
+    if total == 0:
+        return indices[:0], owner
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.arange(total) - np.repeat(offsets, lengths) + np.repeat(starts, lengths)
+    return indices[positions], owner
+
+
+class MetricsMatrix:
+    """Columnar packing of a sequence of FunctionMetrics for batch scoring."""
+
+    def __init__(self, functions: Sequence[FunctionMetrics]):
+        self.functions = list(functions)
+        self.vectorized = HAS_NUMPY
+        if self.vectorized:
+            self._pack()
+
+    @classmethod
+    def from_store(cls, store) -> "MetricsMatrix":
+        """
+        Score the functions of a `MetricsStore` directly from its columns.
+
+        The memory-mapped columns are used as they are; functions are only
+        built from the store by the non-vectorized fallback.
+        """
+        matrix = cls.__new__(cls)
+        matrix.functions = store
+        matrix.vectorized = True
+        matrix.node_counts = store.node_counts
+        matrix.hash_ids = store.hash_ids
+        matrix.metric_columns = store.metric_columns
+        matrix.num_variables = store.num_variables
+        matrix.calls_indptr = store.calls_indptr
+        matrix.calls_indices = store.calls_indices
+        matrix.num_symbols = store.num_strings
+        return matrix
+
+    def __len__(self) -> int:
+        return len(self.functions)
+
+    def _pack(self) -> None:
+        functions = self.functions
+        count = len(functions)
+
+        # Node types are laid out in id order, matching the order in which
+        # calculate_structural sums them.
+        node_types = sorted({t for func in functions for t in func.node_type_ids})
+        column = {node_type: i for i, node_type in enumerate(node_types)}
+        self.node_counts = np.zeros((count, len(node_types)), dtype=np.int64)
+        for row, func in enumerate(functions):
+            for node_type, value in zip(func.node_type_ids, func.node_type_counts):
+                self.node_counts[row, column[node_type]] = value
+
+        hash_ids: Dict[str, int] = {}
+        self.hash_ids = np.array(
+            [hash_ids.setdefault(func.ast_hash, len(hash_ids)) for func in functions],
+            dtype=np.int64,
+        )
+
+        self.metric_columns = np.array(
+            [[getattr(func, name) for name, _ in METRIC_WEIGHTS] for func in functions],
+            dtype=np.int64,
+        ).reshape(count, len(METRIC_WEIGHTS))
+        self.num_variables = np.array(
+            [func.num_variables for func in functions], dtype=np.int64)
+
+        # Call ids are interned process-wide; renumber them densely
+        symbol_ids: Dict[int, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        for func in functions:
+            indices.extend(symbol_ids.setdefault(symbol, len(symbol_ids))
+                           for symbol in func.call_ids)
+            indptr.append(len(indices))
+        self.calls_indptr = np.array(indptr, dtype=np.int64)
+        self.calls_indices = np.array(indices, dtype=np.int64)
+        self.num_symbols = len(symbol_ids)
+
+    def _call_intersections(self, left, right):
+        """Size of the called-function intersection of each pair."""
+        values_l, owner_l = _gather_rows(self.calls_indptr, self.calls_indices, left)
+        values_r, owner_r = _gather_rows(self.calls_indptr, self.calls_indices, right)
+        # Each set holds distinct ids, so a key seen twice is shared by the pair
+        stride = max(self.num_symbols, 1)
+        keys = np.sort(np.concatenate([owner_l * stride + values_l, owner_r * stride + values_r]))
+        shared = keys[1:][keys[1:] == keys[:-1]] // stride
+        return np.bincount(shared, minlength=len(left))
+
+    def _structural(self, left, right):
+        # Structural: mean over the node-type union of 1 - |c1 - c2| / max
+        counts_l = self.node_counts[left]
+        counts_r = self.node_counts[right]
+        max_counts = np.maximum(counts_l, counts_r)
+        present = max_counts > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = 1 - np.abs(counts_l - counts_r) / max_counts
+        terms[~present] = 0.0
+        union = present.sum(axis=1)
+        # cumsum accumulates sequentially, like the scalar loop
+        sums = np.cumsum(terms, axis=1)[:, -1] if terms.shape[1] else np.zeros(len(left))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            structural = np.where(union > 0, (sums / union) * 100, 0.0)
+        structural[self.hash_ids[left] == self.hash_ids[right]] = 100.0
+        return structural
+
+    def _semantic(self, left, right):
+        # Semantic: Jaccard of called functions and variable count ratio
+        intersection = self._call_intersections(left, right)
+        calls_len_l = self.calls_indptr[left + 1] - self.calls_indptr[left]
+        calls_len_r = self.calls_indptr[right + 1] - self.calls_indptr[right]
+        calls_union = calls_len_l + calls_len_r - intersection
+        vars_l = self.num_variables[left]
+        vars_r = self.num_variables[right]
+        max_vars = np.maximum(vars_l, vars_r)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            calls_sim = np.where(calls_union > 0, intersection / calls_union * 100, 100.0)
+            vars_sim = np.where(max_vars > 0, (1 - np.abs(vars_l - vars_r) / max_vars) * 100, 100.0)
+        return calls_sim * 0.7 + vars_sim * 0.3
+
+    def _metric(self, left, right):
+        # Metric: weighted ratio of scalar metrics, skipping all-zero ones
+        weighted_sum = np.zeros(len(left))
+        total_weight = np.zeros(len(left))
+        for position, (_, weight) in enumerate(METRIC_WEIGHTS):
+            val_l = self.metric_columns[left, position]
+            val_r = self.metric_columns[right, position]
+            max_val = np.maximum(val_l, val_r)
+            valid = max_val > 0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                metric_sim = (1 - np.abs(val_l - val_r) / max_val) * 100
+            weighted_sum = weighted_sum + np.where(valid, metric_sim * weight, 0.0)
+            total_weight = total_weight + np.where(valid, weight, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total_weight > 0, weighted_sum / total_weight, 0.0)
+
+    def _score_chunk(self, left, right, threshold: Optional[float] = None) -> Dict[str, "np.ndarray"]:
+        metric = self._metric(left, right)
+        semantic = self._semantic(left, right)
+        if threshold is None:
+            structural = self._structural(left, right)
+            profiling.count("function_pairs_scored", len(left))
+        else:
+            # As in calculate_if_above: pairs whose composite cannot reach the
+            # threshold even with a perfect structural score are not compared
+            # structurally, and keep that bound as their composite.
+            structural = np.full(len(left), 100.0)
+            bound = structural * 0.5 + semantic * 0.3 + metric * 0.2
+            viable = np.flatnonzero(bound >= threshold - ROUNDING_SLACK)
+            if len(viable):
+                structural[viable] = self._structural(left[viable], right[viable])
+            profiling.count("function_pairs_scored", len(viable))
+            profiling.count("function_pairs_pruned", len(left) - len(viable))
+
+        composite = (structural * 0.5 + semantic * 0.3 + metric * 0.2)
+        return {
+            'structural': structural,
+            'semantic': semantic,
+            'metric': metric,
+            'composite': composite,
+        }
+
+    def score_pairs(
+        self,
+        left: Sequence[int],
+        right: Sequence[int],
+        threshold: Optional[float] = None,
+    ) -> Dict[str, "np.ndarray"]:
+        """
+        Return unrounded score arrays for the pairs (left[k], right[k]).
+
+        With `threshold`, pairs that cannot reach it are rejected before
+        their structural comparison: their composite is an upper bound below
+        the threshold and their structural score is meaningless. Requires NumPy.
+        """
+        left = np.asarray(left, dtype=np.int64)
+        right = np.asarray(right, dtype=np.int64)
+        with profiling.phase("batch.score_pairs"):
+            parts = [
+                self._score_chunk(
+                    left[start:start + CHUNK_SIZE], right[start:start + CHUNK_SIZE], threshold)
+                for start in range(0, len(left), CHUNK_SIZE)
+            ]
+        if not parts:
+            return {key: np.zeros(0) for key in SCORE_KEYS}
+        return {key: np.concatenate([part[key] for part in parts]) for key in SCORE_KEYS}
+
+    def score_block(
+        self,
+        rows: Sequence[int],
+        cols: Sequence[int],
+        threshold: Optional[float] = None,
+    ) -> List[List[Optional[Dict[str, float]]]]:
+        """
+        Return the rows x cols matrix of rounded `calculate_all` results.
+
+        With `threshold`, pairs whose composite does not reach it are None,
+        and are rejected early like with `calculate_if_above`.
+        """
+        rows = list(rows)
+        cols = list(cols)
+        if not self.vectorized:
+            if threshold is not None:
+                return [
+                    [SimilarityCalculator.calculate_if_above(
+                        self.functions[i], self.functions[j], threshold) for j in cols]
+                    for i in rows
+                ]
+            return [
+                [SimilarityCalculator.calculate_all(self.functions[i], self.functions[j]) for j in cols]
+                for i in rows
+            ]
+        if not rows or not cols:
+            return [[] for _ in rows]
+
+        left = np.repeat(np.asarray(rows, dtype=np.int64), len(cols))
+        right = np.tile(np.asarray(cols, dtype=np.int64), len(rows))
+        scores = self.score_pairs(left, right, threshold)
+        columns = [scores[key].tolist() for key in SCORE_KEYS]
+
+        flat = [
+            {
+                'structural': round(structural, 2),
+                'semantic': round(semantic, 2),
+                'metric': round(metric, 2),
+                'composite': round(composite, 2)
+            }
+            for structural, semantic, metric, composite in zip(*columns)
+        ]
+        if threshold is not None:
+            flat = [entry if entry['composite'] >= threshold else None for entry in flat]
+        width = len(cols)
+        return [flat[i * width:(i + 1) * width] for i in range(len(rows))]
+
+    def iter_block_maxima(
+        self,
+        blocks: Iterable[Tuple[Sequence[int], Sequence[int]]],
+        threshold: Optional[float] = None,
+    ) -> Iterator[Optional[float]]:
+        """
+        Yield the maximum rounded composite score of each (rows, cols) block.
+
+        Consecutive blocks are scored together in large vectorized batches.
+        Yields None for empty blocks. With `threshold`, pairs that cannot
+        reach it are rejected early, and a block's value is only exact if it
+        reaches the threshold: otherwise it is some score below it. Without
+        NumPy, blocks are scored pair by pair when `threshold` is given and
+        None is yielded otherwise, leaving the caller to score blocks
+        individually.
+        """
+        pending: List[Tuple[Sequence[int], Sequence[int]]] = []
+        pending_pairs = 0
+        for rows, cols in blocks:
+            if not self.vectorized:
+                yield None if threshold is None else self._scalar_block_maximum(rows, cols, threshold)
+                continue
+            pending.append((rows, cols))
+            pending_pairs += len(rows) * len(cols)
+            if pending_pairs >= CHUNK_SIZE * 8:
+                yield from self._block_maxima(pending, threshold)
+                pending = []
+                pending_pairs = 0
+        if pending:
+            yield from self._block_maxima(pending, threshold)
+
+    def _scalar_block_maximum(self, rows: Sequence[int], cols: Sequence[int], threshold: float) -> Optional[float]:
+        best = None
+        for i in rows:
+            for j in cols:
+                # Pairs that cannot beat the best score so far are rejected early too
+                floor = threshold if best is None else max(threshold, best)
+                _, composite = SimilarityCalculator.bounded_scores(
+                    self.functions[i], self.functions[j], floor)
+                composite = round(composite, 2)
+                if best is None or composite > best:
+                    best = composite
+        return best
+
+    def _block_maxima(
+        self,
+        blocks: List[Tuple[Sequence[int], Sequence[int]]],
+        threshold: Optional[float] = None,
+    ) -> List[Optional[float]]:
+        lefts = []
+        rights = []
+        sizes = []
+        for rows, cols in blocks:
+            rows = np.asarray(rows, dtype=np.int64)
+            cols = np.asarray(cols, dtype=np.int64)
+            lefts.append(np.repeat(rows, len(cols)))
+            rights.append(np.tile(cols, len(rows)))
+            sizes.append(len(rows) * len(cols))
+
+        composite = self.score_pairs(
+            np.concatenate(lefts), np.concatenate(rights), threshold)['composite']
+        maxima: List[Optional[float]] = []
+        start = 0
+        for size in sizes:
+            # round() is monotonic, so the max of rounded scores is the rounded max
+            maxima.append(round(float(composite[start:start + size].max()), 2) if size else None)
+            start += size
+        return maxima
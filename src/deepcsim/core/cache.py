@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional, Any
+
+from deepcsim.core.analyzer import ANALYZER_VERSION
+from deepcsim.core.metrics import FunctionMetrics
+from deepcsim.constants import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES
+
+
+CACHE_FILENAME = "analysis.sqlite3"
+
+
+def content_hash(source: str) -> str:
+    """Return the digest used to detect changes in a file's content."""
+    return hashlib.sha1(source.encode("utf-8", errors="ignore")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Persistent SQLite store of analyzed functions.
+
+    Entries are keyed by absolute file path, content hash and analyzer
+    version, so a file is only re-analyzed when its content changes or the
+    analyzer itself is upgraded. The store is bounded in size: once the
+    payloads exceed `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.path = os.path.join(self.cache_dir, CACHE_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " path TEXT PRIMARY KEY,"
+            " content_hash TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " payload BLOB NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, path: str, digest: str) -> Optional[Dict[str, FunctionMetrics]]:
+        """Return the cached functions of `path`, or None on a miss."""
+        key = os.path.abspath(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM entries WHERE path = ? AND content_hash = ? AND version = ?",
+                (key, digest, ANALYZER_VERSION),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed = ? WHERE path = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+
+        items = json.loads(zlib.decompress(row[0]))
+        return {name: FunctionMetrics.from_dict(data) for name, data in items}
+
+    def put(self, path: str, digest: str, functions: Dict[str, FunctionMetrics]) -> None:
+        """Store the analyzed functions of `path`, evicting old entries if needed."""
+        key = os.path.abspath(path)
+        payload = zlib.compress(json.dumps(
+            [[name, metrics.to_dict()] for name, metrics in functions.items()]
+        ).encode("utf-8"))
+
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM entries WHERE path = ?", (key,)).fetchone()
+            if previous is not None:
+                self._total_bytes -= previous[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, digest, ANALYZER_VERSION, time.time(), len(payload), payload),
+            )
+            self._total_bytes += len(payload)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the store fits in `max_bytes`."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT path, size FROM entries ORDER BY accessed ASC").fetchall()
+        for path, size in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+            self._total_bytes -= size
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current store size."""
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": self._total_bytes,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "AnalysisCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,62 @@
+"""
+Changed-file lists for diff-scoped scans.
+
+Pull-request gating only needs to know whether new or modified code
+duplicates existing code. `git_changed_files` asks the local git for the
+files changed since a revision, and `read_file_list` reads a list produced
+by other tools; `scan_directory(changed_files=...)` then scores only the
+pairs involving one of those files.
+"""
+
+import os
+import subprocess
+import sys
+from typing import List
+
+
+def _git(directory: str, *args: str) -> str:
+    try:
+        completed = subprocess.run(
+            ["git", *args], cwd=directory, capture_output=True, text=True, check=False)
+    except OSError as e:
+        raise ValueError(f"Could not run git: {e}") from e
+    if completed.returncode != 0:
+        message = completed.stderr.strip().splitlines()
+        raise ValueError(f"git {args[0]} failed: {message[-1] if message else completed.returncode}")
+    return completed.stdout
+
+
+def git_changed_files(directory: str, rev: str) -> List[str]:
+    """
+    Return the absolute paths of the files changed since `rev` in the git
+    repository containing `directory`.
+
+    Changes are taken against the merge base of `rev` and HEAD, so commits
+    made on `rev` since the branch point do not count, and include
+    uncommitted and untracked (not ignored) files. Raises ValueError if git
+    is missing, `directory` is not in a repository or `rev` is unknown.
+    """
+    if not os.path.isdir(directory):
+        raise ValueError("Directory does not exist")
+    toplevel = _git(directory, "rev-parse", "--show-toplevel").strip()
+    base = _git(directory, "merge-base", rev, "HEAD").strip()
+    names = _git(directory, "diff", "--name-only", "-z", "--no-renames", base, "--").split("\0")
+    names += _git(toplevel, "ls-files", "--others", "--exclude-standard", "-z").split("\0")
+    return [os.path.join(toplevel, *name.split("/")) for name in dict.fromkeys(names) if name]
+
+
+def read_file_list(path: str) -> List[str]:
+    """
+    Read one path per line from a file ("-" for stdin), skipping blank lines.
+
+    Relative paths are taken relative to the working directory.
+    """
+    try:
+        if path == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+    except OSError as e:
+        raise ValueError(f"Could not read file list: {e}") from e
+    return [os.path.abspath(line.strip()) for line in lines if line.strip()]
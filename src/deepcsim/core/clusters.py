@@ -0,0 +1,161 @@
+"""
+Function-level clone classes.
+
+File pair reports repeat a function copied into n files n(n-1)/2 times.
+`cluster_functions` groups functions into clone classes instead: functions
+with the same AST hash are merged in one linear pass, then the pairs the
+candidate index cannot rule out are scored and every pair reaching the
+threshold merges the classes of its functions (single linkage, with a
+union-find). Candidate pairs are generated lazily, batch by batch, and
+pairs whose functions already are in one class are neither kept nor
+scored, so copies of the same code cost nothing beyond the hash pass.
+"""
+
+from collections import defaultdict
+from itertools import combinations, islice
+from typing import Any, Dict, Iterator, List, Tuple
+
+from deepcsim.core import profiling
+from deepcsim.core.batch import MetricsMatrix
+from deepcsim.core.index import CandidateIndex, min_structural_jaccard
+from deepcsim.core.metrics import FunctionMetrics
+from deepcsim.core.similarity import SimilarityCalculator
+
+# Candidate pairs scored per batch
+LINK_BATCH = 4096
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1, with union by size and path halving."""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> bool:
+        """Merge the sets of `a` and `b`; return False if they already were one."""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+
+def _iter_unlinked_pairs(
+    functions: List[FunctionMetrics], sets: UnionFind, threshold: float,
+) -> Iterator[Tuple[int, int]]:
+    """
+    Yield the function pairs that may reach `threshold`, skipping pairs
+    whose functions already are in one class when the pair is generated.
+    """
+    if min_structural_jaccard(threshold) == 0:
+        # No pair can be ruled out by its node types: the index would not prune
+        for i, j in combinations(range(len(functions)), 2):
+            if sets.find(i) != sets.find(j):
+                yield i, j
+        return
+
+    index = CandidateIndex(threshold)
+    for func_id, func in enumerate(functions):
+        # Every function is its own owner: clones within a file count too
+        index.add(func, owner=func_id)
+    yield from index.iter_candidate_function_pairs(skip=lambda a, b: sets.find(a) == sets.find(b))
+
+
+def _link_similar(functions: List[FunctionMetrics], sets: UnionFind, threshold: float) -> int:
+    """Union the functions of every pair scoring at least `threshold`; return the pairs scored."""
+    matrix = MetricsMatrix(functions)
+    # Generated lazily, so each batch skips the pairs joined by earlier batches
+    pairs = _iter_unlinked_pairs(functions, sets, threshold)
+    scored = 0
+    with profiling.phase("clusters.link"):
+        while True:
+            batch = list(islice(pairs, LINK_BATCH))
+            if not batch:
+                return scored
+            scored += len(batch)
+            if matrix.vectorized:
+                composites = matrix.score_pairs(
+                    [i for i, _ in batch], [j for _, j in batch], threshold)["composite"].tolist()
+                links = [pair for pair, composite in zip(batch, composites)
+                         if round(composite, 2) >= threshold]
+            else:
+                links = [(i, j) for i, j in batch if SimilarityCalculator.calculate_if_above(
+                    functions[i], functions[j], threshold) is not None]
+            for i, j in links:
+                sets.union(i, j)
+
+
+def cluster_functions(
+    file_reports: Dict[str, Dict[str, Any]],
+    threshold: float = 80.0,
+    exact: bool = False,
+) -> Dict[str, Any]:
+    """
+    Group the functions of analyzed files into clone classes.
+
+    Functions with the same AST hash are always in one class; unless
+    `exact`, so are functions whose composite similarity reaches
+    `threshold`, transitively. Returns {"count", "clusters",
+    "functions_clustered", "pairs_scored"}: clusters have at least two
+    members, listed in file order with their file, name and lines, plus the
+    source of the first member once. Clusters are sorted by decreasing
+    size, then by first member.
+    """
+    members: List[Tuple[str, str, FunctionMetrics]] = [
+        (path, name, func)
+        for path, report in file_reports.items()
+        for name, func in (report["functions"] or {}).items()
+    ]
+    functions = [func for _, _, func in members]
+    sets = UnionFind(len(members))
+
+    by_hash: Dict[str, int] = {}
+    for func_id, func in enumerate(functions):
+        if not func.ast_hash:
+            continue
+        first = by_hash.setdefault(func.ast_hash, func_id)
+        if first != func_id:
+            sets.union(first, func_id)
+
+    scored = 0 if exact else _link_similar(functions, sets, threshold)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for func_id in range(len(members)):
+        groups[sets.find(func_id)].append(func_id)
+
+    clusters = []
+    for func_ids in sorted((ids for ids in groups.values() if len(ids) > 1),
+                           key=lambda ids: (-len(ids), ids[0])):
+        first = functions[func_ids[0]]
+        clusters.append({
+            "size": len(func_ids),
+            "files": len({members[func_id][0] for func_id in func_ids}),
+            "exact": all(functions[func_id].ast_hash == first.ast_hash for func_id in func_ids),
+            "members": [
+                {
+                    "file": members[func_id][0],
+                    "name": members[func_id][1],
+                    "lines": f"{functions[func_id].line_start}-{functions[func_id].line_end}",
+                }
+                for func_id in func_ids
+            ],
+            "source": first.source,
+        })
+
+    return {
+        "count": len(clusters),
+        "clusters": clusters,
+        "functions_clustered": sum(cluster["size"] for cluster in clusters),
+        "pairs_scored": scored,
+    }
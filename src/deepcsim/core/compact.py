@@ -0,0 +1,86 @@
+"""
+Compact (reference) result format.
+
+Full results embed both function sources in every comparison. In the
+compact format each function is listed once in a side table and
+comparisons refer to it by id:
+
+    {"functions": [{"id": 0, "path": ..., "name": ..., "lines": "3-9",
+                    "ast_hash": ...}, ...],
+     "results": [{..., "comparisons": [{"func1": 0, "func2": 7,
+                                        "similarity": {...}}]}]}
+
+Only comparisons scoring at least the function threshold are kept. Sources
+are left out unless requested; they can be fetched per function instead.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import FunctionMetrics
+
+
+class FunctionTable:
+    """Side table assigning ids to the functions referenced by compact results."""
+
+    def __init__(self, include_source: bool = False):
+        self.include_source = include_source
+        self.rows: List[Dict[str, Any]] = []
+        self._ids: Dict[Tuple[Optional[str], str, str], int] = {}
+
+    def ref(self, path: str, name: str, metrics: FunctionMetrics, side: Optional[str] = None) -> int:
+        """
+        Return the id of a function, adding it to the table if needed.
+
+        Functions are told apart by path and name, and by `side` when given:
+        two uploaded files may share a filename but not their functions.
+        """
+        key = (side, path, name)
+        func_id = self._ids.get(key)
+        if func_id is None:
+            func_id = len(self.rows)
+            row = {
+                "id": func_id,
+                "path": path,
+                "name": name,
+                "lines": f"{metrics.line_start}-{metrics.line_end}",
+                "ast_hash": metrics.ast_hash,
+            }
+            if self.include_source:
+                row["source"] = metrics.source
+            self.rows.append(row)
+            self._ids[key] = func_id
+        return func_id
+
+    def compact_entry(
+        self,
+        entry: Dict[str, Any],
+        path1: str,
+        functions1: Dict[str, FunctionMetrics],
+        path2: str,
+        functions2: Dict[str, FunctionMetrics],
+        function_threshold: Optional[float] = None,
+        by_side: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Return a copy of a result entry whose comparisons refer to table ids.
+
+        Comparisons scoring below `function_threshold` are dropped; the
+        entry's aggregate scores are left untouched. With `by_side`, the
+        functions of each side get their own rows even if both paths are
+        the same.
+        """
+        comparisons = []
+        for comparison in entry["comparisons"]:
+            similarity = comparison["similarity"]
+            if function_threshold is not None and similarity["composite"] < function_threshold:
+                continue
+            name1 = comparison["func1_name"]
+            name2 = comparison["func2_name"]
+            comparisons.append({
+                "func1": self.ref(path1, name1, functions1[name1], "file1" if by_side else None),
+                "func2": self.ref(path2, name2, functions2[name2], "file2" if by_side else None),
+                "similarity": similarity,
+            })
+        compacted = dict(entry)
+        compacted["comparisons"] = comparisons
+        return compacted
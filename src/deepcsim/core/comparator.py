@@ -1,11 +1,14 @@
 from typing import Optional
 from deepcsim.core.analyzer import CodeAnalyzer
+from deepcsim.core.compact import FunctionTable
 from deepcsim.core.similarity import SimilarityCalculator
 
-def compare_source(source1: str, source2: str, filename1: str = "source1", filename2: str = "source2", threshold: float = 0.0) -> dict:
+def compare_source(source1: str, source2: str, filename1: str = "source1", filename2: str = "source2", threshold: float = 0.0, compact: bool = False) -> dict:
     """
     Compare two source code snippets and return the similarity metrics.
     Returns a result format compatible with scan_directory's 'results' item.
+    With `compact`, functions (with their sources) are listed once in a
+    "functions" side table and comparisons refer to them by id.
     """
     analyzer1 = CodeAnalyzer(source1, filename1)
     analyzer1.analyze()
@@ -14,14 +17,17 @@ def compare_source(source1: str, source2: str, filename1: str = "source1", filen
     analyzer2.analyze()
     
     if not analyzer1.functions or not analyzer2.functions:
-        return {'count': 0, 'results': []}
+        return {'count': 0, 'results': [], 'functions': []} if compact else {'count': 0, 'results': []}
         
     pair_comparisons = []
     all_composite_scores = []
     
-    for fname1, func1 in analyzer1.functions.items():
-        for fname2, func2 in analyzer2.functions.items():
-            similarity = SimilarityCalculator.calculate_all(func1, func2)
+    similarities = SimilarityCalculator.calculate_matrix(
+        list(analyzer1.functions.values()), list(analyzer2.functions.values()))
+    
+    for i, (fname1, func1) in enumerate(analyzer1.functions.items()):
+        for j, (fname2, func2) in enumerate(analyzer2.functions.items()):
+            similarity = similarities[i][j]
             score = similarity["composite"]
             all_composite_scores.append(score)
             
@@ -57,4 +63,10 @@ def compare_source(source1: str, source2: str, filename1: str = "source1", filen
         "reason": "High function-level similarity"
     }
     
+    if compact:
+        table = FunctionTable(include_source=True)
+        result_item = table.compact_entry(
+            result_item, filename1, analyzer1.functions, filename2, analyzer2.functions, by_side=True)
+        return {'count': 1, 'results': [result_item], 'functions': table.rows}
+
     return {'count': 1, 'results': [result_item]}
@@ -0,0 +1,419 @@
+"""
+Shared file discovery for scans, the watcher and the file explorer.
+
+A `FileDiscovery` walks a tree skipping `constants.is_ignored` names and
+whatever the `.gitignore` and `.deepcsimignore` files of the tree (and of
+its enclosing git repository) exclude, plus optional include/exclude
+globs and a file size limit. Patterns follow the gitignore syntax and are
+compiled to regular expressions once per ignore file.
+
+Directory listings are cached and revalidated with a single `stat` of the
+directory: entries are only added, removed or renamed when the directory
+mtime changes, so walking an unchanged tree again (a rescan, a refreshed
+index, an explorer request) costs one `stat` per directory instead of a
+`scandir` per directory and a `stat` per entry. File sizes used by the
+size limit are those seen when the directory was last listed.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from deepcsim.core import profiling
+from deepcsim.constants import DEFAULT_EXCLUDES, IGNORE_FILES, is_ignored
+
+# Listings of directories modified this recently are not cached: a change
+# within the same mtime tick would otherwise go unnoticed
+RACY_NANOSECONDS = 2_000_000_000
+
+# Shared discoveries kept by `default_discovery`
+MAX_SHARED = 8
+
+
+class Entry(NamedTuple):
+    """A cached directory entry."""
+    name: str
+    is_dir: bool
+    is_symlink: bool
+    size: Optional[int]
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob (without its anchoring) to a regular expression."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i):
+                if pattern.startswith("**/", i):
+                    # Zero or more directories
+                    out.append("(?:.*/)?")
+                    i += 3
+                else:
+                    out.append(".*")
+                    i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            start = i + 1
+            if pattern[start:start + 1] in ("!", "^"):
+                start += 1
+            # A leading ']' is part of the class
+            end = pattern.find("]", start + 1 if pattern[start:start + 1] == "]" else start)
+            if end < 0:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body[0] in "!^":
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """
+    Compiled gitignore-style patterns, matched against '/'-separated paths
+    relative to the directory the patterns apply to.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        # (regex, negated, directories only), in file order
+        self.rules: List[Tuple["re.Pattern[str]", bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n")
+            if not line.endswith("\\ "):
+                line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated or line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            if "/" in line:
+                # Anchored to the directory of the ignore file
+                regex = _translate(line.lstrip("/"))
+            else:
+                regex = "(?:.*/)?" + _translate(line)
+            self.rules.append((re.compile(regex + r"\Z", re.DOTALL), negated, dir_only))
+
+        # Without negations the last match cannot matter: one regex per kind
+        self._combined = None
+        if self.rules and not any(negated for _, negated, _ in self.rules):
+            self._combined = (
+                _combine(regex for regex, _, _ in self.rules),
+                _combine(regex for regex, _, dir_only in self.rules if not dir_only),
+            )
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """Return True if `path` is ignored, False if re-included by a negation, None if no pattern matches."""
+        if self._combined is not None:
+            regex = self._combined[0 if is_dir else 1]
+            return True if regex is not None and regex.match(path) else None
+        for regex, negated, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(path):
+                return not negated
+        return None
+
+    @classmethod
+    def from_file(cls, path: str) -> "IgnoreRules":
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                return cls(f.read().splitlines())
+        except OSError:
+            return cls(())
+
+
+def _combine(regexes: Iterable["re.Pattern[str]"]) -> Optional["re.Pattern[str]"]:
+    patterns = [regex.pattern for regex in regexes]
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.DOTALL)
+
+
+# The ignore files in effect below a directory, outermost first, as
+# (prefix, strip, rules): rules see `prefix + relative[strip:]`
+_Scope = Tuple[Tuple[str, int, IgnoreRules], ...]
+
+
+class FileDiscovery:
+    """
+    Walk the Python files (or list the entries) of a tree below `root`.
+
+    `include` and `exclude` are gitignore-style globs relative to `root`
+    (a glob without '/' matches a name at any depth, like `*_pb2.py`);
+    with `include`, only files matching one of them are kept. Files larger
+    than `max_file_size` bytes are skipped. Unless `ignore_files` is False,
+    `.gitignore` and `.deepcsimignore` files are honoured. Instances can be
+    shared between threads; keep one around to benefit from its caches.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        include: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        max_file_size: Optional[int] = None,
+        ignore_files: bool = True,
+    ):
+        self.root = os.path.abspath(root)
+        self.include = IgnoreRules(include) if include else None
+        self.exclude = IgnoreRules(list(DEFAULT_EXCLUDES) + list(exclude))
+        self.max_file_size = max_file_size
+        self.ignore_files = ignore_files
+        self._lock = threading.Lock()
+        # absolute directory -> (mtime_ns, entries)
+        self._listings: Dict[str, Tuple[int, List[Entry]]] = {}
+        # absolute ignore file -> ((mtime_ns, size), rules)
+        self._rules: Dict[str, Tuple[Tuple[int, int], IgnoreRules]] = {}
+        # (prefix, path) of the ignore files above `root`, found once
+        self._outer_files: Optional[List[Tuple[str, str]]] = None
+
+    def listdir(self, directory: str) -> List[Entry]:
+        """Return the entries of a directory, in `scandir` order, from the cache if it did not change."""
+        key = os.path.abspath(directory)
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return []
+        cached = self._listings.get(key)
+        if cached is not None and cached[0] == mtime:
+            profiling.count("directories_cached")
+            return cached[1]
+
+        entries = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                        is_symlink = entry.is_symlink()
+                    except OSError:
+                        is_dir = is_symlink = False
+                    size = None
+                    if not is_dir and self.max_file_size is not None:
+                        try:
+                            size = entry.stat().st_size
+                        except OSError:
+                            pass
+                    entries.append(Entry(entry.name, is_dir, is_symlink, size))
+        except OSError:
+            return []
+        profiling.count("directories_listed")
+        if time.time_ns() - mtime > RACY_NANOSECONDS:
+            with self._lock:
+                self._listings[key] = (mtime, entries)
+        return entries
+
+    def _ignore_rules(self, path: str) -> IgnoreRules:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return IgnoreRules(())
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._rules.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rules = IgnoreRules.from_file(path)
+        with self._lock:
+            self._rules[path] = (version, rules)
+        return rules
+
+    def _scope_of(self, scope: _Scope, directory: str, relative: str, entries: List[Entry]) -> _Scope:
+        """Extend `scope` with the ignore files found among the entries of `directory`."""
+        if not self.ignore_files:
+            return scope
+        names = {entry.name for entry in entries if not entry.is_dir}
+        strip = len(relative) + 1 if relative else 0
+        for name in IGNORE_FILES:
+            if name in names:
+                rules = self._ignore_rules(os.path.join(os.path.abspath(directory), name))
+                if rules:
+                    scope += (("", strip, rules),)
+        return scope
+
+    def _root_scope(self) -> _Scope:
+        """Ignore files of the directories between `root` and its git repository root."""
+        if not self.ignore_files:
+            return ()
+        if self._outer_files is None:
+            ancestors = []
+            directory = self.root
+            while True:
+                parent = os.path.dirname(directory)
+                if parent == directory or os.path.exists(os.path.join(directory, ".git")):
+                    break
+                directory = parent
+                ancestors.append(directory)
+            # Only apply them if `root` is inside a git repository
+            outer = []
+            if ancestors and os.path.exists(os.path.join(ancestors[-1], ".git")):
+                for ancestor in reversed(ancestors):
+                    prefix = os.path.relpath(self.root, ancestor).replace(os.sep, "/") + "/"
+                    outer.extend((prefix, os.path.join(ancestor, name)) for name in IGNORE_FILES)
+            self._outer_files = outer
+        scope: _Scope = ()
+        for prefix, path in self._outer_files:
+            rules = self._ignore_rules(path)
+            if rules:
+                scope += ((prefix, 0, rules),)
+        return scope
+
+    def _is_excluded(self, scope: _Scope, relative: str, is_dir: bool) -> bool:
+        if self.exclude.match(relative, is_dir):
+            return True
+        for prefix, strip, rules in reversed(scope):
+            decision = rules.match(prefix + relative[strip:], is_dir)
+            if decision is not None:
+                return decision
+        return False
+
+    def _keeps(self, scope: _Scope, entry: Entry, relative: str) -> bool:
+        """Whether a (non-directory) entry passes the ignore rules, globs and size limit."""
+        if self._is_excluded(scope, relative, False):
+            return False
+        if self.include is not None and not self.include.match(relative, False):
+            return False
+        return self.max_file_size is None or entry.size is None or entry.size <= self.max_file_size
+
+    def _relative(self, directory: str) -> str:
+        relative = os.path.relpath(os.path.abspath(directory), self.root)
+        if relative == os.curdir:
+            return ""
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            raise ValueError(f"{directory} is not below {self.root}")
+        return relative.replace(os.sep, "/")
+
+    def _scope_at(self, relative: str) -> Tuple[_Scope, bool]:
+        """Return the scope in effect inside the directory `relative`, and whether it is excluded."""
+        scope = self._root_scope()
+        directory = self.root
+        walked = ""
+        for part in relative.split("/") if relative else ():
+            scope = self._scope_of(scope, directory, walked, self.listdir(directory))
+            walked = f"{walked}/{part}" if walked else part
+            if is_ignored(part) or self._is_excluded(scope, walked, True):
+                return scope, True
+            directory = os.path.join(directory, part)
+        return self._scope_of(scope, directory, walked, self.listdir(directory)), False
+
+    def walk(self, directory: Optional[str] = None) -> Iterator[Tuple[str, List[str]]]:
+        """
+        Yield (directory, Python file names) for `directory` (default: `root`)
+        and every directory below it that is not excluded, in `os.walk` order.
+
+        Directories are spelled as `os.path.join` of `directory` and the
+        names below it, like `os.walk`. Symbolic links to directories are
+        not followed. Yields nothing if `directory` itself is excluded.
+        """
+        if directory is None:
+            directory = self.root
+        relative = self._relative(directory)
+        if relative:
+            parent, _, name = relative.rpartition("/")
+            scope, excluded = self._scope_at(parent)
+            if excluded or is_ignored(name) or self._is_excluded(scope, relative, True):
+                return
+        else:
+            scope = self._root_scope()
+
+        stack = [(directory, relative, scope)]
+        while stack:
+            directory, relative, scope = stack.pop()
+            # Timed per directory: the walk is interleaved with reading and analysis
+            with profiling.phase("scan.discover"):
+                entries = self.listdir(directory)
+                scope = self._scope_of(scope, directory, relative, entries)
+                prefix = f"{relative}/" if relative else ""
+                files = []
+                subdirs = []
+                for entry in entries:
+                    if entry.is_dir:
+                        if not entry.is_symlink and not is_ignored(entry.name) \
+                                and not self._is_excluded(scope, prefix + entry.name, True):
+                            subdirs.append(entry.name)
+                    elif entry.name.endswith(".py") and self._keeps(scope, entry, prefix + entry.name):
+                        files.append(entry.name)
+            yield directory, files
+            stack.extend(
+                (os.path.join(directory, name), prefix + name, scope) for name in reversed(subdirs))
+
+    def iter_python_files(self, directory: Optional[str] = None) -> Iterator[str]:
+        """Yield the paths of the Python files found by `walk`, in order."""
+        for root, files in self.walk(directory):
+            for name in files:
+                yield os.path.join(root, name)
+
+    def list_entries(self, directory: str) -> List[Entry]:
+        """
+        Return the entries of a directory that are not ignored, for browsing.
+
+        Files are kept whatever their type; include globs and the size
+        limit only apply to the Python files walked by `iter_python_files`.
+        """
+        relative = self._relative(directory)
+        scope, excluded = self._scope_at(relative)
+        if excluded:
+            return []
+        prefix = f"{relative}/" if relative else ""
+        return [
+            entry for entry in self.listdir(directory)
+            if not is_ignored(entry.name)
+            and not self._is_excluded(scope, prefix + entry.name, entry.is_dir)
+        ]
+
+    def is_excluded(self, path: str, is_dir: bool = False) -> bool:
+        """Whether `path` (below `root`) would be skipped by `iter_python_files`, ignoring its size."""
+        relative = self._relative(path)
+        if not relative:
+            return False
+        parent, _, name = relative.rpartition("/")
+        scope, excluded = self._scope_at(parent)
+        if excluded or (is_dir and is_ignored(name)) or self._is_excluded(scope, relative, is_dir):
+            return True
+        return not is_dir and self.include is not None and not self.include.match(relative, False)
+
+
+_shared: "OrderedDict[str, FileDiscovery]" = OrderedDict()
+_shared_lock = threading.Lock()
+
+
+def default_discovery(directory: str) -> FileDiscovery:
+    """Return a discovery with default options rooted at `directory`, shared between callers."""
+    key = os.path.abspath(directory)
+    with _shared_lock:
+        discovery = _shared.get(key)
+        if discovery is None:
+            discovery = _shared[key] = FileDiscovery(key)
+            if len(_shared) > MAX_SHARED:
+                _shared.popitem(last=False)
+        else:
+            _shared.move_to_end(key)
+        return discovery
+
+
+def iter_python_files(directory: str, discovery: Optional[FileDiscovery] = None) -> Iterator[str]:
+    """Yield the Python files below `directory` with `discovery`, or the shared default one."""
+    if discovery is None:
+        discovery = default_discovery(directory)
+    return discovery.iter_python_files(directory)
@@ -0,0 +1,91 @@
+import os
+import pickle
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .analyzer import ANALYZER_VERSION
+from .metrics import FunctionMetrics
+
+# Bump whenever the layout of ScanState changes
+STATE_VERSION = 2
+
+
+@dataclass
+class FileRecord:
+    """What a previous scan knew about one file."""
+
+    mtime_ns: int
+    size: int
+    digest: str
+    # None if the file was empty or could not be parsed
+    functions: Optional[Dict[str, FunctionMetrics]]
+    file_hash: str = ""
+
+
+class ScanState:
+    """
+    Serializable state of a previous scan, used to rescan incrementally.
+
+    Holds a manifest of every Python file (mtime, size, content hash and
+    analyzed functions) and the pairs reported for the scanned threshold.
+    Passing it to `scan_directory` re-analyzes only added or modified files
+    and only rescores pairs involving them; the state is updated in place.
+    """
+
+    def __init__(self):
+        self.directory: Optional[str] = None
+        self.threshold: Optional[float] = None
+        self.files: Dict[str, FileRecord] = {}
+        self.order: List[str] = []
+        self.results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Files re-analyzed by the most recent scan
+        self.changed: Set[str] = set()
+
+    def reusable_results(self, directory: str, threshold: float, order: List[str], changed: Set[str]) -> Optional[Dict[Tuple[str, str], Dict[str, Any]]]:
+        """
+        Return previously reported pairs that are still valid, or None if
+        previous pair results cannot be reused at all.
+
+        Results are only reusable for the same directory and threshold, and
+        as long as unchanged files kept their relative order, so that reused
+        entries keep the same file1/file2 orientation as a full rescan.
+        """
+        if self.directory != os.path.abspath(directory) or self.threshold != threshold:
+            return None
+
+        previous_positions = {path: i for i, path in enumerate(self.order)}
+        unchanged = [
+            previous_positions[path] for path in order
+            if path not in changed and path in previous_positions
+        ]
+        if unchanged != sorted(unchanged):
+            return None
+
+        return {
+            (file1, file2): entry for (file1, file2), entry in self.results.items()
+            if file1 not in changed and file2 not in changed
+        }
+
+    def save(self, path: str) -> None:
+        """Write the state to `path` atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((STATE_VERSION, ANALYZER_VERSION, self), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ScanState":
+        """
+        Load a state saved with `save`.
+
+        Returns an empty state if the file does not exist or was written by
+        another version of the state format or analyzer.
+        """
+        try:
+            with open(path, "rb") as f:
+                state_version, analyzer_version, state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError):
+            return cls()
+        if state_version != STATE_VERSION or analyzer_version != ANALYZER_VERSION:
+            return cls()
+        return state
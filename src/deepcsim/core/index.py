@@ -0,0 +1,338 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .metrics import FunctionMetrics
+from .similarity import ROUNDING_SLACK, SimilarityCalculator
+
+
+def structural_upper_bound(func1: FunctionMetrics, func2: FunctionMetrics) -> float:
+    """Upper bound of `calculate_structural`: the node-type Jaccard similarity."""
+    return SimilarityCalculator.structural_upper_bound(func1, func2)
+
+
+def semantic_upper_bound(func1: FunctionMetrics, func2: FunctionMetrics) -> float:
+    """Upper bound of `calculate_semantic` assuming identical call sets."""
+    len1 = func1.num_variables
+    len2 = func2.num_variables
+    max_vars = max(len1, len2)
+    vars_sim = ((1 - abs(len1 - len2) / max_vars) * 100) if max_vars > 0 else 100.0
+    return 100.0 * 0.7 + vars_sim * 0.3
+
+
+def metric_upper_bound(func1: FunctionMetrics, func2: FunctionMetrics) -> float:
+    """
+    Upper bound of `calculate_metric` from statement counts and complexity.
+
+    The remaining metrics are assumed to match perfectly; adding a term of
+    100 to a weighted average of scores <= 100 can never lower it.
+    """
+    weighted_sum = 0.0
+    for metric_name, weight in (('num_statements', 1.0), ('cyclomatic_complexity', 2.0)):
+        val1 = getattr(func1, metric_name)
+        val2 = getattr(func2, metric_name)
+        max_val = max(val1, val2)
+        metric_sim = (1 - abs(val1 - val2) / max_val) * 100 if max_val > 0 else 100.0
+        weighted_sum += metric_sim * weight
+    return (weighted_sum + 100.0 * 2.0 + 100.0 * 1.5) / 6.5
+
+
+def composite_upper_bound(func1: FunctionMetrics, func2: FunctionMetrics) -> float:
+    """Upper bound of the composite score of a function pair."""
+    return (structural_upper_bound(func1, func2) * 0.5
+            + semantic_upper_bound(func1, func2) * 0.3
+            + metric_upper_bound(func1, func2) * 0.2)
+
+
+def min_structural_jaccard(threshold: float) -> float:
+    """
+    Smallest node-type Jaccard similarity a pair needs to reach `threshold`.
+
+    With semantic and metric scores at most 100, the composite is at most
+    `0.5 * structural + 50`.
+    """
+    return max(0.0, (2 * (threshold - ROUNDING_SLACK) - 100) / 100)
+
+
+def _staged_upper_bound(func1: FunctionMetrics, func2: FunctionMetrics, structural: float) -> float:
+    """Composite score with an upper bound `structural` in place of the structural score."""
+    semantic = SimilarityCalculator.calculate_semantic(func1, func2)
+    metric = SimilarityCalculator.calculate_metric(func1, func2)
+    return structural * 0.5 + semantic * 0.3 + metric * 0.2
+
+
+class CandidateIndex:
+    """
+    Index of functions that only yields pairs able to reach a threshold.
+
+    Candidates are generated with prefix filtering over node-type sets:
+    tokens are ordered from rarest to most common, and two sets with a
+    Jaccard similarity of at least t must share a token within their first
+    `|x| - ceil(t * |x|) + 1` tokens. Every candidate is then checked against
+    `composite_upper_bound`, so pruning is exact: no pair that could score
+    at or above the threshold is ever dropped.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.min_jaccard = min_structural_jaccard(threshold)
+        self.functions: List[FunctionMetrics] = []
+        self.owners: List[int] = []
+
+    def add(self, metrics: FunctionMetrics, owner: int = 0) -> int:
+        """Add a function belonging to `owner` (e.g. a file index) and return its id."""
+        self.functions.append(metrics)
+        self.owners.append(owner)
+        return len(self.functions) - 1
+
+    def _prefix_length(self, size: int) -> int:
+        return size - math.ceil(self.min_jaccard * size - 1e-9) + 1
+
+    def iter_candidate_function_pairs(
+        self,
+        probe_owners: Optional[Set[int]] = None,
+        check: Optional[Callable[[], None]] = None,
+        skip: Optional[Callable[[int, int], bool]] = None,
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Yield id pairs (i < j) of functions with different owners that may reach the threshold.
+
+        Pairs are yielded once each, as they are found, so nothing but the
+        inverted lists is retained. If `probe_owners` is given, only pairs
+        involving at least one function of those owners are generated; the
+        other functions are indexed but never probed, so the cost is
+        proportional to the probed functions. `check` is called before each
+        function is probed, e.g. to abort. Pairs of functions whose owners
+        satisfy `skip(owner1, owner2)` (e.g. owners already known to be a
+        candidate pair) are not checked against the bound nor yielded.
+        """
+        frequency = Counter(
+            node_type for func in self.functions for node_type in func.node_type_ids)
+        rank = {
+            node_type: position for position, (node_type, _) in enumerate(
+                sorted(frequency.items(), key=lambda item: (item[1], item[0])))
+        }
+
+        inverted: Dict[int, List[int]] = defaultdict(list)
+
+        order = list(range(len(self.functions)))
+        if probe_owners is not None:
+            # Index the functions that are never probed first
+            order.sort(key=lambda func_id: self.owners[func_id] in probe_owners)
+
+        for func_id in order:
+            func = self.functions[func_id]
+            owner = self.owners[func_id]
+            tokens = sorted(func.node_type_ids, key=rank.__getitem__)
+            size = len(tokens)
+            prefix = tokens[:self._prefix_length(size)] if self.min_jaccard > 0 else tokens
+
+            if probe_owners is not None and owner not in probe_owners:
+                for token in prefix:
+                    inverted[token].append(func_id)
+                continue
+
+            if check is not None:
+                check()
+            seen: Set[int] = set()
+            for token in prefix:
+                for other_id in inverted[token]:
+                    if other_id in seen:
+                        continue
+                    seen.add(other_id)
+                    other_owner = self.owners[other_id]
+                    if other_owner == owner or (skip is not None and skip(other_owner, owner)):
+                        continue
+
+                    # Size filter: J(x, y) <= min(|x|, |y|) / max(|x|, |y|)
+                    other_size = len(self.functions[other_id].node_type_ids)
+                    if min(size, other_size) < self.min_jaccard * max(size, other_size) - 1e-9:
+                        continue
+
+                    other = self.functions[other_id]
+                    if composite_upper_bound(other, func) >= self.threshold - ROUNDING_SLACK:
+                        yield (other_id, func_id) if other_id < func_id else (func_id, other_id)
+
+            for token in prefix:
+                inverted[token].append(func_id)
+
+    def candidate_function_pairs(
+        self,
+        probe_owners: Optional[Set[int]] = None,
+        check: Optional[Callable[[], None]] = None,
+    ) -> Set[Tuple[int, int]]:
+        """Return the set of pairs yielded by `iter_candidate_function_pairs`."""
+        return set(self.iter_candidate_function_pairs(probe_owners, check))
+
+    def iter_owner_partners(
+        self,
+        probe_owners: Optional[Set[int]] = None,
+        check: Optional[Callable[[], None]] = None,
+    ) -> Iterator[Tuple[int, List[int]]]:
+        """
+        Yield (owner, sorted partners) for each owner in increasing order,
+        where partners are the greater owners sharing a candidate function pair with it.
+
+        All functions are indexed up front and each owner probes the full
+        index, so owner pairs come out in `combinations` order and only the
+        partners of the current owner are held. Once two owners are known to
+        be partners, their remaining function pairs are skipped unchecked.
+        If `probe_owners` is given, only pairs involving one of them are
+        yielded. `check` is called before each owner is probed.
+        """
+        frequency = Counter(
+            node_type for func in self.functions for node_type in func.node_type_ids)
+        rank = {
+            node_type: position for position, (node_type, _) in enumerate(
+                sorted(frequency.items(), key=lambda item: (item[1], item[0])))
+        }
+
+        inverted: Dict[int, List[int]] = defaultdict(list)
+        prefixes: List[List[int]] = []
+        by_owner: Dict[int, List[int]] = defaultdict(list)
+        for func_id, func in enumerate(self.functions):
+            tokens = sorted(func.node_type_ids, key=rank.__getitem__)
+            prefix = tokens[:self._prefix_length(len(tokens))] if self.min_jaccard > 0 else tokens
+            prefixes.append(prefix)
+            by_owner[self.owners[func_id]].append(func_id)
+            for token in prefix:
+                inverted[token].append(func_id)
+
+        for owner in sorted(by_owner):
+            if check is not None:
+                check()
+            probed = probe_owners is None or owner in probe_owners
+            partners: Set[int] = set()
+            for func_id in by_owner[owner]:
+                func = self.functions[func_id]
+                size = len(func.node_type_ids)
+                seen: Set[int] = set()
+                for token in prefixes[func_id]:
+                    for other_id in inverted[token]:
+                        other_owner = self.owners[other_id]
+                        if other_owner <= owner or other_owner in partners or other_id in seen:
+                            continue
+                        if not probed and other_owner not in probe_owners:
+                            continue
+                        seen.add(other_id)
+
+                        # Size filter: J(x, y) <= min(|x|, |y|) / max(|x|, |y|)
+                        other = self.functions[other_id]
+                        other_size = len(other.node_type_ids)
+                        if min(size, other_size) < self.min_jaccard * max(size, other_size) - 1e-9:
+                            continue
+                        if composite_upper_bound(func, other) >= self.threshold - ROUNDING_SLACK:
+                            partners.add(other_owner)
+            yield owner, sorted(partners)
+
+    def candidate_owner_pairs(
+        self,
+        probe_owners: Optional[Set[int]] = None,
+        check: Optional[Callable[[], None]] = None,
+    ) -> Set[Tuple[int, int]]:
+        """Return owner pairs (a < b) having at least one candidate function pair."""
+        return {
+            (owner, partner)
+            for owner, partners in self.iter_owner_partners(probe_owners, check)
+            for partner in partners
+        }
+
+
+class SimilarityIndex:
+    """
+    Index of functions answering top-k most-similar-function queries.
+
+    Candidates are ranked by an upper bound of their composite score that
+    is refined lazily: exact semantic and metric scores with the node-type
+    set size ratio standing in for the structural score, then the
+    node-type Jaccard similarity, then the exact `calculate_all` score. The
+    k best are kept in a heap and the search stops as soon as no remaining
+    bound can beat the k-th best score, so results are the same as scoring
+    every function and sorting, without materializing all pairs.
+    """
+
+    def __init__(self):
+        self.functions: List[FunctionMetrics] = []
+        self.keys: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self.functions)
+
+    def add(self, metrics: FunctionMetrics, key: Any = None) -> int:
+        """Add a function and return its id; `key` (default: the id) is returned by queries."""
+        func_id = len(self.functions)
+        self.functions.append(metrics)
+        self.keys.append(func_id if key is None else key)
+        return func_id
+
+    def query(
+        self,
+        metrics: FunctionMetrics,
+        k: int = 5,
+        exclude: Optional[Set[int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the `k` indexed functions most similar to `metrics`.
+
+        Each result holds the function "id", "key", "name" and `calculate_all`
+        "similarity", sorted by decreasing composite score (ties by id).
+        Ids in `exclude` are skipped.
+        """
+        if k <= 0:
+            return []
+
+        size = len(metrics.node_type_ids)
+        candidates = []
+        for func_id, func in enumerate(self.functions):
+            if exclude and func_id in exclude:
+                continue
+            # Stage 0: the node-type Jaccard similarity is at most the set size ratio
+            if func.ast_hash == metrics.ast_hash:
+                structural = 100.0
+            else:
+                larger = max(size, len(func.node_type_ids))
+                structural = min(size, len(func.node_type_ids)) / larger * 100 if larger else 0.0
+            candidates.append((-_staged_upper_bound(metrics, func, structural), 0, func_id))
+        heapq.heapify(candidates)
+
+        # Min-heap of the k best (composite, -id, similarity) found so far
+        best: List[Tuple[float, int, Dict[str, float]]] = []
+        while candidates:
+            negative_bound, stage, func_id = candidates[0]
+            if len(best) == k and -negative_bound + ROUNDING_SLACK < best[0][0]:
+                break
+            func = self.functions[func_id]
+            if stage == 0:
+                # Stage 1: the node-type Jaccard similarity itself
+                bound = _staged_upper_bound(metrics, func, structural_upper_bound(metrics, func))
+                heapq.heapreplace(candidates, (-bound, 1, func_id))
+                continue
+            heapq.heappop(candidates)
+
+            similarity = SimilarityCalculator.calculate_all(metrics, func)
+            item = (similarity['composite'], -func_id, similarity)
+            if len(best) < k:
+                heapq.heappush(best, item)
+            elif item[:2] > best[0][:2]:
+                heapq.heapreplace(best, item)
+
+        return [
+            {
+                "id": -negative_id,
+                "key": self.keys[-negative_id],
+                "name": self.functions[-negative_id].name,
+                "similarity": similarity,
+            }
+            for _, negative_id, similarity in sorted(best, key=lambda item: item[:2], reverse=True)
+        ]
+
+    def query_source(
+        self, code: str, k: int = 5, filename: str = "query"
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Analyze `code` and return, per function, the `k` most similar indexed functions."""
+        from .analyzer import CodeAnalyzer
+
+        analyzer = CodeAnalyzer(code, filename)
+        analyzer.analyze()
+        return {name: self.query(metrics, k) for name, metrics in analyzer.functions.items()}
@@ -1,17 +1,230 @@
-from dataclasses import dataclass, field
-from typing import Dict, Set
+"""
+Compact per-function metrics.
+
+`FunctionMetrics` keeps its collections as interned integer ids in
+`array`s instead of dicts and sets of strings: node types map to ids of a
+fixed vocabulary built from the `ast` module, called functions and
+variables to ids of a process-wide symbol table. The source may be held as
+a (path, byte span) pair that is read back from disk on access. The
+original attributes remain available as properties.
+"""
+
+import ast
+import os
+import sys
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+
+class SymbolTable:
+    """Interns strings to small integer ids, in order of first appearance."""
+
+    __slots__ = ('ids', 'names')
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        for name in names:
+            self.intern(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        """Return the id of `name`, assigning the next one if it is new."""
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = self.ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+        return symbol_id
+
+    def intern_all(self, names: Iterable[str]) -> array:
+        """Return the sorted ids of a set of names."""
+        return array('I', sorted(self.intern(name) for name in names))
+
+
+def _ast_node_types() -> List[str]:
+    names = set()
+    pending = [ast.AST]
+    while pending:
+        cls = pending.pop()
+        names.add(cls.__name__)
+        pending.extend(cls.__subclasses__())
+    return sorted(names)
+
+
+# Ids follow the sorted node type names, so iterating ids in order sums
+# structural scores in the same order as sorting the names. Names unknown
+# to this Python's ast module (e.g. loaded from elsewhere) are appended.
+NODE_TYPES = SymbolTable(_ast_node_types())
+
+# Called function and variable names
+SYMBOLS = SymbolTable()
+
+
+@lru_cache(maxsize=16)
+def _read_encoded(path: str, mtime_ns: int, size: int) -> bytes:
+    # Read like the scanner does, so byte offsets into the analyzed text line up
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read().encode()
+
+
+def read_source_span(path: str, start: int, end: int) -> str:
+    """Return bytes `start:end` of the UTF-8 text of `path`, or "" if it cannot be read."""
+    try:
+        stat = os.stat(path)
+        data = _read_encoded(path, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return ""
+    return data[start:end].decode("utf-8", errors="ignore")
+
 
-@dataclass
 class FunctionMetrics:
-    name: str
-    source: str
-    line_start: int
-    line_end: int
-    num_statements: int = 0
-    num_args: int = 0
-    cyclomatic_complexity: int = 1
-    nesting_depth: int = 0
-    node_types: Dict[str, int] = field(default_factory=dict)
-    called_functions: Set[str] = field(default_factory=set)
-    variables_used: Set[str] = field(default_factory=set)
-    ast_hash: str = ""
+    """
+    Metrics of one function.
+
+    `node_types`, `called_functions`, `variables_used` and `source` are
+    computed on access; hot paths read `node_type_ids`/`node_type_counts`,
+    `call_ids` and `num_variables` instead. Without `source`, the code is
+    read from `source_path` at byte offsets `source_span` when needed.
+    """
+
+    __slots__ = (
+        'name', 'line_start', 'line_end', 'num_statements', 'num_args',
+        'cyclomatic_complexity', 'nesting_depth', 'ast_hash',
+        'node_type_ids', 'node_type_counts', 'call_ids', 'variable_ids',
+        '_source', 'source_path', '_source_start', '_source_end',
+    )
+
+    __hash__ = None  # mutable, compared by value
+
+    def __init__(
+        self,
+        name: str,
+        source: Optional[str],
+        line_start: int,
+        line_end: int,
+        num_statements: int = 0,
+        num_args: int = 0,
+        cyclomatic_complexity: int = 1,
+        nesting_depth: int = 0,
+        node_types: Optional[Dict[str, int]] = None,
+        called_functions: Optional[Iterable[str]] = None,
+        variables_used: Optional[Iterable[str]] = None,
+        ast_hash: str = "",
+        source_path: Optional[str] = None,
+        source_span: Optional[Tuple[int, int]] = None,
+    ):
+        if source is None and (source_path is None or source_span is None):
+            raise ValueError("FunctionMetrics needs a source or a source_path and source_span")
+        self.name = sys.intern(name)
+        self.line_start = line_start
+        self.line_end = line_end
+        self.num_statements = num_statements
+        self.num_args = num_args
+        self.cyclomatic_complexity = cyclomatic_complexity
+        self.nesting_depth = nesting_depth
+        self.ast_hash = ast_hash
+
+        ids = sorted((NODE_TYPES.intern(node_type), count)
+                     for node_type, count in (node_types or {}).items() if count)
+        self.node_type_ids = array('H', [node_id for node_id, _ in ids])
+        self.node_type_counts = array('I', [count for _, count in ids])
+        self.call_ids = SYMBOLS.intern_all(called_functions or ())
+        self.variable_ids = SYMBOLS.intern_all(variables_used or ())
+
+        self._source = source
+        self.source_path = source_path if source is None else None
+        self._source_start, self._source_end = source_span if source is None else (0, 0)
+
+    @property
+    def source(self) -> str:
+        if self._source is not None:
+            return self._source
+        return read_source_span(self.source_path, self._source_start, self._source_end)
+
+    @property
+    def source_span(self) -> Optional[Tuple[int, int]]:
+        """Byte offsets of a lazily read source, or None if the source is held in memory."""
+        if self._source is not None:
+            return None
+        return (self._source_start, self._source_end)
+
+    @property
+    def node_types(self) -> Dict[str, int]:
+        names = NODE_TYPES.names
+        return {names[node_id]: count
+                for node_id, count in zip(self.node_type_ids, self.node_type_counts)}
+
+    @property
+    def called_functions(self) -> FrozenSet[str]:
+        names = SYMBOLS.names
+        return frozenset(names[symbol_id] for symbol_id in self.call_ids)
+
+    @property
+    def variables_used(self) -> FrozenSet[str]:
+        names = SYMBOLS.names
+        return frozenset(names[symbol_id] for symbol_id in self.variable_ids)
+
+    @property
+    def num_variables(self) -> int:
+        return len(self.variable_ids)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, FunctionMetrics):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return (f"FunctionMetrics(name={self.name!r}, lines={self.line_start}-{self.line_end}, "
+                f"ast_hash={self.ast_hash!r})")
+
+    def __reduce__(self):
+        # Symbol ids are local to a process, so names are pickled instead
+        return (_restore, ((
+            self.name, self._source, self.line_start, self.line_end,
+            self.num_statements, self.num_args, self.cyclomatic_complexity,
+            self.nesting_depth, self.node_types, sorted(self.called_functions),
+            sorted(self.variables_used), self.ast_hash, self.source_path,
+            self.source_span,
+        ),))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation of these metrics."""
+        return {
+            'name': self.name,
+            'source': self.source,
+            'line_start': self.line_start,
+            'line_end': self.line_end,
+            'num_statements': self.num_statements,
+            'num_args': self.num_args,
+            'cyclomatic_complexity': self.cyclomatic_complexity,
+            'nesting_depth': self.nesting_depth,
+            'node_types': self.node_types,
+            'called_functions': sorted(self.called_functions),
+            'variables_used': sorted(self.variables_used),
+            'ast_hash': self.ast_hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FunctionMetrics":
+        """Rebuild metrics from the output of `to_dict`."""
+        return cls(
+            name=data['name'],
+            source=data['source'],
+            line_start=data['line_start'],
+            line_end=data['line_end'],
+            num_statements=data['num_statements'],
+            num_args=data['num_args'],
+            cyclomatic_complexity=data['cyclomatic_complexity'],
+            nesting_depth=data['nesting_depth'],
+            node_types=data['node_types'],
+            called_functions=data['called_functions'],
+            variables_used=data['variables_used'],
+            ast_hash=data['ast_hash'],
+        )
+
+
+def _restore(state: Tuple[Any, ...]) -> FunctionMetrics:
+    return FunctionMetrics(*state)
@@ -0,0 +1,160 @@
+"""
+Streaming file ingestion.
+
+Files flow through overlapping stages: paths come from a lazy directory
+walk, are read in batches by a thread pool, analyzed in a process pool
+(or in the calling thread with one worker) and handed to scoring in their
+original order. Every stage keeps a bounded number of batches in flight,
+so a slow stage stalls the ones before it instead of letting contents
+pile up in memory, and I/O latency (cold caches, network filesystems)
+overlaps with parsing.
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from deepcsim.core import profiling
+from deepcsim.core.analyzer import CodeAnalyzer
+from deepcsim.core.metrics import FunctionMetrics
+
+# Default number of threads reading files
+DEFAULT_READERS = 4
+
+# Files per batch handed to a reader thread or an analysis process
+READ_BATCH = 16
+ANALYZE_BATCH = 16
+
+T = TypeVar("T")
+
+
+def _read_source(path: str) -> Optional[str]:
+    """Read a source file, returning None if it cannot be read."""
+    try:
+        with profiling.phase("scan.read"), open(path, "r", encoding="utf-8", errors="ignore") as f:
+            src = f.read()
+            profiler = profiling.current()
+            if profiler is not None:
+                profiler.count("files_read")
+                profiler.count("bytes_read", os.fstat(f.fileno()).st_size)
+            return src
+    except Exception:
+        return None
+
+
+def _analyze_source(src: str, path: str, lazy_source: bool = False) -> Optional[Dict[str, FunctionMetrics]]:
+    """Analyze source code, returning None if it cannot be parsed."""
+    analyzer = CodeAnalyzer(src, path, lazy_source=lazy_source)
+    try:
+        analyzer.analyze()
+    except Exception:
+        return None
+    return analyzer.functions
+
+
+def _timed_analyze_source(src: str, path: str, lazy_source: bool = False) -> Tuple[Optional[Dict[str, FunctionMetrics]], float]:
+    """`_analyze_source`, also returning its wall time (measured where it runs)."""
+    start = time.perf_counter()
+    functions = _analyze_source(src, path, lazy_source)
+    return functions, time.perf_counter() - start
+
+
+def _read_batch(paths: List[str]) -> List[Optional[str]]:
+    return [_read_source(path) for path in paths]
+
+
+def _analyze_batch(batch: List[Tuple[str, str]], lazy_source: bool, timed: bool) -> list:
+    analyze = _timed_analyze_source if timed else _analyze_source
+    return [analyze(src, path, lazy_source) for src, path in batch]
+
+
+def _batches(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_read_sources(
+    paths: Iterable[str],
+    readers: int = DEFAULT_READERS,
+    sources: Optional[Dict[str, str]] = None,
+) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Yield (path, contents) for each path, in order; contents are None if unreadable.
+
+    Files are read in batches by `readers` threads, at most two batches per
+    thread ahead of the consumer; with `readers` <= 1 they are read as
+    they are consumed. Contents found in `sources` are not read again.
+    """
+    def read(batch: List[str]) -> List[Optional[str]]:
+        if sources:
+            return [sources[path] if path in sources else _read_source(path) for path in batch]
+        return _read_batch(batch)
+
+    if readers <= 1:
+        for batch in _batches(paths, READ_BATCH):
+            yield from zip(batch, read(batch))
+        return
+
+    in_flight: "deque[Tuple[List[str], Future]]" = deque()
+    with ThreadPoolExecutor(max_workers=readers, thread_name_prefix="deepcsim-read") as pool:
+        try:
+            for batch in _batches(paths, READ_BATCH):
+                in_flight.append((batch, pool.submit(read, batch)))
+                if len(in_flight) >= readers * 2:
+                    done, future = in_flight.popleft()
+                    yield from zip(done, future.result())
+            while in_flight:
+                done, future = in_flight.popleft()
+                yield from zip(done, future.result())
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
+
+def iter_analyze_sources(
+    items: Iterable[Tuple[str, str, T]],
+    workers: int = 1,
+    lazy_source: bool = False,
+    timed: bool = False,
+) -> Iterator[Tuple[str, str, T, object]]:
+    """
+    Analyze (path, source, tag) items and yield (path, source, tag, outcome), in order.
+
+    The outcome is the result of `_analyze_source`, or of
+    `_timed_analyze_source` if `timed`. With `workers` > 1, batches are
+    analyzed in a process pool, at most two per process ahead of the
+    consumer; the pool is only started once there are two items.
+    """
+    items = iter(items)
+    analyze = _timed_analyze_source if timed else _analyze_source
+    head = list(islice(items, 2)) if workers > 1 else []
+    if workers <= 1 or len(head) < 2:
+        for path, src, tag in chain(head, items):
+            yield path, src, tag, analyze(src, path, lazy_source)
+        return
+
+    in_flight: "deque[Tuple[list, Future]]" = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            for batch in _batches(chain(head, items), ANALYZE_BATCH):
+                work = [(src, path) for path, src, _ in batch]
+                in_flight.append((batch, pool.submit(_analyze_batch, work, lazy_source, timed)))
+                if len(in_flight) >= workers * 2:
+                    done, future = in_flight.popleft()
+                    for (path, src, tag), outcome in zip(done, future.result()):
+                        yield path, src, tag, outcome
+            while in_flight:
+                done, future = in_flight.popleft()
+                for (path, src, tag), outcome in zip(done, future.result()):
+                    yield path, src, tag, outcome
+        finally:
+            # Stop queued batches when the consumer gives up (e.g. a cancelled scan)
+            for _, future in in_flight:
+                future.cancel()
@@ -0,0 +1,189 @@
+"""
+Opt-in timing and counting of the hot paths.
+
+Nothing is recorded unless a `Profiler` is enabled, process-wide, with
+`profiling()` (or `enable`). The analyzer, the similarity calculator and
+the scanner then record per-phase wall and CPU time in it, count files
+read, bytes, functions and pairs scored or pruned, and keep the slowest
+files to analyze. Phases nest: a phase's time includes its sub-phases.
+
+Analyses run in worker processes (`workers` > 1) only report their wall
+time per file, measured in the worker; their sub-phases are not recorded.
+"""
+
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Called with (phase, wall seconds, CPU seconds) whenever a phase ends
+PhaseCallback = Callable[[str, float, float], None]
+
+
+class _NullPhase:
+    """Phase context used while profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "wall", "cpu")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_time(
+            self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+        return False
+
+
+class Profiler:
+    """
+    Accumulates phase timings, counters and the slowest files.
+
+    Safe to share between threads. CPU time is that of the thread running
+    the phase. If `callback` is given, it is called with every completed
+    phase as (name, wall seconds, CPU seconds).
+    """
+
+    def __init__(self, top_files: int = 10, callback: Optional[PhaseCallback] = None):
+        self.top_files = top_files
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            # name -> [calls, wall seconds, CPU seconds]
+            self.phases: Dict[str, List[float]] = {}
+            self.counters: Dict[str, int] = {}
+            # Min-heap of (seconds, path, bytes), holding the `top_files` slowest
+            self._slowest: List[Tuple[float, str, int]] = []
+
+    def phase(self, name: str) -> _Phase:
+        """Context manager timing one run of the phase `name`."""
+        return _Phase(self, name)
+
+    def add_time(self, name: str, wall: float, cpu: float) -> None:
+        with self._lock:
+            totals = self.phases.get(name)
+            if totals is None:
+                totals = self.phases[name] = [0, 0.0, 0.0]
+            totals[0] += 1
+            totals[1] += wall
+            totals[2] += cpu
+        if self.callback is not None:
+            self.callback(name, wall, cpu)
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_file(self, path: str, seconds: float, size: int) -> None:
+        """Record the time taken to analyze one file of `size` bytes."""
+        with self._lock:
+            entry = (seconds, path, size)
+            if len(self._slowest) < self.top_files:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def slowest_files(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            slowest = sorted(self._slowest, reverse=True)
+        return [{"path": path, "seconds": seconds, "bytes": size} for seconds, path, size in slowest]
+
+    def report(self) -> Dict[str, Any]:
+        """Return a JSON-serializable snapshot of everything recorded."""
+        with self._lock:
+            phases = {
+                name: {"calls": int(calls), "wall_seconds": wall, "cpu_seconds": cpu}
+                for name, (calls, wall, cpu) in sorted(self.phases.items())
+            }
+            counters = dict(sorted(self.counters.items()))
+        return {"phases": phases, "counters": counters, "slowest_files": self.slowest_files()}
+
+    def prometheus(self, prefix: str = "deepcsim") -> str:
+        """Render the snapshot in the Prometheus text exposition format."""
+        report = self.report()
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                rendered = ",".join(f'{key}="{_escape_label(str(label))}"' for key, label in labels)
+                lines.append(f"{prefix}_{name}{{{rendered}}} {value}" if rendered
+                             else f"{prefix}_{name} {value}")
+
+        phases = report["phases"].items()
+        family("phase_calls_total", "counter", "Completed runs of each phase.",
+               [((("phase", name),), totals["calls"]) for name, totals in phases])
+        family("phase_seconds_total", "counter", "Wall-clock time spent in each phase.",
+               [((("phase", name),), repr(totals["wall_seconds"])) for name, totals in phases])
+        family("phase_cpu_seconds_total", "counter", "CPU time spent in each phase.",
+               [((("phase", name),), repr(totals["cpu_seconds"])) for name, totals in phases])
+        for name, value in report["counters"].items():
+            family(f"{name}_total", "counter", f"Count of {name.replace('_', ' ')}.", [((), value)])
+        family("slowest_file_seconds", "gauge", "Analysis time of the slowest files.",
+               [((("path", entry["path"]),), repr(entry["seconds"]))
+                for entry in report["slowest_files"]])
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+_current: Optional[Profiler] = None
+
+
+def current() -> Optional[Profiler]:
+    """Return the enabled profiler, or None if profiling is disabled."""
+    return _current
+
+
+def enable(profiler: Optional[Profiler]) -> Optional[Profiler]:
+    """Enable `profiler` (None disables profiling) and return the previous one."""
+    global _current
+    previous, _current = _current, profiler
+    return previous
+
+
+@contextmanager
+def profiling(profiler: Optional[Profiler] = None) -> Iterator[Profiler]:
+    """Enable a profiler (a new one by default) for the duration of a block."""
+    profiler = profiler if profiler is not None else Profiler()
+    previous = enable(profiler)
+    try:
+        yield profiler
+    finally:
+        enable(previous)
+
+
+def phase(name: str):
+    """Time the phase `name` in the enabled profiler, if any."""
+    profiler = _current
+    return _NULL_PHASE if profiler is None else _Phase(profiler, name)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add to a counter of the enabled profiler, if any."""
+    profiler = _current
+    if profiler is not None:
+        profiler.count(name, value)
@@ -0,0 +1,70 @@
+import time
+import threading
+from typing import Any, Dict, Optional
+
+
+class ScanCancelled(Exception):
+    """Raised inside a scan whose progress object was cancelled."""
+
+
+class ScanProgress:
+    """
+    Live counters of a running scan, with cooperative cancellation.
+
+    Pass an instance to `iter_scan_directory` (or the other scan functions
+    accepting `progress`): the scan updates it as files are parsed and
+    pairs are scored, and raises ScanCancelled at the next file or pair
+    once `cancel` has been called, possibly from another thread.
+    """
+
+    def __init__(self):
+        self.phase = "pending"
+        self.files_total = 0
+        self.files_parsed = 0
+        self.pairs_total: Optional[int] = None
+        self.pairs_scored = 0
+        self.pairs_reported = 0
+        self.started = time.time()
+        self.phase_started = self.started
+        self._cancelled = threading.Event()
+
+    def start_phase(self, phase: str) -> None:
+        self.phase = phase
+        self.phase_started = time.time()
+
+    def cancel(self) -> None:
+        """Ask the scan to stop at the next file or pair."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self) -> None:
+        """Raise ScanCancelled if the scan was cancelled."""
+        if self._cancelled.is_set():
+            raise ScanCancelled()
+
+    def eta_seconds(self) -> Optional[float]:
+        """Estimate the time left in the current phase from its rate so far."""
+        elapsed = time.time() - self.phase_started
+        if self.phase == "analyzing" and self.files_parsed:
+            return elapsed / self.files_parsed * (self.files_total - self.files_parsed)
+        if self.phase == "comparing" and self.pairs_scored and self.pairs_total is not None:
+            return elapsed / self.pairs_scored * (self.pairs_total - self.pairs_scored)
+        if self.phase == "done":
+            return 0.0
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        eta = self.eta_seconds()
+        return {
+            "phase": self.phase,
+            "files_total": self.files_total,
+            "files_parsed": self.files_parsed,
+            "pairs_total": self.pairs_total,
+            "pairs_scored": self.pairs_scored,
+            "pairs_reported": self.pairs_reported,
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "eta_seconds": round(eta, 3) if eta is not None else None,
+        }
@@ -0,0 +1,324 @@
+import os
+import time
+import threading
+from stat import S_ISREG
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from deepcsim.core.analyzer import CodeAnalyzer
+from deepcsim.core.batch import MetricsMatrix
+from deepcsim.core.cache import AnalysisCache, content_hash
+from deepcsim.core.incremental import FileRecord, ScanState
+from deepcsim.core.index import SimilarityIndex
+from deepcsim.core.metrics import FunctionMetrics
+from deepcsim.core.pipeline import _read_source, iter_read_sources
+from deepcsim.core.scanner import (
+    _analyze_files,
+    _collect_matches,
+    _file_hash,
+    _iter_python_files,
+    _refresh_state,
+    compact_matches,
+)
+
+
+class ProjectIndex:
+    """
+    In-memory index of every analyzed function of a directory tree.
+
+    Answers the same queries as `find_matches_for_file` without walking and
+    re-parsing the tree each time. The index is built on first use (or by
+    calling `refresh`), and kept fresh by re-stating the tree when it is
+    older than `max_age` seconds: only added or modified files are
+    re-analyzed. `update_paths` refreshes individual files, e.g. from a
+    filesystem watcher, in which case `max_age` can be None. Function
+    sources are not held in memory but read from the files when needed.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        cache: Optional[AnalysisCache] = None,
+        workers: Optional[int] = 1,
+        max_age: Optional[float] = 5.0,
+    ):
+        self.directory = directory
+        self.cache = cache
+        self.workers = workers
+        self.max_age = max_age
+
+        self._lock = threading.RLock()
+        self._state = ScanState()
+        self._file_functions: Dict[str, Dict[str, FunctionMetrics]] = {}
+        self._matrix: Optional[MetricsMatrix] = None
+        self._function_ids: Dict[str, range] = {}
+        self._similarity: Optional[SimilarityIndex] = None
+        self._similarity_ids: Dict[Tuple[str, str], int] = {}
+
+        self.built = False
+        self.build_seconds: Optional[float] = None
+        self.last_refresh: Optional[float] = None
+        self.last_refresh_seconds: Optional[float] = None
+        self.refreshes = 0
+        self.updated_files = 0
+        self.refreshing = False
+        # Sizes kept up to date under the lock, so that `status` never waits
+        self._size = {"files": 0, "files_with_functions": 0, "functions": 0}
+
+    def refresh(self) -> None:
+        """Re-stat the tree and re-analyze added or modified files."""
+        with self._lock:
+            self.refreshing = True
+            start = time.perf_counter()
+            try:
+                file_reports, changed = _refresh_state(
+                    self.directory, self._state, self.cache, self.workers,
+                    lazy_source=True)
+            finally:
+                self.refreshing = False
+            file_functions = {
+                path: report["functions"]
+                for path, report in file_reports.items()
+                if report["functions"]
+            }
+            if changed or list(file_functions) != list(self._file_functions):
+                self._file_functions = file_functions
+                self._invalidate()
+            elapsed = time.perf_counter() - start
+
+            if not self.built:
+                self.built = True
+                self.build_seconds = elapsed
+            self.last_refresh = time.time()
+            self.last_refresh_seconds = elapsed
+            self.refreshes += 1
+            self._update_size()
+
+    def update_paths(self, paths: Iterable[str]) -> None:
+        """
+        Re-analyze the given files, dropping those that no longer exist.
+
+        Files keep the position `_iter_python_files` lists them at, so
+        matches are reported in the same order as after a refresh.
+        """
+        with self._lock:
+            if not self.built:
+                self.refresh()
+                return
+
+            stats: Dict[str, os.stat_result] = {}
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    stat = None
+                if stat is not None and S_ISREG(stat.st_mode):
+                    stats[path] = stat
+                else:
+                    self._state.files.pop(path, None)
+
+            sources: Dict[str, str] = {}
+            for path, src in iter_read_sources(list(stats)):
+                if src is None:
+                    # Removed (or made unreadable) since it was stat'ed
+                    self._state.files.pop(path, None)
+                else:
+                    sources[path] = src
+
+            added = [path for path in sources if path not in self._state.files]
+            analyzed = _analyze_files(
+                list(sources), self.cache, self.workers, sources=sources, lazy_source=True)
+            for path, src in sources.items():
+                functions = analyzed.get(path)
+                self._state.files[path] = FileRecord(
+                    mtime_ns=stats[path].st_mtime_ns,
+                    size=stats[path].st_size,
+                    digest=content_hash(src),
+                    functions=functions,
+                    file_hash=_file_hash(functions) if functions is not None else "",
+                )
+            if added:
+                order = {path: position for position, path in enumerate(_iter_python_files(self.directory))}
+                self._state.files = dict(sorted(
+                    self._state.files.items(), key=lambda item: order.get(item[0], len(order))))
+            self._file_functions = {
+                path: record.functions for path, record in self._state.files.items() if record.functions
+            }
+
+            self._invalidate()
+            self.updated_files += len(sources)
+            self._update_size()
+
+    def _invalidate(self) -> None:
+        self._matrix = None
+        self._similarity = None
+
+    def _update_size(self) -> None:
+        self._size = {
+            "files": len(self._state.files),
+            "files_with_functions": len(self._file_functions),
+            "functions": sum(len(functions) for functions in self._file_functions.values()),
+        }
+
+    def indexed_paths(self) -> List[str]:
+        """Return the paths of every indexed Python file."""
+        with self._lock:
+            return list(self._state.files)
+
+    def _ensure_fresh(self) -> None:
+        if not self.built:
+            self.refresh()
+        elif self.max_age is not None and time.time() - self.last_refresh > self.max_age:
+            self.refresh()
+
+    def _ensure_matrix(self) -> MetricsMatrix:
+        if self._matrix is None:
+            functions: List[FunctionMetrics] = []
+            self._function_ids = {}
+            for path, file_functions in self._file_functions.items():
+                start = len(functions)
+                functions.extend(file_functions.values())
+                self._function_ids[path] = range(start, len(functions))
+            self._matrix = MetricsMatrix(functions)
+        return self._matrix
+
+    def _ensure_similarity(self) -> SimilarityIndex:
+        if self._similarity is None:
+            self._similarity = SimilarityIndex()
+            self._similarity_ids = {}
+            for path, file_functions in self._file_functions.items():
+                for name, metrics in file_functions.items():
+                    self._similarity_ids[(path, name)] = self._similarity.add(metrics, (path, name))
+        return self._similarity
+
+    def _is_current(self, path: str) -> bool:
+        record = self._state.files.get(path)
+        if record is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return record.mtime_ns == stat.st_mtime_ns and record.size == stat.st_size
+
+    def find_matches(
+        self,
+        target_path: str,
+        threshold: float = 50.0,
+        compact: bool = False,
+        function_threshold: Optional[float] = None,
+    ) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+        """Return the same matches as `find_matches_for_file(target_path, directory, threshold)`."""
+        if not os.path.exists(target_path):
+            raise ValueError(f"Target file not found: {target_path}")
+
+        with self._lock:
+            self._ensure_fresh()
+            target = os.path.abspath(target_path)
+            if target_path in self._state.files:
+                indexed_path = target_path
+            else:
+                indexed_path = next(
+                    (path for path in self._state.files if os.path.abspath(path) == target),
+                    None,
+                )
+            if indexed_path is not None and not self._is_current(indexed_path):
+                self.update_paths([indexed_path])
+
+            others = {
+                path: functions for path, functions in self._file_functions.items()
+                if path != indexed_path
+            }
+
+            if indexed_path is not None and indexed_path in self._file_functions:
+                target_functions = self._file_functions[indexed_path]
+                matrix = self._ensure_matrix()
+                matches = _collect_matches(
+                    target_functions, self._function_ids[indexed_path],
+                    others, self._function_ids, matrix, self.directory, threshold)
+            elif indexed_path is not None and self._state.files[indexed_path].functions is not None:
+                # Indexed, but without functions
+                target_functions = {}
+                matches = []
+            else:
+                # Not part of the index (or unparsable): analyze it on the fly
+                src = _read_source(target_path)
+                if src is None:
+                    raise ValueError(f"Could not read target file: {target_path}")
+                target_analyzer = CodeAnalyzer(src, target_path)
+                target_analyzer.analyze()
+                target_functions = target_analyzer.functions
+                matches = []
+                if target_functions:
+                    functions = list(target_functions.values())
+                    target_ids = range(len(functions))
+                    function_ids: Dict[str, range] = {}
+                    for path, file_functions in others.items():
+                        start = len(functions)
+                        functions.extend(file_functions.values())
+                        function_ids[path] = range(start, len(functions))
+                    matches = _collect_matches(
+                        target_functions, target_ids, others, function_ids,
+                        MetricsMatrix(functions), self.directory, threshold)
+
+            if compact:
+                return compact_matches(
+                    matches, target_path, target_functions, others, function_threshold)
+            return matches
+
+    def get_function(self, path: str, name: str) -> Optional[FunctionMetrics]:
+        """Return the metrics (including source) of an indexed function, if any."""
+        with self._lock:
+            self._ensure_fresh()
+            if path not in self._state.files:
+                return None
+            if not self._is_current(path):
+                self.update_paths([path])
+            return self._file_functions.get(path, {}).get(name)
+
+    def similar_functions(
+        self,
+        metrics: FunctionMetrics,
+        k: int = 5,
+        exclude: Optional[Tuple[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the `k` indexed functions most similar to `metrics`.
+
+        `exclude` is the (path, name) of an indexed function to leave out,
+        typically the queried function itself.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            index = self._ensure_similarity()
+            excluded = {self._similarity_ids[exclude]} if exclude in self._similarity_ids else None
+            results = []
+            for result in index.query(metrics, k, excluded):
+                path, name = result["key"]
+                func = self._file_functions[path][name]
+                results.append({
+                    "path": path,
+                    "relative_path": os.path.relpath(path, self.directory).replace("\\", "/"),
+                    "name": name,
+                    "lines": f"{func.line_start}-{func.line_end}",
+                    "similarity": result["similarity"],
+                })
+            return results
+
+    def status(self) -> Dict[str, Any]:
+        """Return the size, build time and staleness of the index."""
+        last_refresh = self.last_refresh
+        age = time.time() - last_refresh if last_refresh is not None else None
+        return {
+            "directory": self.directory,
+            "built": self.built,
+            "refreshing": self.refreshing,
+            **self._size,
+            "build_seconds": self.build_seconds,
+            "last_refresh": last_refresh,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "age_seconds": age,
+            "max_age_seconds": self.max_age,
+            "stale": age is None or (self.max_age is not None and age > self.max_age),
+            "refreshes": self.refreshes,
+            "updated_files": self.updated_files,
+        }
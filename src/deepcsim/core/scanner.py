@@ -1,122 +1,951 @@
 import os
 import hashlib
-from itertools import combinations
-from typing import Dict, List, Any
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import combinations, tee
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
+from deepcsim.core import profiling
 from deepcsim.core.analyzer import CodeAnalyzer
-from deepcsim.core.similarity import SimilarityCalculator
-from deepcsim.constants import is_ignored
+from deepcsim.core.batch import MetricsMatrix
+from deepcsim.core.cache import AnalysisCache, content_hash
+from deepcsim.core.clusters import cluster_functions
+from deepcsim.core.compact import FunctionTable
+from deepcsim.core.discovery import FileDiscovery, iter_python_files
+from deepcsim.core.incremental import FileRecord, ScanState
+from deepcsim.core.index import CandidateIndex, min_structural_jaccard
+from deepcsim.core.metrics import FunctionMetrics
+from deepcsim.core.pipeline import DEFAULT_READERS, iter_analyze_sources, iter_read_sources
+from deepcsim.core.progress import ScanProgress
+from deepcsim.core.store import MetricsStore, write_store
+
+
+def _iter_python_files(directory: str, discovery: Optional[FileDiscovery] = None) -> Iterator[str]:
+    """Yield the paths of the Python files under a directory that `discovery` keeps, in walk order."""
+    return iter_python_files(directory, discovery)
+
+
+def _resolve_workers(workers: Optional[int]) -> int:
+    """Translate a `workers` argument into a process count (None or 0 = all cores)."""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def _analyze_files(
+    paths: Iterable[str],
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    sources: Optional[Dict[str, str]] = None,
+    progress: Optional[ScanProgress] = None,
+    lazy_source: bool = False,
+    readers: int = DEFAULT_READERS,
+) -> Dict[str, Dict[str, FunctionMetrics]]:
+    """
+    Analyze Python files and return their functions keyed by path.
+
+    Unreadable, empty and unparsable files are left out. The result is
+    ordered like `paths` whatever the number of workers. When a cache is
+    given, unchanged files are loaded from it instead of being re-analyzed.
+    `sources` may provide already read contents for some of the paths.
+    With `lazy_source`, function sources are read back from disk on access
+    instead of being kept in memory; `sources` must then match the files.
+    `paths` may be a lazy iterator: files are read by `readers` threads and
+    analyzed while later paths are still being listed and read.
+    """
+    analyzed: Dict[str, Dict[str, FunctionMetrics]] = {}
+    order: List[str] = []
+    # Profiled analyses report their time per file, also from worker processes
+    profiler = profiling.current()
+
+    def pending():
+        for path, src in iter_read_sources(paths, readers, sources):
+            order.append(path)
+
+            # Skip unreadable and empty files
+            if src is None or not src.strip():
+                if progress is not None:
+                    progress.files_parsed += 1
+                continue
+
+            digest = None
+            if cache is not None:
+                digest = content_hash(src)
+                cached = cache.get(path, digest)
+                if cached is not None:
+                    analyzed[path] = cached
+                    if progress is not None:
+                        progress.files_parsed += 1
+                    continue
+
+            yield path, src, digest
+
+    with profiling.phase("scan.analyze"):
+        outcomes = iter_analyze_sources(
+            pending(), _resolve_workers(workers), lazy_source, timed=profiler is not None)
+        for path, src, digest, functions in outcomes:
+            if profiler is not None:
+                functions, seconds = functions
+                profiler.count("files_analyzed")
+                profiler.record_file(path, seconds, len(src.encode()))
+            if progress is not None:
+                progress.files_parsed += 1
+                progress.check()
+            if functions is None:
+                continue
+            if cache is not None:
+                cache.put(path, digest, functions)
+            analyzed[path] = functions
+
+    return {path: analyzed[path] for path in order if path in analyzed}
 
 
-def scan_directory(directory: str, threshold: float = 80.0) -> Dict[str, Any]:
+def _file_hash(functions: Dict[str, FunctionMetrics]) -> str:
+    """Compute a file-level AST hash by combining all function AST hashes."""
+    return hashlib.md5(
+        "".join(m.ast_hash for m in functions.values()).encode()
+    ).hexdigest()
+
+
+def _compare_files(
+    file1: str,
+    f1: Dict[str, Any],
+    file2: str,
+    f2: Dict[str, Any],
+    threshold: float,
+    similarities: List[List[Dict[str, float]]],
+) -> Optional[Dict[str, Any]]:
     """
-    Recursively scan a directory, analyze all Python files,
-    and detect highly similar files based on AST structure.
+    Compare two analyzed files and return their report entry if they are similar.
+
+    `similarities[i][j]` holds the scores of the i-th function of the first
+    file against the j-th function of the second.
+    """
+    # Compare function by function
+    pair_comparisons = []
+    all_composite_scores = []
+
+    for i, (fname1, func1) in enumerate(f1["functions"].items()):
+        for j, (fname2, func2) in enumerate(f2["functions"].items()):
+            similarity = similarities[i][j]
+            score = similarity["composite"]
+            all_composite_scores.append(score)
+
+            pair_comparisons.append({
+                'func1_name': fname1,
+                'func2_name': fname2,
+                'func1_source': func1.source,
+                'func2_source': func2.source,
+                'func1_lines': f"{func1.line_start}-{func1.line_end}",
+                'func2_lines': f"{func2.line_start}-{func2.line_end}",
+                'similarity': similarity
+            })
+
+    if not all_composite_scores:
+        return None
+
+    max_score = max(all_composite_scores)
+
+    # Check if files are identical by hash for reporting
+    is_identical = f1["file_hash"] == f2["file_hash"]
+
+    # Filter by threshold (or if identical)
+    if max_score >= threshold or is_identical:
+        avg_similarity = sum(all_composite_scores) / \
+            len(all_composite_scores)
+        high_similarity_count = sum(
+            1 for score in all_composite_scores if score >= 80)
+
+        return {
+            "file1": file1,
+            "file2": file2,
+            "file1_functions": len(f1["functions"]),
+            "file2_functions": len(f2["functions"]),
+            "comparisons": pair_comparisons,
+            "avg_similarity": avg_similarity,
+            "high_similarity_count": high_similarity_count,
+            "similarity": round(max_score, 2),
+            "reason": "Identical AST structure" if is_identical else "High function-level similarity"
+        }
+
+    return None
+
+
+def _iter_candidate_file_pairs(
+    file_reports: Dict[str, Dict[str, Any]],
+    threshold: float,
+    changed: Optional[Set[str]] = None,
+    progress: Optional[ScanProgress] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Yield the file pairs that may be reported, in `combinations` order.
+
+    A pair is kept if its files are identical or if the candidate index
+    finds a function pair able to reach the threshold. If `changed` is
+    given, only pairs involving at least one of those files are yielded.
+    Pairs are generated file by file, so only the partners of one file
+    are held at a time.
+    """
+    paths = list(file_reports)
+    probe = None if changed is None else {
+        position for position, path in enumerate(paths) if path in changed}
+    index = CandidateIndex(threshold)
+    by_hash: Dict[str, List[int]] = defaultdict(list)
+
+    for position, path in enumerate(paths):
+        functions = file_reports[path]["functions"]
+        if not functions:
+            continue
+        by_hash[file_reports[path]["file_hash"]].append(position)
+        for func in functions.values():
+            index.add(func, owner=position)
+
+    partners_of = index.iter_owner_partners(probe, progress.check if progress is not None else None)
+    while True:
+        # Timed per file: the index is probed while pairs are being scored
+        with profiling.phase("scan.index"):
+            step = next(partners_of, None)
+        if step is None:
+            return
+        position, partners = step
+        identical = [
+            other for other in by_hash[file_reports[paths[position]]["file_hash"]]
+            if other > position and (probe is None or position in probe or other in probe)
+        ]
+        if identical:
+            partners = sorted(set(partners).union(identical))
+        for other in partners:
+            yield paths[position], paths[other]
+
+
+def _iter_compare_file_reports(
+    file_reports: Dict[str, Dict[str, Any]],
+    threshold: float,
+    prune: bool = False,
+    changed: Optional[Set[str]] = None,
+    reuse: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None,
+    progress: Optional[ScanProgress] = None,
+    keep: Optional[Callable[[str, str], bool]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Compare analyzed files pairwise and yield each similar pair once scored.
+
+    If `changed` is given, only pairs involving one of those files are
+    compared, and the entries of `reuse` (previous results for pairs of
+    unchanged files) are merged in at their position. If `keep` is given,
+    only the pairs for which `keep(file1, file2)` is true are compared.
+    With `prune`, only the file pairs the candidate index cannot rule out
+    are scored; at thresholds where no pair can be ruled out by its node
+    types (`min_structural_jaccard` is 0) the index is skipped.
+    """
+    if prune and min_structural_jaccard(threshold) > 0:
+        # Streamed like the unpruned pairs; the index is probed file by file
+        pairs = _iter_candidate_file_pairs(file_reports, threshold, changed, progress)
+        if keep is not None:
+            pairs = (pair for pair in pairs if keep(*pair))
+    else:
+        # Generated lazily: the number of pairs is quadratic in the file count
+        pairs = (
+            (file1, file2) for file1, file2 in (
+                combinations(file_reports.keys(), 2) if changed is None
+                else _changed_pairs(list(file_reports), changed))
+            if keep is None or keep(file1, file2)
+        )
+        if progress is not None and keep is None:
+            unchanged = len(file_reports) - len(changed or ())
+            progress.pairs_total = (
+                len(file_reports) * (len(file_reports) - 1) // 2
+                - (unchanged * (unchanged - 1) // 2 if changed is not None else 0))
+
+    if reuse:
+        positions = {path: i for i, path in enumerate(file_reports)}
+        pairs = list(pairs)
+        pairs.extend(
+            pair for pair in reuse
+            if pair[0] in positions and pair[1] in positions
+        )
+        pairs.sort(key=lambda pair: (positions[pair[0]], positions[pair[1]]))
+    if progress is not None:
+        progress.start_phase("comparing")
+        if isinstance(pairs, list):
+            progress.pairs_total = len(pairs)
+
+    # Pack the functions once so pairs are scored in vectorized blocks
+    functions: List[FunctionMetrics] = []
+    function_ids: Dict[str, range] = {}
+    for path, report in file_reports.items():
+        start = len(functions)
+        functions.extend(report["functions"].values())
+        function_ids[path] = range(start, len(functions))
+    matrix = MetricsMatrix(functions)
+
+    # The maxima are computed a bounded number of pairs ahead of the loop
+    pairs, scored_pairs = tee(pairs)
+    maxima = matrix.iter_block_maxima(
+        ((function_ids[file1], function_ids[file2]) for file1, file2 in scored_pairs
+         if not reuse or (file1, file2) not in reuse),
+        threshold)
+
+    compared = 0
+    for file1, file2 in pairs:
+        if progress is not None:
+            progress.check()
+            progress.pairs_scored += 1
+
+        if reuse and (file1, file2) in reuse:
+            yield reuse[(file1, file2)]
+            continue
+
+        f1 = file_reports[file1]
+        f2 = file_reports[file2]
+        compared += 1
+        profiling.count("file_pairs_scored")
+
+        with profiling.phase("scan.compare"):
+            # Skip building comparisons for pairs that cannot be reported
+            max_score = next(maxima)
+            if max_score is not None and max_score < threshold and f1["file_hash"] != f2["file_hash"]:
+                entry = None
+            else:
+                similarities = matrix.score_block(function_ids[file1], function_ids[file2])
+                entry = _compare_files(file1, f1, file2, f2, threshold, similarities)
+        if entry is not None:
+            yield entry
+
+    if progress is not None and progress.pairs_total is None:
+        progress.pairs_total = progress.pairs_scored
+    if prune and keep is None and profiling.current() is not None:
+        total = len(file_reports) * (len(file_reports) - 1) // 2
+        if changed is not None:
+            unchanged = len(file_reports) - len(changed)
+            total -= unchanged * (unchanged - 1) // 2
+        profiling.count("file_pairs_pruned", total - compared)
+
+
+def _changed_pairs(paths: List[str], changed: Set[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Yield the pairs of `combinations(paths, 2)` involving a changed file, in
+    the same order, without enumerating the pairs of unchanged files.
+    """
+    changed_positions = [position for position, path in enumerate(paths) if path in changed]
+    for i, file1 in enumerate(paths):
+        if file1 in changed:
+            for file2 in paths[i + 1:]:
+                yield file1, file2
+        else:
+            for j in changed_positions[bisect_right(changed_positions, i):]:
+                yield file1, paths[j]
+
+
+def _resolve_changed_files(file_reports: Dict[str, Dict[str, Any]], changed_files: Iterable[str]) -> Set[str]:
+    """Return the paths of `file_reports` that name one of `changed_files`, however spelled."""
+    wanted = {os.path.normcase(os.path.realpath(path)) for path in changed_files}
+    return {path for path in file_reports if os.path.normcase(os.path.realpath(path)) in wanted}
+
+
+def _compare_file_reports(
+    file_reports: Dict[str, Dict[str, Any]],
+    threshold: float,
+    prune: bool = False,
+    changed: Optional[Set[str]] = None,
+    reuse: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """Compare analyzed files pairwise and return the similar pairs."""
+    return list(_iter_compare_file_reports(file_reports, threshold, prune, changed, reuse))
+
+
+def _group_exact_duplicates(file_reports: Dict[str, Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Group files by file hash and functions by AST hash in one linear pass.
+
+    Only groups with at least two members are returned, in order of first
+    occurrence. Files without functions are left out, as they are never
+    reported by scans.
+    """
+    files: Dict[str, List[str]] = defaultdict(list)
+    functions: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for path, report in file_reports.items():
+        if not report["functions"]:
+            continue
+        files[report["file_hash"]].append(path)
+        for name, func in report["functions"].items():
+            functions[func.ast_hash].append({
+                "file": path,
+                "name": name,
+                "lines": f"{func.line_start}-{func.line_end}",
+            })
+
+    return {
+        "files": [
+            {"file_hash": file_hash, "files": paths}
+            for file_hash, paths in files.items() if len(paths) > 1
+        ],
+        "functions": [
+            {"ast_hash": ast_hash, "functions": members}
+            for ast_hash, members in functions.items() if len(members) > 1
+        ],
+    }
+
+
+def _skip_identical(
+    file_reports: Dict[str, Dict[str, Any]],
+    groups: List[Dict[str, Any]],
+) -> Dict[str, Dict[str, Any]]:
+    """Keep only the first file of each group of identical files."""
+    copies = {path for group in groups for path in group["files"][1:]}
+    return {path: report for path, report in file_reports.items() if path not in copies}
+
+
+def _analyze_directory(
+    directory: str,
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    progress: Optional[ScanProgress] = None,
+    readers: int = DEFAULT_READERS,
+    discovery: Optional[FileDiscovery] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Analyze every Python file in a directory and return per-file reports.
+
+    Files are read and analyzed while the directory is still being walked,
+    so `progress.files_total` grows until the walk is over. Files are found
+    by `discovery` (default: a shared one honouring ignore files).
     """
     if not os.path.exists(directory):
         raise ValueError("Directory does not exist")
 
+    if progress is not None:
+        progress.start_phase("analyzing")
+
+    def paths():
+        # 1. Scan all folders
+        for path in _iter_python_files(directory, discovery):
+            if progress is not None:
+                progress.files_total += 1
+            yield path
+
     file_reports = {}
-    print("Starting directory scan...", directory)
-    # 1. Scan all folders
-    for root, dirs, files in os.walk(directory):
-        # Remove virtual environment directories from traversal
-        dirs[:] = [d for d in dirs if not is_ignored(d)]
-
-        for file in files:
-            if file.endswith(".py"):
-                full_path = os.path.join(root, file)
-                try:
-                    with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                        src = f.read()
-                except Exception:
-                    continue
+    for full_path, functions in _analyze_files(
+            paths(), cache, workers, progress=progress, readers=readers).items():
+        file_reports[full_path] = {
+            "functions": functions,
+            "file_hash": _file_hash(functions),
+        }
+    return file_reports
+
+
+def _refresh_state(
+    directory: str,
+    state: ScanState,
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    lazy_source: bool = False,
+    readers: int = DEFAULT_READERS,
+    discovery: Optional[FileDiscovery] = None,
+) -> Tuple[Dict[str, Dict[str, Any]], Set[str]]:
+    """
+    Bring the file manifest of `state` up to date with a directory.
 
-                # Skip empty files
-                if not src.strip():
-                    continue
+    Files whose mtime and size did not change are taken from the manifest
+    without being read; files whose content hash did not change are not
+    re-analyzed. Returns the per-file reports and the set of files that
+    were (re-)analyzed. `lazy_source` and `readers` are passed on to
+    `_analyze_files`; files whose stat changed are read by `readers` threads.
+    """
+    if not os.path.exists(directory):
+        raise ValueError("Directory does not exist")
 
-                analyzer = CodeAnalyzer(src, full_path)
-                try:
-                    analyzer.analyze()
-                except Exception:
-                    continue
+    records: Dict[str, FileRecord] = {}
+    sources: Dict[str, str] = {}
+    stats: Dict[str, os.stat_result] = {}
+
+    paths = list(_iter_python_files(directory, discovery))
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
 
-                # Compute file-level AST hash (combine all function AST hashes)
-                if not analyzer.functions:
-                    pass
+        previous = state.files.get(path)
+        if previous is not None and previous.mtime_ns == stat.st_mtime_ns and previous.size == stat.st_size:
+            records[path] = previous
+            continue
+        stats[path] = stat
 
-                file_hash = hashlib.md5(
-                    "".join(
-                        m.ast_hash for m in analyzer.functions.values()).encode()
-                ).hexdigest()
+    for path, src in iter_read_sources(list(stats), readers):
+        if src is None:
+            del stats[path]
+            continue
+        stat = stats[path]
+        previous = state.files.get(path)
+        digest = content_hash(src)
+        if previous is not None and previous.digest == digest:
+            previous.mtime_ns = stat.st_mtime_ns
+            previous.size = stat.st_size
+            records[path] = previous
+            continue
 
-                file_reports[full_path] = {
-                    "functions": analyzer.functions,
-                    "file_hash": file_hash,
-                }
+        sources[path] = src
+
+    changed = [path for path in paths if path in sources]
+    analyzed = _analyze_files(
+        changed, cache, workers, sources=sources, lazy_source=lazy_source, readers=readers)
+    for path in changed:
+        functions = analyzed.get(path)
+        records[path] = FileRecord(
+            mtime_ns=stats[path].st_mtime_ns,
+            size=stats[path].st_size,
+            digest=content_hash(sources[path]),
+            functions=functions,
+            file_hash=_file_hash(functions) if functions is not None else "",
+        )
+
+    state.files = records
+    file_reports = {
+        path: {"functions": records[path].functions, "file_hash": records[path].file_hash}
+        for path in paths
+        if path in records and records[path].functions is not None
+    }
+    return file_reports, set(changed)
+
+
+def iter_scan_directory(
+    directory: str,
+    threshold: float = 80.0,
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    prune: bool = False,
+    progress: Optional[ScanProgress] = None,
+    table: Optional[FunctionTable] = None,
+    function_threshold: Optional[float] = None,
+    readers: int = DEFAULT_READERS,
+    discovery: Optional[FileDiscovery] = None,
+    changed_files: Optional[Iterable[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Scan a directory like `scan_directory`, yielding each similar file pair
+    as soon as it is scored.
+
+    Pairs are yielded in the same order as the `results` of `scan_directory`
+    and no result is retained, so memory does not grow with the number of
+    reported pairs. A ScanProgress passed as `progress` is kept up to date
+    and can be used to cancel the scan. If a FunctionTable is given, entries
+    are yielded in the compact format, referencing functions added to it
+    (keeping comparisons scoring at least `function_threshold`, default:
+    `threshold`). `changed_files` restricts scoring as in `scan_directory`.
+    """
+    file_reports = _analyze_directory(directory, cache, workers, progress, readers, discovery)
+    changed = None
+    if changed_files is not None:
+        changed = _resolve_changed_files(file_reports, changed_files)
 
     # 2. Compare files pairwise
-    similar_pairs = []
+    if function_threshold is None:
+        function_threshold = threshold
+    for entry in _iter_compare_file_reports(
+            file_reports, threshold, prune, changed=changed, progress=progress):
+        if progress is not None:
+            progress.pairs_reported += 1
+        if table is not None:
+            entry = table.compact_entry(
+                entry, entry["file1"], file_reports[entry["file1"]]["functions"],
+                entry["file2"], file_reports[entry["file2"]]["functions"], function_threshold)
+        yield entry
+    if progress is not None:
+        progress.start_phase("done")
+
+
+def scan_directory(
+    directory: str,
+    threshold: float = 80.0,
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    prune: bool = False,
+    state: Optional[ScanState] = None,
+    compact: bool = False,
+    function_threshold: Optional[float] = None,
+    skip_identical: bool = False,
+    readers: int = DEFAULT_READERS,
+    discovery: Optional[FileDiscovery] = None,
+    changed_files: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Recursively scan a directory, analyze all Python files,
+    and detect highly similar files based on AST structure.
 
-    for file1, file2 in combinations(file_reports.keys(), 2):
-        f1 = file_reports[file1]
-        f2 = file_reports[file2]
+    If a cache is given, files whose content did not change since they were
+    cached are not re-analyzed, and the result includes its hit/miss counters.
+    With `workers` > 1 (or None/0 for all cores) files are analyzed in a
+    process pool; results are identical to the serial path. Files are read
+    by `readers` threads (1 = serially) while earlier ones are analyzed.
+    With `prune`, only file pairs that the candidate index cannot rule out
+    are compared; this never changes the results. It is off by default, as
+    vectorized scoring of every pair is about as fast as probing the index;
+    it can pay off with the pure-Python scorer at high thresholds.
+    If a ScanState from a previous scan is given, only added or modified
+    files are re-analyzed and only pairs involving them are rescored; the
+    results are identical to a full scan and the state is updated in place.
+    With `compact`, functions are listed once in a "functions" side table,
+    comparisons refer to them by id and only those scoring at least
+    `function_threshold` (default: `threshold`) are kept.
+    With `skip_identical`, files with the same file hash are listed in an
+    "identical" key and only the first file of each group is compared with
+    the others, which saves most of the work on trees of copied code.
+    Files are found by `discovery` (default: a shared `FileDiscovery` of
+    the directory, honouring `.gitignore` and `.deepcsimignore` files).
+    If `changed_files` is given (e.g. from `changes.git_changed_files`),
+    the whole tree is still analyzed but only pairs involving one of those
+    files are scored; the files found in the tree are listed in a
+    "changed_files" key.
+    """
+    if skip_identical and state is not None:
+        raise ValueError("skip_identical cannot be combined with an incremental scan")
+    if changed_files is not None and state is not None:
+        raise ValueError("changed_files cannot be combined with an incremental scan")
+
+    print("Starting directory scan...", directory)
+    identical = None
+    changed = None
+    if state is None:
+        file_reports = _analyze_directory(
+            directory, cache, workers, readers=readers, discovery=discovery)
+        if changed_files is not None:
+            changed = _resolve_changed_files(file_reports, changed_files)
+            changed_order = [path for path in file_reports if path in changed]
+        if skip_identical:
+            identical = _group_exact_duplicates(file_reports)["files"]
+            file_reports = _skip_identical(file_reports, identical)
+
+        # 2. Compare files pairwise
+        similar_pairs = _iter_compare_file_reports(file_reports, threshold, prune, changed=changed)
+        if not compact:
+            similar_pairs = list(similar_pairs)
+    else:
+        file_reports, changed = _refresh_state(
+            directory, state, cache, workers, readers=readers, discovery=discovery)
+        reuse = state.reusable_results(directory, threshold, list(file_reports), changed)
+
+        # 2. Compare pairs involving changed files, reusing the others
+        if reuse is None:
+            similar_pairs = _compare_file_reports(file_reports, threshold, prune)
+        else:
+            similar_pairs = _compare_file_reports(
+                file_reports, threshold, prune, changed=changed, reuse=reuse)
+
+        state.directory = os.path.abspath(directory)
+        state.threshold = threshold
+        state.order = list(file_reports)
+        state.results = {(entry["file1"], entry["file2"]): entry for entry in similar_pairs}
+        state.changed = changed
+
+    if compact:
+        # Entries are compacted one at a time, so full comparisons never pile up
+        table = FunctionTable()
+        if function_threshold is None:
+            function_threshold = threshold
+        similar_pairs = [
+            table.compact_entry(
+                entry, entry["file1"], file_reports[entry["file1"]]["functions"],
+                entry["file2"], file_reports[entry["file2"]]["functions"], function_threshold)
+            for entry in similar_pairs
+        ]
+
+    result = {"count": len(similar_pairs), "results": similar_pairs}
+    if compact:
+        result["functions"] = table.rows
+    if identical is not None:
+        result["identical"] = identical
+    if changed_files is not None:
+        result["changed_files"] = changed_order
+    if cache is not None:
+        result["cache"] = {"hits": cache.hits, "misses": cache.misses}
+    return result
+
+
+def verify_pruning_recall(
+    directory: str,
+    threshold: float = 80.0,
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    readers: int = DEFAULT_READERS,
+    discovery: Optional[FileDiscovery] = None,
+) -> Dict[str, Any]:
+    """
+    Scan a directory with and without candidate pruning and compare the results.
+
+    Returns the number of pairs found by both modes, the recall of the
+    pruned scan and the pairs it missed (which should always be empty).
+    """
+    file_reports = _analyze_directory(
+        directory, cache, workers, readers=readers, discovery=discovery)
+
+    pruned = {
+        (entry["file1"], entry["file2"])
+        for entry in _compare_file_reports(file_reports, threshold, prune=True)
+    }
+    brute_force = {
+        (entry["file1"], entry["file2"])
+        for entry in _compare_file_reports(file_reports, threshold, prune=False)
+    }
+    missed = sorted(brute_force - pruned)
+
+    return {
+        "pruned_count": len(pruned),
+        "brute_force_count": len(brute_force),
+        "recall": (len(brute_force) - len(missed)) / len(brute_force) if brute_force else 1.0,
+        "missed": [{"file1": file1, "file2": file2} for file1, file2 in missed],
+    }
+
+
+def find_exact_duplicates(
+    directory: str,
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    readers: int = DEFAULT_READERS,
+    discovery: Optional[FileDiscovery] = None,
+) -> Dict[str, Any]:
+    """
+    Find exact structural clones without any similarity scoring.
+
+    Returns groups of files with the same file hash ("files") and groups
+    of functions with the same AST hash ("functions"); both are found in
+    time linear in the number of functions.
+    """
+    return _group_exact_duplicates(
+        _analyze_directory(directory, cache, workers, readers=readers, discovery=discovery))
+
+
+def find_clone_clusters(
+    directory: str,
+    threshold: float = 80.0,
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    exact: bool = False,
+    readers: int = DEFAULT_READERS,
+    discovery: Optional[FileDiscovery] = None,
+) -> Dict[str, Any]:
+    """
+    Group the functions of a directory into clone classes.
+
+    Instead of one entry per similar file pair, every set of functions
+    linked by similarities of at least `threshold` (or, with `exact`, by
+    identical AST structure only) is reported once with its members. See
+    `clusters.cluster_functions` for the result layout.
+    """
+    file_reports = _analyze_directory(
+        directory, cache, workers, readers=readers, discovery=discovery)
+    return cluster_functions(file_reports, threshold, exact)
+
+
+def write_directory_store(
+    directory: str,
+    path: str,
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    readers: int = DEFAULT_READERS,
+    discovery: Optional[FileDiscovery] = None,
+) -> MetricsStore:
+    """Analyze every Python file in a directory into a metrics store at `path`."""
+    write_store(path, _analyze_directory(
+        directory, cache, workers, readers=readers, discovery=discovery))
+    return MetricsStore(path)
+
+
+def iter_scan_store(
+    store: MetricsStore,
+    threshold: float = 80.0,
+    progress: Optional[ScanProgress] = None,
+    table: Optional[FunctionTable] = None,
+    function_threshold: Optional[float] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Scan the files of a metrics store like `iter_scan_directory` scans a tree.
+
+    Every file pair is scored in vectorized blocks straight from the
+    memory-mapped columns; FunctionMetrics are only built for the files of
+    reported pairs. Results are the same as scanning the tree the store was
+    written from.
+    """
+    matrix = MetricsMatrix.from_store(store)
+    paths = store.paths
+    file_hashes = [store.file_hash(file_id) for file_id in range(len(paths))]
+    function_ids = [store.function_ids(file_id) for file_id in range(len(paths))]
+    if function_threshold is None:
+        function_threshold = threshold
+    if progress is not None:
+        progress.files_total = progress.files_parsed = len(paths)
+        progress.pairs_total = len(paths) * (len(paths) - 1) // 2
+        progress.start_phase("comparing")
+
+    pairs, scored_pairs = tee(combinations(range(len(paths)), 2))
+    maxima = matrix.iter_block_maxima(
+        ((function_ids[file1], function_ids[file2]) for file1, file2 in scored_pairs), threshold)
+
+    for file1, file2 in pairs:
+        if progress is not None:
+            progress.check()
+            progress.pairs_scored += 1
+
+        max_score = next(maxima)
+        if max_score is not None and max_score < threshold and file_hashes[file1] != file_hashes[file2]:
+            continue
+
+        f1 = {"functions": store.file_functions(paths[file1]), "file_hash": file_hashes[file1]}
+        f2 = {"functions": store.file_functions(paths[file2]), "file_hash": file_hashes[file2]}
+        similarities = matrix.score_block(function_ids[file1], function_ids[file2])
+        entry = _compare_files(paths[file1], f1, paths[file2], f2, threshold, similarities)
+        if entry is None:
+            continue
+        if progress is not None:
+            progress.pairs_reported += 1
+        if table is not None:
+            entry = table.compact_entry(
+                entry, paths[file1], f1["functions"], paths[file2], f2["functions"], function_threshold)
+        yield entry
+    if progress is not None:
+        progress.start_phase("done")
+
+
+def scan_store(
+    store: MetricsStore,
+    threshold: float = 80.0,
+    compact: bool = False,
+    function_threshold: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Scan the files of a metrics store and return the same report as `scan_directory`.
+
+    Several processes can scan one store at once; its columns are shared
+    read-only through the page cache.
+    """
+    table = FunctionTable() if compact else None
+    similar_pairs = list(iter_scan_store(store, threshold, table=table,
+                                         function_threshold=function_threshold))
+    result = {"count": len(similar_pairs), "results": similar_pairs}
+    if table is not None:
+        result["functions"] = table.rows
+    return result
+
+
+def _collect_matches(
+    target_functions: Dict[str, FunctionMetrics],
+    target_ids: range,
+    file_functions: Dict[str, Dict[str, FunctionMetrics]],
+    function_ids: Dict[str, range],
+    matrix: MetricsMatrix,
+    directory: str,
+    threshold: float,
+) -> List[Dict[str, Any]]:
+    """
+    Build the matches of a target file against other analyzed files.
+
+    `matrix` must hold the target functions at `target_ids` and the
+    functions of every file of `file_functions` at `function_ids[path]`.
+    """
+    target_hash = _file_hash(target_functions)
+
+    matches = []
+
+    maxima = matrix.iter_block_maxima(
+        ((target_ids, function_ids[path]) for path in file_functions), threshold)
+
+    for (full_path, functions), block_max in zip(file_functions.items(), maxima):
+        # Check for identical files first
+        file_hash = _file_hash(functions)
+
+        is_identical = target_hash == file_hash
+
+        if block_max is not None and block_max < threshold and not is_identical:
+            continue
+
+        # Pairs below the threshold are None
+        similarities = matrix.score_block(target_ids, function_ids[full_path], threshold)
 
         # Compare function by function
         pair_comparisons = []
         all_composite_scores = []
 
-        for fname1, func1 in f1["functions"].items():
-            for fname2, func2 in f2["functions"].items():
-                similarity = SimilarityCalculator.calculate_all(func1, func2)
-                score = similarity["composite"]
-                all_composite_scores.append(score)
-
-                pair_comparisons.append({
-                    'func1_name': fname1,
-                    'func2_name': fname2,
-                    'func1_source': func1.source,
-                    'func2_source': func2.source,
-                    'func1_lines': f"{func1.line_start}-{func1.line_end}",
-                    'func2_lines': f"{func2.line_start}-{func2.line_end}",
-                    'similarity': similarity
-                })
-
-        if not all_composite_scores:
-            continue
+        for i, (fname1, func1) in enumerate(target_functions.items()):
+            for j, (fname2, func2) in enumerate(functions.items()):
+                similarity = similarities[i][j]
 
-        max_score = max(all_composite_scores)
+                if similarity is not None:  # Only pairs meeting threshold
+                    score = similarity["composite"]
+                    all_composite_scores.append(score)
+                    pair_comparisons.append({
+                        'func1_name': fname1,
+                        'func2_name': fname2,
+                        'func1_source': func1.source,
+                        'func2_source': func2.source,
+                        'func1_lines': f"{func1.line_start}-{func1.line_end}",
+                        'func2_lines': f"{func2.line_start}-{func2.line_end}",
+                        'similarity': similarity
+                    })
+
+        if not all_composite_scores and not is_identical:
+            continue
 
-        # Check if files are identical by hash for reporting
-        is_identical = f1["file_hash"] == f2["file_hash"]
+        max_score = max(
+            all_composite_scores) if all_composite_scores else 0.0
 
-        # Filter by threshold (or if identical)
         if max_score >= threshold or is_identical:
-            avg_similarity = sum(all_composite_scores) / \
-                len(all_composite_scores)
+            avg_similarity = sum(
+                all_composite_scores) / len(all_composite_scores) if all_composite_scores else 0
             high_similarity_count = sum(
                 1 for score in all_composite_scores if score >= 80)
 
-            similar_pairs.append({
-                "file1": file1,
-                "file2": file2,
-                "file1_functions": len(f1["functions"]),
-                "file2_functions": len(f2["functions"]),
-                "comparisons": pair_comparisons,
-                "avg_similarity": avg_similarity,
+            matches.append({
+                "file": full_path,
+                "relative_path": os.path.relpath(full_path, directory).replace("\\", "/"),
+                "similarity": 100.0 if is_identical else round(max_score, 2),
+                "avg_similarity": round(avg_similarity, 2),
                 "high_similarity_count": high_similarity_count,
-                "similarity": round(max_score, 2),
-                "reason": "Identical AST structure" if is_identical else "High function-level similarity"
+                "reason": "Identical AST usage" if is_identical else "High function similarity",
+                "comparisons": sorted(pair_comparisons, key=lambda x: x['similarity']['composite'], reverse=True)
             })
 
-    return {"count": len(similar_pairs), "results": similar_pairs}
+    # Sort matches by max similarity
+    matches.sort(key=lambda x: x['similarity'], reverse=True)
+    return matches
 
 
-def find_matches_for_file(target_path: str, directory: str, threshold: float = 50.0) -> List[Dict[str, Any]]:
+def compact_matches(
+    matches: List[Dict[str, Any]],
+    target_path: str,
+    target_functions: Dict[str, FunctionMetrics],
+    file_functions: Dict[str, Dict[str, FunctionMetrics]],
+    function_threshold: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Convert the matches of a target file to the compact format (see `deepcsim.core.compact`)."""
+    table = FunctionTable()
+    return {
+        "matches": [
+            table.compact_entry(
+                match, target_path, target_functions,
+                match["file"], file_functions[match["file"]], function_threshold)
+            for match in matches
+        ],
+        "functions": table.rows,
+    }
+
+
+def find_matches_for_file(
+    target_path: str,
+    directory: str,
+    threshold: float = 50.0,
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    compact: bool = False,
+    function_threshold: Optional[float] = None,
+    readers: int = DEFAULT_READERS,
+    discovery: Optional[FileDiscovery] = None,
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
     """
     Find files in directory that are similar to the target file.
     Returns a list of matches with detailed function comparisons.
+
+    With `compact`, returns {"matches": [...], "functions": [...]} where
+    comparisons refer to the functions side table by id.
     """
     if not os.path.exists(target_path):
         raise ValueError(f"Target file not found: {target_path}")
@@ -131,98 +960,36 @@ def find_matches_for_file(target_path: str, directory: str, threshold: float = 5
     target_analyzer.analyze()
 
     if not target_analyzer.functions:
-        return []
-
-    target_hash = hashlib.md5(
-        "".join(m.ast_hash for m in target_analyzer.functions.values()).encode()
-    ).hexdigest()
-
-    matches = []
-
-    # Scan all folders
-    for root, dirs, files in os.walk(directory):
-        # Remove virtual environment directories from traversal
-        dirs[:] = [d for d in dirs if not is_ignored(d)]
-
-        for file in files:
-            if not file.endswith(".py"):
-                continue
-
-            full_path = os.path.join(root, file)
-
-            # Skip the target file itself
-            if os.path.abspath(full_path) == os.path.abspath(target_path):
-                continue
-
-            try:
-                with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                    src = f.read()
-            except Exception:
-                continue
-
-            if not src.strip():
-                continue
-
-            analyzer = CodeAnalyzer(src, full_path)
-            try:
-                analyzer.analyze()
-            except Exception:
-                continue
-
-            if not analyzer.functions:
-                continue
-
-            # Check for identical files first
-            file_hash = hashlib.md5(
-                "".join(m.ast_hash for m in analyzer.functions.values()).encode()
-            ).hexdigest()
-
-            is_identical = target_hash == file_hash
-
-            # Compare function by function
-            pair_comparisons = []
-            all_composite_scores = []
-
-            for fname1, func1 in target_analyzer.functions.items():
-                for fname2, func2 in analyzer.functions.items():
-                    similarity = SimilarityCalculator.calculate_all(
-                        func1, func2)
-                    score = similarity["composite"]
-
-                    if score >= threshold:  # Only pairs meeting threshold
-                        all_composite_scores.append(score)
-                        pair_comparisons.append({
-                            'func1_name': fname1,
-                            'func2_name': fname2,
-                            'func1_source': func1.source,
-                            'func2_source': func2.source,
-                            'func1_lines': f"{func1.line_start}-{func1.line_end}",
-                            'func2_lines': f"{func2.line_start}-{func2.line_end}",
-                            'similarity': similarity
-                        })
-
-            if not all_composite_scores and not is_identical:
-                continue
-
-            max_score = max(
-                all_composite_scores) if all_composite_scores else 0.0
-
-            if max_score >= threshold or is_identical:
-                avg_similarity = sum(
-                    all_composite_scores) / len(all_composite_scores) if all_composite_scores else 0
-                high_similarity_count = sum(
-                    1 for score in all_composite_scores if score >= 80)
-
-                matches.append({
-                    "file": full_path,
-                    "relative_path": os.path.relpath(full_path, directory).replace("\\", "/"),
-                    "similarity": 100.0 if is_identical else round(max_score, 2),
-                    "avg_similarity": round(avg_similarity, 2),
-                    "high_similarity_count": high_similarity_count,
-                    "reason": "Identical AST usage" if is_identical else "High function similarity",
-                    "comparisons": sorted(pair_comparisons, key=lambda x: x['similarity']['composite'], reverse=True)
-                })
-
-    # Sort matches by max similarity
-    matches.sort(key=lambda x: x['similarity'], reverse=True)
+        return {"matches": [], "functions": []} if compact else []
+
+    # Scan all folders, skipping the target file itself; files are read
+    # and analyzed while the walk goes on
+    target = os.path.abspath(target_path)
+    paths = (
+        path for path in _iter_python_files(directory, discovery)
+        if os.path.abspath(path) != target
+    )
+
+    file_functions = {
+        path: functions
+        for path, functions in _analyze_files(paths, cache, workers, readers=readers).items()
+        if functions
+    }
+
+    # Pack the target and every other function once for batch scoring
+    all_functions = list(target_analyzer.functions.values())
+    target_ids = range(len(all_functions))
+    function_ids: Dict[str, range] = {}
+    for path, functions in file_functions.items():
+        start = len(all_functions)
+        all_functions.extend(functions.values())
+        function_ids[path] = range(start, len(all_functions))
+    matrix = MetricsMatrix(all_functions)
+
+    matches = _collect_matches(
+        target_analyzer.functions, target_ids, file_functions, function_ids,
+        matrix, directory, threshold)
+    if compact:
+        return compact_matches(
+            matches, target_path, target_analyzer.functions, file_functions, function_threshold)
     return matches
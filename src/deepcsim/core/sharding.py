@@ -0,0 +1,196 @@
+"""
+Sharded scans with mergeable partial results.
+
+Files are assigned to blocks by a hash of their path relative to the
+scanned directory, which does not depend on directory listing order, so
+every host computes the same assignment. The pair space is the set of
+block pairs (a <= b), dealt out so that every shard gets about as many
+file pairs; each shard analyzes only the files of its blocks. Shard
+outputs hold paths relative to the scanned directory, so runners may
+check out the tree to different places; `merge_shards` rebases them onto
+one directory and combines the outputs of all shards into the same result
+as `scan_directory`.
+"""
+
+import heapq
+import os
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from deepcsim.core.cache import AnalysisCache
+from deepcsim.core.discovery import FileDiscovery
+from deepcsim.core.pipeline import DEFAULT_READERS
+from deepcsim.core.scanner import (
+    _analyze_files,
+    _file_hash,
+    _iter_compare_file_reports,
+    _iter_python_files,
+)
+
+# Bump whenever the layout of shard outputs changes
+SHARD_FORMAT = 2
+
+# Block pairs per shard: smaller block pairs balance the shards better,
+# but each shard analyzes the files of more blocks
+BLOCK_PAIRS_PER_SHARD = 4
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse a "K/N" shard spec (1 <= K <= N) into (K, N)."""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r}, expected K/N") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {spec!r}, expected 1 <= K <= N")
+    return index, count
+
+
+def block_count(shard_count: int) -> int:
+    """Smallest number of blocks having BLOCK_PAIRS_PER_SHARD block pairs per shard."""
+    blocks = 1
+    while blocks * (blocks + 1) // 2 < BLOCK_PAIRS_PER_SHARD * shard_count:
+        blocks += 1
+    return blocks
+
+
+def _relative(directory: str, path: str) -> str:
+    """Path of a file relative to the scanned directory, with "/" separators."""
+    return os.path.relpath(path, directory).replace(os.sep, "/")
+
+
+def file_block(directory: str, path: str, blocks: int) -> int:
+    """Block of a file, stable across hosts and listing orders."""
+    return zlib.crc32(_relative(directory, path).encode()) % blocks
+
+
+def _file_pairs(block_sizes: Sequence[int], a: int, b: int) -> int:
+    """Number of file pairs in the block pair (a, b)."""
+    return block_sizes[a] * (block_sizes[a] - 1) // 2 if a == b else block_sizes[a] * block_sizes[b]
+
+
+def shard_block_pairs(shard: int, shard_count: int, block_sizes: Sequence[int]) -> Set[Tuple[int, int]]:
+    """
+    Block pairs (a <= b) scanned by the 1-based `shard` of `shard_count`.
+
+    `block_sizes` holds the number of files of each block. Block pairs are
+    dealt out by decreasing number of file pairs, each to the shard having
+    the fewest file pairs so far, so every host computing the assignment
+    from the same tree gets the same balanced split.
+    """
+    blocks = len(block_sizes)
+    weighted = sorted(
+        (-_file_pairs(block_sizes, a, b), a, b) for a in range(blocks) for b in range(a, blocks))
+    loads = [(0, k) for k in range(1, shard_count + 1)]
+    block_pairs: Set[Tuple[int, int]] = set()
+    for weight, a, b in weighted:
+        load, k = heapq.heappop(loads)
+        if k == shard:
+            block_pairs.add((a, b))
+        heapq.heappush(loads, (load - weight, k))
+    return block_pairs
+
+
+def scan_shard(
+    directory: str,
+    shard: int,
+    shard_count: int,
+    threshold: float = 80.0,
+    cache: Optional[AnalysisCache] = None,
+    workers: Optional[int] = 1,
+    prune: bool = False,
+    readers: int = DEFAULT_READERS,
+    discovery: Optional[FileDiscovery] = None,
+) -> Dict[str, Any]:
+    """
+    Scan one shard of the file pairs of a directory.
+
+    Returns a JSON-serializable partial result holding the shard's similar
+    pairs and the order of all files, to be combined by `merge_shards`.
+    Paths are relative to `directory`, with "/" separators.
+    """
+    if not os.path.exists(directory):
+        raise ValueError("Directory does not exist")
+    if not 1 <= shard <= shard_count:
+        raise ValueError(f"Invalid shard {shard}/{shard_count}")
+
+    paths = list(_iter_python_files(directory, discovery))
+    blocks = block_count(shard_count)
+    block_of = {path: file_block(directory, path, blocks) for path in paths}
+    block_sizes = [0] * blocks
+    for block in block_of.values():
+        block_sizes[block] += 1
+    block_pairs = shard_block_pairs(shard, shard_count, block_sizes)
+    wanted = {block for pair in block_pairs for block in pair}
+
+    file_reports = {
+        path: {"functions": functions, "file_hash": _file_hash(functions)}
+        for path, functions in _analyze_files(
+            [path for path in paths if block_of[path] in wanted], cache, workers,
+            readers=readers).items()
+    }
+
+    def keep(file1: str, file2: str) -> bool:
+        a, b = block_of[file1], block_of[file2]
+        return (min(a, b), max(a, b)) in block_pairs
+
+    results = []
+    for entry in _iter_compare_file_reports(file_reports, threshold, prune, keep=keep):
+        entry["file1"] = _relative(directory, entry["file1"])
+        entry["file2"] = _relative(directory, entry["file2"])
+        results.append(entry)
+    return {
+        "format": SHARD_FORMAT,
+        "directory": os.path.abspath(directory),
+        "threshold": threshold,
+        "shard": shard,
+        "shard_count": shard_count,
+        "files": [_relative(directory, path) for path in paths],
+        "count": len(results),
+        "results": results,
+    }
+
+
+def merge_shards(shards: Sequence[Dict[str, Any]], directory: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Combine the outputs of every shard of a scan into one result.
+
+    Paths are rebased onto `directory` (by default, the directory the first
+    shard scanned), so the result is the same as `scan_directory` on the
+    tree checked out there. Raises ValueError if shards are missing,
+    duplicated or come from different scans.
+    """
+    if not shards:
+        raise ValueError("No shards to merge")
+    first = shards[0]
+    shard_count = first.get("shard_count")
+    seen: Set[int] = set()
+    for shard in shards:
+        if shard.get("format") != SHARD_FORMAT:
+            raise ValueError("Unsupported shard format")
+        # Directories are not compared: runners may check out to different places
+        if (shard["shard_count"], shard["threshold"]) != (shard_count, first["threshold"]):
+            raise ValueError("Shards come from different scans")
+        if shard["shard"] in seen:
+            raise ValueError(f"Shard {shard['shard']}/{shard_count} given twice")
+        seen.add(shard["shard"])
+    missing = sorted(set(range(1, shard_count + 1)) - seen)
+    if missing:
+        raise ValueError(f"Missing shards: {', '.join(f'{k}/{shard_count}' for k in missing)}")
+
+    # Files are ordered as the first shard listed them, then any others
+    positions: Dict[str, int] = {}
+    for shard in shards:
+        for path in shard["files"]:
+            positions.setdefault(path, len(positions))
+    results: List[Dict[str, Any]] = [entry for shard in shards for entry in shard["results"]]
+    results.sort(key=lambda entry: (positions[entry["file1"]], positions[entry["file2"]]))
+
+    if directory is None:
+        directory = first["directory"]
+    results = [
+        {**entry, "file1": os.path.join(directory, *entry["file1"].split("/")),
+         "file2": os.path.join(directory, *entry["file2"].split("/"))}
+        for entry in results
+    ]
+    return {"count": len(results), "results": results}
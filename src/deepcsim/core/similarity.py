@@ -1,51 +1,84 @@
-from typing import Dict
+from typing import Dict, List, Optional, Sequence, Tuple
+from . import profiling
 from .metrics import FunctionMetrics
 
+# (attribute, weight) pairs combined by calculate_metric
+METRIC_WEIGHTS = (
+    ('num_statements', 1.0),
+    ('num_args', 2.0),
+    ('cyclomatic_complexity', 2.0),
+    ('nesting_depth', 1.5)
+)
+
+# Scores are compared after rounding to two decimals, so a pair whose exact
+# composite lies slightly below the threshold can still be reported.
+ROUNDING_SLACK = 0.01
+
 class SimilarityCalculator:
     @staticmethod
     def calculate_structural(func1: FunctionMetrics, func2: FunctionMetrics) -> float:
         if func1.ast_hash == func2.ast_hash:
             return 100.0
         
-        all_node_types = set(func1.node_types.keys()) | set(func2.node_types.keys())
-        if not all_node_types:
+        ids1, counts1 = func1.node_type_ids, func1.node_type_counts
+        ids2, counts2 = func2.node_type_ids, func2.node_type_counts
+        len1, len2 = len(ids1), len(ids2)
+        if not len1 and not len2:
             return 0.0
-        
+
+        # Merge the sorted node type ids so that terms are summed in a fixed
+        # order; a type missing from one function contributes nothing.
         similarity = 0.0
-        for node_type in all_node_types:
-            count1 = func1.node_types.get(node_type, 0)
-            count2 = func2.node_types.get(node_type, 0)
-            max_count = max(count1, count2)
-            if max_count > 0:
-                similarity += (1 - abs(count1 - count2) / max_count)
-        
-        return (similarity / len(all_node_types)) * 100
+        union = 0
+        i = j = 0
+        while i < len1 or j < len2:
+            union += 1
+            if j == len2 or (i < len1 and ids1[i] < ids2[j]):
+                i += 1
+            elif i == len1 or ids2[j] < ids1[i]:
+                j += 1
+            else:
+                count1, count2 = counts1[i], counts2[j]
+                similarity += (1 - abs(count1 - count2) / max(count1, count2))
+                i += 1
+                j += 1
+
+        return (similarity / union) * 100
     
+    @staticmethod
+    def structural_upper_bound(func1: FunctionMetrics, func2: FunctionMetrics) -> float:
+        """
+        Upper bound of `calculate_structural`.
+
+        Node types present in only one function contribute nothing to the
+        structural score and shared ones at most 1, so the score cannot exceed
+        the Jaccard similarity of the two node-type sets.
+        """
+        if func1.ast_hash == func2.ast_hash:
+            return 100.0
+        shared = len(set(func1.node_type_ids).intersection(func2.node_type_ids))
+        union = len(func1.node_type_ids) + len(func2.node_type_ids) - shared
+        return (shared / union * 100) if union else 0.0
+
     @staticmethod
     def calculate_semantic(func1: FunctionMetrics, func2: FunctionMetrics) -> float:
-        calls_union = func1.called_functions | func2.called_functions
-        calls_intersection = func1.called_functions & func2.called_functions
-        calls_sim = (len(calls_intersection) / len(calls_union) * 100) if calls_union else 100.0
+        calls1 = set(func1.call_ids)
+        shared_calls = len(calls1.intersection(func2.call_ids))
+        calls_union = len(calls1) + len(func2.call_ids) - shared_calls
+        calls_sim = (shared_calls / calls_union * 100) if calls_union else 100.0
         
-        var_count_diff = abs(len(func1.variables_used) - len(func2.variables_used))
-        max_vars = max(len(func1.variables_used), len(func2.variables_used))
+        var_count_diff = abs(func1.num_variables - func2.num_variables)
+        max_vars = max(func1.num_variables, func2.num_variables)
         vars_sim = ((1 - var_count_diff / max_vars) * 100) if max_vars > 0 else 100.0
         
         return (calls_sim * 0.7 + vars_sim * 0.3)
     
     @staticmethod
     def calculate_metric(func1: FunctionMetrics, func2: FunctionMetrics) -> float:
-        metrics = [
-            ('num_statements', 1.0),
-            ('num_args', 2.0),
-            ('cyclomatic_complexity', 2.0),
-            ('nesting_depth', 1.5)
-        ]
-        
         weighted_sum = 0.0
         total_weight = 0.0
         
-        for metric_name, weight in metrics:
+        for metric_name, weight in METRIC_WEIGHTS:
             val1 = getattr(func1, metric_name)
             val2 = getattr(func2, metric_name)
             max_val = max(val1, val2)
@@ -59,10 +92,12 @@ class SimilarityCalculator:
     
     @classmethod
     def calculate_all(cls, func1: FunctionMetrics, func2: FunctionMetrics) -> Dict[str, float]:
-        structural = cls.calculate_structural(func1, func2)
-        semantic = cls.calculate_semantic(func1, func2)
-        metric = cls.calculate_metric(func1, func2)
-        composite = (structural * 0.5 + semantic * 0.3 + metric * 0.2)
+        with profiling.phase("similarity.calculate_all"):
+            structural = cls.calculate_structural(func1, func2)
+            semantic = cls.calculate_semantic(func1, func2)
+            metric = cls.calculate_metric(func1, func2)
+            composite = (structural * 0.5 + semantic * 0.3 + metric * 0.2)
+        profiling.count("function_pairs_scored")
         
         return {
             'structural': round(structural, 2),
@@ -70,3 +105,65 @@ class SimilarityCalculator:
             'metric': round(metric, 2),
             'composite': round(composite, 2)
         }
+    
+    @classmethod
+    def calculate_if_above(cls, func1: FunctionMetrics, func2: FunctionMetrics, threshold: float) -> Optional[Dict[str, float]]:
+        """
+        Return `calculate_all(func1, func2)` if its composite reaches `threshold`, else None.
+
+        The cheap metric and semantic scores are computed first and bound the
+        composite, first with a perfect structural score, then with the
+        node-type Jaccard similarity; the structural comparison is skipped
+        for pairs that cannot qualify.
+        """
+        return cls.bounded_scores(func1, func2, threshold)[0]
+
+    @classmethod
+    def bounded_scores(cls, func1: FunctionMetrics, func2: FunctionMetrics, threshold: float) -> Tuple[Optional[Dict[str, float]], float]:
+        """
+        Like `calculate_if_above`, also returning the unrounded composite score,
+        or an upper bound of it below `threshold` if the pair was rejected early.
+        """
+        limit = threshold - ROUNDING_SLACK
+        metric = cls.calculate_metric(func1, func2)
+        bound = 100.0 * 0.5 + 100.0 * 0.3 + metric * 0.2
+        if bound < limit:
+            profiling.count("function_pairs_pruned")
+            return None, bound
+
+        semantic = cls.calculate_semantic(func1, func2)
+        bound = 100.0 * 0.5 + semantic * 0.3 + metric * 0.2
+        if bound < limit:
+            profiling.count("function_pairs_pruned")
+            return None, bound
+        bound = cls.structural_upper_bound(func1, func2) * 0.5 + semantic * 0.3 + metric * 0.2
+        if bound < limit:
+            profiling.count("function_pairs_pruned")
+            return None, bound
+
+        structural = cls.calculate_structural(func1, func2)
+        profiling.count("function_pairs_scored")
+        composite = (structural * 0.5 + semantic * 0.3 + metric * 0.2)
+        if round(composite, 2) < threshold:
+            return None, composite
+        return {
+            'structural': round(structural, 2),
+            'semantic': round(semantic, 2),
+            'metric': round(metric, 2),
+            'composite': round(composite, 2)
+        }, composite
+
+    @classmethod
+    def calculate_matrix(cls, funcs1: Sequence[FunctionMetrics], funcs2: Sequence[FunctionMetrics]) -> List[List[Dict[str, float]]]:
+        """
+        Score every function of `funcs1` against every function of `funcs2`.
+
+        Returns a len(funcs1) x len(funcs2) matrix of `calculate_all` results,
+        computed with the vectorized batch engine when NumPy is installed.
+        """
+        from .batch import MetricsMatrix
+
+        matrix = MetricsMatrix(list(funcs1) + list(funcs2))
+        rows = range(len(funcs1))
+        cols = range(len(funcs1), len(funcs1) + len(funcs2))
+        return matrix.score_block(rows, cols)
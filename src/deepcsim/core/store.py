@@ -0,0 +1,258 @@
+"""
+Memory-mapped columnar store of analyzed functions.
+
+A store is a directory of NumPy `.npy` columns that are opened with
+`mmap_mode='r'`, so scoring reads them zero-copy and any number of
+processes can share one read-only store through the page cache:
+
+    meta.json                  format and analyzer version, node type names
+    node_counts.npy            (functions, node types) int32 count matrix
+    metric_columns.npy         (functions, len(METRIC_WEIGHTS)) int32
+    num_variables.npy          int32
+    lines.npy                  (functions, 2) int32 start and end line
+    ast_hashes.npy, hash_ids   hex AST hash and dense id per distinct hash
+    calls_*, variables_*       CSR arrays of string table ids
+    name_ids.npy               string table id of each function name
+    file_offsets.npy           functions of file i are file_offsets[i]:file_offsets[i+1]
+    path_ids.npy, file_hashes  per-file string table id and file hash
+    strings.bin, string_offsets.npy   UTF-8 string table
+    sources.bin, source_offsets.npy   UTF-8 function sources
+
+`FunctionMetrics` objects are only built on demand for the functions that
+end up in results.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+from .analyzer import ANALYZER_VERSION
+from .metrics import NODE_TYPES, FunctionMetrics
+from .similarity import METRIC_WEIGHTS
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is an optional dependency
+    np = None
+
+# Bump whenever the layout of the store changes
+STORE_VERSION = 1
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Metrics stores require NumPy (pip install deepcsim[fast])")
+
+
+class _StringTable:
+    """Collects strings for the store's string table while it is written."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.blob = bytearray()
+        self.offsets: List[int] = [0]
+
+    def add(self, value: str) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.offsets) - 1
+            self.blob += value.encode()
+            self.offsets.append(len(self.blob))
+        return string_id
+
+
+def write_store(path: str, file_reports: Dict[str, Dict[str, object]]) -> None:
+    """
+    Write analyzed files to a store directory at `path`.
+
+    `file_reports` maps file paths to {"functions": ..., "file_hash": ...}
+    reports, as produced by the scanner; files without functions are left
+    out. Existing columns in `path` are overwritten.
+    """
+    _require_numpy()
+    os.makedirs(path, exist_ok=True)
+    meta_path = os.path.join(path, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    strings = _StringTable()
+    sources = bytearray()
+    source_offsets = [0]
+    file_offsets = [0]
+    path_ids: List[int] = []
+    file_hashes: List[str] = []
+    functions: List[FunctionMetrics] = []
+    name_ids: List[int] = []
+
+    for file_path, report in file_reports.items():
+        file_functions = report["functions"]
+        if not file_functions:
+            continue
+        path_ids.append(strings.add(file_path))
+        file_hashes.append(report["file_hash"])
+        for name, metrics in file_functions.items():
+            functions.append(metrics)
+            name_ids.append(strings.add(name))
+            sources += metrics.source.encode()
+            source_offsets.append(len(sources))
+        file_offsets.append(len(functions))
+
+    count = len(functions)
+    node_types = sorted({node_id for func in functions for node_id in func.node_type_ids})
+    column = {node_id: i for i, node_id in enumerate(node_types)}
+    node_counts = np.zeros((count, len(node_types)), dtype=np.int32)
+    for row, func in enumerate(functions):
+        for node_id, value in zip(func.node_type_ids, func.node_type_counts):
+            node_counts[row, column[node_id]] = value
+
+    def csr(names_of):
+        indptr = [0]
+        indices: List[int] = []
+        for func in functions:
+            indices.extend(strings.add(name) for name in sorted(names_of(func)))
+            indptr.append(len(indices))
+        return np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int32)
+
+    calls_indptr, calls_indices = csr(lambda func: func.called_functions)
+    variables_indptr, variables_indices = csr(lambda func: func.variables_used)
+
+    hash_ids: Dict[str, int] = {}
+    columns = {
+        "node_counts": node_counts,
+        "metric_columns": np.array(
+            [[getattr(func, name) for name, _ in METRIC_WEIGHTS] for func in functions],
+            dtype=np.int32).reshape(count, len(METRIC_WEIGHTS)),
+        "num_variables": np.array([func.num_variables for func in functions], dtype=np.int32),
+        "lines": np.array(
+            [(func.line_start, func.line_end) for func in functions], dtype=np.int32).reshape(count, 2),
+        "ast_hashes": np.array([func.ast_hash for func in functions], dtype="S32"),
+        "hash_ids": np.array(
+            [hash_ids.setdefault(func.ast_hash, len(hash_ids)) for func in functions], dtype=np.int64),
+        "calls_indptr": calls_indptr,
+        "calls_indices": calls_indices,
+        "variables_indptr": variables_indptr,
+        "variables_indices": variables_indices,
+        "name_ids": np.array(name_ids, dtype=np.int32),
+        "file_offsets": np.array(file_offsets, dtype=np.int64),
+        "path_ids": np.array(path_ids, dtype=np.int32),
+        "file_hashes": np.array(file_hashes, dtype="S32"),
+        "string_offsets": np.array(strings.offsets, dtype=np.int64),
+        "source_offsets": np.array(source_offsets, dtype=np.int64),
+    }
+    for name, values in columns.items():
+        np.save(os.path.join(path, name + ".npy"), values)
+    for name, blob in (("strings.bin", strings.blob), ("sources.bin", sources)):
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(blob)
+
+    # Written last: a store without meta.json is incomplete
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": STORE_VERSION,
+            "analyzer_version": ANALYZER_VERSION,
+            "node_types": [NODE_TYPES.names[node_id] for node_id in node_types],
+            "functions": count,
+            "files": len(path_ids),
+        }, f)
+
+
+def _map_bytes(path: str) -> "np.ndarray":
+    # np.memmap cannot map empty files
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+class MetricsStore:
+    """
+    Read-only view of a store written by `write_store`.
+
+    Columns are memory-mapped, never loaded as a whole. Indexing the store
+    with a function id builds that function's `FunctionMetrics`.
+    """
+
+    def __init__(self, path: str):
+        _require_numpy()
+        self.path = path
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Not a metrics store: {path}") from e
+        if meta.get("version") != STORE_VERSION or meta.get("analyzer_version") != ANALYZER_VERSION:
+            raise ValueError(f"Metrics store {path} was written by another version")
+        self.node_types: List[str] = meta["node_types"]
+
+        def column(name):
+            return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+        self.node_counts = column("node_counts")
+        self.metric_columns = column("metric_columns")
+        self.num_variables = column("num_variables")
+        self.lines = column("lines")
+        self.ast_hashes = column("ast_hashes")
+        self.hash_ids = column("hash_ids")
+        self.calls_indptr = column("calls_indptr")
+        self.calls_indices = column("calls_indices")
+        self.variables_indptr = column("variables_indptr")
+        self.variables_indices = column("variables_indices")
+        self.name_ids = column("name_ids")
+        self.file_offsets = column("file_offsets")
+        self.path_ids = column("path_ids")
+        self.file_hashes = column("file_hashes")
+        self.string_offsets = column("string_offsets")
+        self.source_offsets = column("source_offsets")
+        self._strings = _map_bytes(os.path.join(path, "strings.bin"))
+        self._sources = _map_bytes(os.path.join(path, "sources.bin"))
+
+        self.num_strings = len(self.string_offsets) - 1
+        self.paths: List[str] = [self.string(int(i)) for i in self.path_ids]
+        self._file_ids = {file_path: i for i, file_path in enumerate(self.paths)}
+
+    def __len__(self) -> int:
+        return len(self.name_ids)
+
+    def __getitem__(self, func_id: int) -> FunctionMetrics:
+        return self.function(func_id)
+
+    def string(self, string_id: int) -> str:
+        start, end = self.string_offsets[string_id], self.string_offsets[string_id + 1]
+        return self._strings[start:end].tobytes().decode()
+
+    def function_ids(self, file_id: int) -> range:
+        """Ids of the functions of the `file_id`-th file."""
+        return range(int(self.file_offsets[file_id]), int(self.file_offsets[file_id + 1]))
+
+    def file_hash(self, file_id: int) -> str:
+        return self.file_hashes[file_id].decode()
+
+    def function(self, func_id: int) -> FunctionMetrics:
+        """Build the `FunctionMetrics` of one function."""
+        counts = self.node_counts[func_id]
+        start, end = self.source_offsets[func_id], self.source_offsets[func_id + 1]
+        line_start, line_end = (int(value) for value in self.lines[func_id])
+        metric_values = dict(zip((name for name, _ in METRIC_WEIGHTS),
+                                 (int(value) for value in self.metric_columns[func_id])))
+
+        def symbols(indptr, indices):
+            return [self.string(int(i)) for i in indices[indptr[func_id]:indptr[func_id + 1]]]
+
+        return FunctionMetrics(
+            name=self.string(int(self.name_ids[func_id])),
+            source=self._sources[start:end].tobytes().decode(),
+            line_start=line_start,
+            line_end=line_end,
+            node_types={self.node_types[i]: int(counts[i]) for i in np.flatnonzero(counts)},
+            called_functions=symbols(self.calls_indptr, self.calls_indices),
+            variables_used=symbols(self.variables_indptr, self.variables_indices),
+            ast_hash=self.ast_hashes[func_id].decode(),
+            **metric_values,
+        )
+
+    def file_functions(self, file_path: str) -> Optional[Dict[str, FunctionMetrics]]:
+        """Return the functions of a stored file keyed by name, or None if it is not stored."""
+        file_id = self._file_ids.get(file_path)
+        if file_id is None:
+            return None
+        functions = (self.function(func_id) for func_id in self.function_ids(file_id))
+        return {func.name: func for func in functions}
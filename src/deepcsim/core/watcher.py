@@ -0,0 +1,269 @@
+"""
+Watching a directory tree for changes to Python files.
+
+`InotifyWatcher` uses the Linux inotify API through ctypes; elsewhere (or if
+inotify is unavailable) `PollingWatcher` compares periodic stat snapshots.
+Both expose `poll(timeout)`, returning the set of Python files that were
+created, modified or removed, with paths spelled like `_iter_python_files`
+spells them so they can be passed straight to `ProjectIndex.update_paths`.
+Files and directories are filtered by the same `FileDiscovery` rules as
+scans (by default the shared discovery of the watched directory).
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import logging
+import struct
+import ctypes
+import ctypes.util
+import threading
+from typing import Any, Dict, Optional, Set, Tuple
+
+from deepcsim.core.discovery import FileDiscovery, default_discovery
+
+# inotify event masks (see <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+logger = logging.getLogger(__name__)
+
+# Events arriving within this many seconds of each other are batched
+DEBOUNCE_SECONDS = 0.05
+
+
+class PollingWatcher:
+    """Detect changes by comparing (mtime, size) snapshots of the tree."""
+
+    def __init__(self, directory: str, discovery: Optional[FileDiscovery] = None):
+        self.directory = directory
+        self.discovery = discovery if discovery is not None else default_discovery(directory)
+        self._snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for path in self.discovery.iter_python_files(self.directory):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def poll(self, timeout: float = 1.0) -> Set[str]:
+        """Wait `timeout` seconds and return the files changed meanwhile."""
+        time.sleep(timeout)
+        snapshot = self._take_snapshot()
+        changed = {
+            path for path, signature in snapshot.items()
+            if self._snapshot.get(path) != signature
+        }
+        changed.update(path for path in self._snapshot if path not in snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Detect changes with inotify watches on every (non-ignored) directory."""
+
+    def __init__(self, directory: str, discovery: Optional[FileDiscovery] = None):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or libc_name is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.directory = directory
+        self.discovery = discovery if discovery is not None else default_discovery(directory)
+        self._watches: Dict[int, str] = {}
+        self._add_tree(directory)
+
+    def _add_watch(self, path: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify watch limit reached")
+            # The directory vanished or is not readable
+            return
+        self._watches[wd] = path
+
+    def _add_tree(self, directory: str) -> Set[str]:
+        """Watch `directory` recursively and return the Python files found in it."""
+        found = set()
+        for root, files in self.discovery.walk(directory):
+            self._add_watch(root)
+            found.update(os.path.join(root, file) for file in files)
+        return found
+
+    def _read_events(self) -> Tuple[Set[str], bool]:
+        changed: Set[str] = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="surrogateescape")
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                root = self._watches.get(wd)
+                if root is None or not name:
+                    continue
+                path = os.path.join(root, name)
+
+                if mask & IN_ISDIR:
+                    if self.discovery.is_excluded(path, is_dir=True):
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        changed.update(self._add_tree(path))
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        # Every file below the directory is gone
+                        prefix = path + os.sep
+                        changed.add(prefix)
+                elif name.endswith(".py") and not mask & IN_CREATE \
+                        and not self.discovery.is_excluded(path):
+                    # Creation is reported again by IN_CLOSE_WRITE once written
+                    changed.add(path)
+        return changed, overflow
+
+    def poll(self, timeout: float = 1.0) -> Set[str]:
+        """Wait up to `timeout` seconds for changes and return the changed files."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed: Set[str] = set()
+        overflow = False
+        while ready:
+            events, lost = self._read_events()
+            changed |= events
+            overflow = overflow or lost
+            ready, _, _ = select.select([self._fd], [], [], DEBOUNCE_SECONDS)
+
+        if overflow:
+            # Events were dropped: treat every file as potentially changed
+            changed |= set(self.discovery.iter_python_files(self.directory))
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(directory: str, polling: bool = False, discovery: Optional[FileDiscovery] = None):
+    """Return an inotify watcher for `directory`, or a polling one if unavailable."""
+    if not polling:
+        try:
+            return InotifyWatcher(directory, discovery)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(directory, discovery)
+
+
+class IndexWatcher:
+    """
+    Keep a `ProjectIndex` up to date from filesystem events.
+
+    Runs a watcher in a daemon thread and re-analyzes only the Python files
+    it reports, so the index never needs to re-stat the whole tree. A failed
+    update is logged and counted in `status()`; watching goes on, and its
+    files are updated again with the next poll.
+    """
+
+    def __init__(self, index, polling: bool = False, interval: float = 1.0):
+        self.index = index
+        self.interval = interval
+        self.watcher = create_watcher(index.directory, polling)
+        self.events = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_error_time: Optional[float] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if isinstance(self.watcher, InotifyWatcher) else "polling"
+
+    def _resolve(self, changed: Set[str]) -> Set[str]:
+        # Removed directories are reported as "<dir>/": expand to indexed files
+        paths = {path for path in changed if not path.endswith(os.sep)}
+        for prefix in changed - paths:
+            paths.update(path for path in self.index.indexed_paths() if path.startswith(prefix))
+        return paths
+
+    def _run(self) -> None:
+        # Files of a failed update, retried with the next poll
+        pending: Set[str] = set()
+        while not self._stopped.is_set():
+            try:
+                changed = self.watcher.poll(self.interval)
+                self.events += len(changed)
+                pending |= changed
+                if pending and not self._stopped.is_set():
+                    self.index.update_paths(sorted(self._resolve(pending)))
+                    pending = set()
+            except Exception as e:
+                logger.exception("Updating the index of %s failed", self.index.directory)
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.last_error_time = time.time()
+                # Do not spin if the watcher itself keeps failing
+                self._stopped.wait(self.interval)
+
+    def status(self) -> Dict[str, Any]:
+        """Return the backend, event count and last failure of the watcher."""
+        return {
+            "backend": self.backend,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "events": self.events,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_error_time": self.last_error_time,
+        }
+
+    def start(self) -> "IndexWatcher":
+        self._thread = threading.Thread(target=self._run, name="deepcsim-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+        self.watcher.close()
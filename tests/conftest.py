@@ -0,0 +1,68 @@
+import pytest
+
+from deepcsim.core.analyzer import CodeAnalyzer
+
+
+SOURCE_A = """
+def add(a, b):
+    return a + b
+
+def scale(values, factor):
+    return [v * factor for v in values]
+"""
+
+SOURCE_B = """
+def add_numbers(x, y):
+    return x + y
+
+def greet(name):
+    if name:
+        print("Hello", name)
+"""
+
+
+FUNCTIONS_SOURCE = """
+def add(a, b):
+    return a + b
+
+def add_numbers(x, y):
+    total = x + y
+    print("Adding", total)
+    return total
+
+def find(items, target):
+    for i, item in enumerate(items):
+        if item == target:
+            return i
+    return -1
+
+async def fetch(client, url):
+    try:
+        response = await client.get(url)
+    except OSError:
+        return None
+    return response.json()
+
+def empty():
+    pass
+"""
+
+
+@pytest.fixture
+def functions():
+    """Analyzed functions of a module mixing small, async, looping and empty functions."""
+    analyzer = CodeAnalyzer(FUNCTIONS_SOURCE, "source.py")
+    analyzer.analyze()
+    return list(analyzer.functions.values())
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Directory holding pkg0..pkg3, each with a copy of a.py and b.py."""
+    root = tmp_path / "project"
+    for i in range(4):
+        package = root / f"pkg{i}"
+        package.mkdir(parents=True)
+        (package / "a.py").write_text(SOURCE_A)
+        (package / "b.py").write_text(SOURCE_B)
+    return root
@@ -0,0 +1,91 @@
+import ast
+import hashlib
+import pickle
+
+from deepcsim.core.analyzer import ASTAnalyzer, CodeAnalyzer
+from deepcsim.core.metrics import FunctionMetrics
+
+
+SOURCE = '''
+import os
+
+class Loader:
+    def load(self, path):
+        def read(name):
+            with open(name) as f:
+                return f.read()
+
+        for entry in os.listdir(path):
+            if entry.endswith(".py"):
+                while True:
+                    try:
+                        return read(entry)
+                    except OSError:
+                        break
+        return None
+
+async def fetch(client, url: str = "x") -> str:
+    global counter
+    async with client:
+        return await client.get(url)
+'''
+
+
+# Reference for the structure hash the single-pass extractor streams into MD5
+def _ast_structure(node):
+    if isinstance(node, ast.AST):
+        fields = []
+        for field, value in ast.iter_fields(node):
+            if field in ('name', 'id', 'arg', 's', 'n'):
+                continue
+            if isinstance(value, list):
+                fields.append(f"{field}:[{','.join(_ast_structure(item) for item in value)}]")
+            else:
+                fields.append(f"{field}:{_ast_structure(value)}")
+        return f"{node.__class__.__name__}({','.join(fields)})"
+    return ""
+
+
+def test_single_pass_metrics_match_per_function_passes():
+    analyzer = CodeAnalyzer(SOURCE, "loader.py")
+    analyzer.analyze()
+
+    expected = {}
+    for node in ast.walk(ast.parse(SOURCE)):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            expected[node.name] = node
+
+    assert list(analyzer.functions) == list(expected)
+
+    for name, node in expected.items():
+        metrics = analyzer.functions[name]
+        visitor = ASTAnalyzer()
+        visitor.visit(node)
+        structure = _ast_structure(node)
+
+        assert metrics.source == ast.get_source_segment(SOURCE, node)
+        assert metrics.node_types == dict(visitor.node_counts)
+        assert metrics.cyclomatic_complexity == visitor.complexity
+        assert metrics.nesting_depth == visitor.max_depth
+        assert metrics.called_functions == visitor.function_calls
+        assert metrics.variables_used == visitor.variables
+        assert metrics.num_statements == len(
+            [n for n in ast.walk(node) if isinstance(n, ast.stmt)]) - 1
+        assert metrics.ast_hash == hashlib.md5(structure.encode()).hexdigest()
+
+
+def test_lazy_source_and_pickled_metrics_match(tmp_path):
+    path = tmp_path / "loader.py"
+    path.write_text(SOURCE + "\ndef café():\n    return 'été'\n", encoding="utf-8")
+    source = path.read_text(encoding="utf-8")
+
+    eager = CodeAnalyzer(source, str(path))
+    eager.analyze()
+    lazy = CodeAnalyzer(source, str(path), lazy_source=True)
+    lazy.analyze()
+
+    for name, metrics in lazy.functions.items():
+        assert metrics.source_span is not None
+        assert metrics == eager.functions[name]
+        assert pickle.loads(pickle.dumps(metrics)) == metrics
+        assert FunctionMetrics.from_dict(metrics.to_dict()) == metrics
@@ -0,0 +1,41 @@
+from deepcsim.core.batch import HAS_NUMPY, MetricsMatrix
+from deepcsim.core.similarity import SimilarityCalculator
+
+
+def test_score_block_matches_calculate_all(functions):
+    matrix = MetricsMatrix(functions)
+    indices = range(len(functions))
+    block = matrix.score_block(indices, indices)
+
+    for i, func1 in enumerate(functions):
+        for j, func2 in enumerate(functions):
+            assert block[i][j] == SimilarityCalculator.calculate_all(func1, func2)
+
+    maxima = list(matrix.iter_block_maxima([([0], [1, 2]), ([3], [])]))
+    if matrix.vectorized:
+        assert maxima == [max(block[0][1]['composite'], block[0][2]['composite']), None]
+    else:
+        assert maxima == [None, None]
+
+
+def test_threshold_scoring_matches_calculate_all(functions):
+    indices = range(len(functions))
+
+    for vectorized in [False] + ([True] if HAS_NUMPY else []):
+        matrix = MetricsMatrix(functions)
+        matrix.vectorized = vectorized
+        for threshold in (0.0, 40.0, 60.0, 75.0, 100.0):
+            block = matrix.score_block(indices, indices, threshold)
+            for i, func1 in enumerate(functions):
+                for j, func2 in enumerate(functions):
+                    full = SimilarityCalculator.calculate_all(func1, func2)
+                    expected = full if full['composite'] >= threshold else None
+                    assert block[i][j] == expected
+                    assert SimilarityCalculator.calculate_if_above(func1, func2, threshold) == expected
+
+            maximum = max(SimilarityCalculator.calculate_all(functions[0], func)['composite']
+                          for func in functions[1:])
+            (block_max,) = matrix.iter_block_maxima([([0], indices[1:])], threshold)
+            assert (block_max >= threshold) == (maximum >= threshold)
+            if maximum >= threshold:
+                assert block_max == maximum
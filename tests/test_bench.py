@@ -0,0 +1,46 @@
+import ast
+import json
+
+import pytest
+
+from deepcsim.bench import compare_reports, generate_sources, run_suite, write_corpus
+from deepcsim.core.scanner import find_exact_duplicates
+
+
+def test_corpus_is_deterministic_and_parses(tmp_path):
+    sources, stats = generate_sources(files=12, functions_per_file=5, clone_rate=0.5, seed=7)
+
+    assert generate_sources(files=12, functions_per_file=5, clone_rate=0.5, seed=7) == (sources, stats)
+    assert generate_sources(files=12, functions_per_file=5, clone_rate=0.5, seed=8)[0] != sources
+    assert stats["files"] == len(sources) == 12
+    assert stats["functions"] == 60 and 0 < stats["clones"] < 60
+    for source in sources.values():
+        ast.parse(source)
+
+    # Unmutated clones keep the AST structure of their original
+    unmutated, _ = generate_sources(files=12, functions_per_file=5, clone_rate=0.5, mutation_rate=0.0)
+    write_corpus(str(tmp_path), unmutated)
+    assert find_exact_duplicates(str(tmp_path))["functions"]
+
+    with pytest.raises(ValueError):
+        generate_sources(clone_rate=1.5)
+
+
+def test_run_suite_reports_and_compares(tmp_path):
+    report = run_suite(files=4, functions_per_file=3, repeat=1,
+                       only=["analyze", "calculate_all"], corpus_dir=str(tmp_path / "corpus"))
+
+    assert json.loads(json.dumps(report)) == report
+    assert set(report["benchmarks"]) == {"analyze", "calculate_all"}
+    assert report["benchmarks"]["analyze"]["items"] == 4
+    assert report["benchmarks"]["calculate_all"]["items"] == 66
+    assert all(result["peak_memory_bytes"] > 0 for result in report["benchmarks"].values())
+
+    rows = compare_reports(report, report)
+    assert [row["ratio"] for row in rows] == [1.0, 1.0]
+
+    other = run_suite(files=5, functions_per_file=3, repeat=1, only=["analyze"])
+    with pytest.raises(ValueError, match="different corpora"):
+        compare_reports(report, other)
+    with pytest.raises(ValueError, match="Unknown benchmarks"):
+        run_suite(only=["nope"])
@@ -0,0 +1,38 @@
+from deepcsim.core.cache import AnalysisCache
+from deepcsim.core.scanner import scan_directory
+
+
+SOURCE = """
+def add(a, b):
+    return a + b
+
+def add_numbers(x, y):
+    return x + y
+"""
+
+
+def test_cache_reuses_unchanged_files(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "a.py").write_text(SOURCE)
+    (project / "b.py").write_text(SOURCE)
+
+    with AnalysisCache(str(tmp_path / "cache")) as cache:
+        first = scan_directory(str(project), cache=cache)
+        assert first["cache"] == {"hits": 0, "misses": 2}
+
+        second = scan_directory(str(project), cache=cache)
+        assert second["cache"] == {"hits": 2, "misses": 2}
+        assert second["results"] == first["results"]
+
+        (project / "b.py").write_text(SOURCE + "\ndef other():\n    pass\n")
+        third = scan_directory(str(project), cache=cache)
+        assert third["cache"] == {"hits": 3, "misses": 3}
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    with AnalysisCache(str(tmp_path / "cache"), max_bytes=1) as cache:
+        cache.put("a.py", "h1", {})
+        cache.put("b.py", "h2", {})
+        assert cache.stats()["entries"] <= 1
+        assert cache.get("a.py", "h1") is None
@@ -0,0 +1,49 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from deepcsim.core.changes import git_changed_files, read_file_list
+from deepcsim.core.scanner import iter_scan_directory, scan_directory
+
+
+def test_changed_scan_keeps_only_pairs_involving_changed_files(project):
+    directory = str(project)
+    full = scan_directory(directory, threshold=60.0)
+    changed = os.path.join(directory, "pkg2", "a.py")
+    expected = [entry for entry in full["results"] if changed in (entry["file1"], entry["file2"])]
+    assert 0 < len(expected) < full["count"]
+
+    # Spelled differently than the scan spells it: relative to the working directory
+    for prune in (True, False):
+        result = scan_directory(directory, threshold=60.0, prune=prune,
+                                changed_files=[os.path.relpath(changed), "missing.py"])
+        assert result["results"] == expected
+        assert result["changed_files"] == [changed]
+    assert list(iter_scan_directory(directory, 60.0, changed_files=[changed])) == expected
+    assert scan_directory(directory, threshold=60.0, changed_files=[])["count"] == 0
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_git_changed_files(tmp_path, project):
+    def git(*args):
+        subprocess.run(["git", *args], cwd=project, check=True, capture_output=True)
+
+    directory = str(project)
+    git("init", "-q")
+    git("add", ".")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "base")
+    source_a = (project / "pkg0" / "a.py").read_text()
+    (project / "pkg1" / "b.py").write_text(source_a)
+    (project / "pkg3" / "new.py").write_text(source_a)
+
+    changed = git_changed_files(os.path.join(directory, "pkg0"), "HEAD")
+    assert sorted(os.path.relpath(path, os.path.realpath(directory)) for path in changed) == [
+        os.path.join("pkg1", "b.py"), os.path.join("pkg3", "new.py")]
+    with pytest.raises(ValueError):
+        git_changed_files(directory, "no-such-revision")
+
+    listing = tmp_path / "changed.txt"
+    listing.write_text("\n".join(changed) + "\n\n")
+    assert read_file_list(str(listing)) == changed
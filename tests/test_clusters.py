@@ -0,0 +1,45 @@
+from itertools import combinations
+
+from deepcsim.core.clusters import UnionFind
+from deepcsim.core.scanner import _analyze_directory, find_clone_clusters
+from deepcsim.core.similarity import SimilarityCalculator
+
+
+def test_clusters_match_brute_force_components(project):
+    directory = str(project)
+    (project / "pkg0" / "c.py").write_text(
+        "def total(items):\n    result = 0\n    for item in items:\n        result += item\n    return result\n")
+    functions = [
+        (path, name, func)
+        for path, report in _analyze_directory(directory).items()
+        for name, func in report["functions"].items()
+    ]
+
+    # 40: no pair can be ruled out by its node types, so the index is skipped
+    for threshold in (40.0, 60.0, 90.0):
+        sets = UnionFind(len(functions))
+        for i, j in combinations(range(len(functions)), 2):
+            if SimilarityCalculator.calculate_all(functions[i][2], functions[j][2])["composite"] >= threshold:
+                sets.union(i, j)
+        expected = {}
+        for i, (path, name, _) in enumerate(functions):
+            expected.setdefault(sets.find(i), set()).add((path, name))
+        expected = sorted(sorted(group) for group in expected.values() if len(group) > 1)
+
+        report = find_clone_clusters(directory, threshold)
+        clusters = sorted(sorted((member["file"], member["name"]) for member in cluster["members"])
+                          for cluster in report["clusters"])
+        assert clusters == expected
+        assert report["count"] == len(expected) > 0
+        assert report["functions_clustered"] == sum(len(group) for group in expected)
+
+
+def test_exact_clusters_group_copies_without_scoring(project):
+    directory = str(project)
+    report = find_clone_clusters(directory, exact=True)
+
+    assert report["pairs_scored"] == 0
+    # add and add_numbers only differ by names
+    assert [(cluster["size"], cluster["files"]) for cluster in report["clusters"]] == [(8, 8), (4, 4), (4, 4)]
+    assert all(cluster["exact"] for cluster in report["clusters"])
+    assert report["clusters"][0]["source"].startswith("def add(a, b):")
@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+
+from deepcsim.api.server import app
+from deepcsim.core.comparator import compare_source
+
+
+OLD = """
+def parse(text):
+    return text.split(",")
+"""
+
+NEW = """
+def helper():
+    pass
+
+def parse(text, separator=","):
+    parts = text.split(separator)
+    return [part.strip() for part in parts]
+"""
+
+
+def _referenced(comparisons, functions):
+    rows = {row["id"]: row for row in functions}
+    return [(rows[c["func1"]]["lines"], rows[c["func2"]]["lines"])
+            for c in comparisons if rows[c["func1"]]["name"] == rows[c["func2"]]["name"] == "parse"]
+
+
+def test_compact_comparison_keeps_sides_of_same_named_files_apart():
+    result = compare_source(OLD, NEW, "utils.py", "utils.py", compact=True)
+    assert _referenced(result["results"][0]["comparisons"], result["functions"]) == [("2-3", "5-7")]
+
+    response = TestClient(app).post(
+        "/api/analyze", params={"compact": "true"},
+        files={"file1": ("utils.py", OLD), "file2": ("utils.py", NEW)})
+    assert response.status_code == 200
+    body = response.json()
+    assert _referenced(body["comparisons"], body["functions"]) == [("2-3", "5-7")]
+    assert len(body["functions"]) == 3
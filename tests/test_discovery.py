@@ -0,0 +1,91 @@
+import os
+
+from deepcsim.core.discovery import FileDiscovery, IgnoreRules
+from deepcsim.core.profiling import Profiler, profiling
+
+
+def _write(root, relative, text="X = 1\n"):
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def _age(root):
+    # Listings of directories modified in the last seconds are not cached
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, ns=(0, 10**18))
+
+
+def test_ignore_rules_follow_gitignore_syntax():
+    rules = IgnoreRules(["# comment", "", "*.log", "build/", "/top.py", "docs/**/gen_*.py",
+                         "!keep.log", "[ab]?.py"])
+    assert rules.match("x.log", False) and rules.match("deep/x.log", False)
+    assert rules.match("keep.log", False) is False
+    assert rules.match("build", True) and rules.match("src/build", True)
+    assert rules.match("build", False) is None
+    assert rules.match("top.py", False) and rules.match("pkg/top.py", False) is None
+    assert rules.match("docs/gen_x.py", False) and rules.match("docs/a/b/gen_x.py", False)
+    assert rules.match("a1.py", False) and rules.match("c1.py", False) is None
+
+
+def test_walk_honours_ignore_files_globs_and_size(tmp_path):
+    _write(tmp_path, "main.py")
+    _write(tmp_path, "big.py", "X = 1\n" * 1000)
+    _write(tmp_path, "api_pb2.py")
+    _write(tmp_path, "node_modules/lib.py")
+    _write(tmp_path, "build/out.py")
+    _write(tmp_path, "pkg/mod.py")
+    _write(tmp_path, "pkg/generated.py")
+    _write(tmp_path, "pkg/tests/test_mod.py")
+    _write(tmp_path, ".gitignore", "build/\n")
+    _write(tmp_path, "pkg/.deepcsimignore", "generated.py\n")
+
+    def found(**options):
+        discovery = FileDiscovery(str(tmp_path), **options)
+        return sorted(os.path.relpath(path, tmp_path) for path in discovery.iter_python_files())
+
+    assert found() == ["big.py", "main.py", os.path.join("pkg", "mod.py"),
+                       os.path.join("pkg", "tests", "test_mod.py")]
+    assert found(exclude=["tests/"], max_file_size=100) == ["main.py", os.path.join("pkg", "mod.py")]
+    assert found(include=["pkg/**"]) == [os.path.join("pkg", "mod.py"),
+                                         os.path.join("pkg", "tests", "test_mod.py")]
+    assert os.path.join("build", "out.py") in found(ignore_files=False)
+
+
+def test_walk_order_and_spelling_match_os_walk(tmp_path):
+    for relative in ("b.py", "a/x.py", "a/b/y.py", "c/z.py", "c/d/e/w.py"):
+        _write(tmp_path, relative)
+
+    expected = [os.path.join(root, name) for root, _, files in os.walk(str(tmp_path))
+                for name in files if name.endswith(".py")]
+    assert list(FileDiscovery(str(tmp_path)).iter_python_files()) == expected
+
+
+def test_unchanged_directories_are_listed_from_cache(tmp_path):
+    _write(tmp_path, "a.py")
+    _write(tmp_path, "pkg/b.py")
+    _age(tmp_path)
+    discovery = FileDiscovery(str(tmp_path))
+
+    with profiling(Profiler()) as profiler:
+        first = list(discovery.iter_python_files())
+        second = list(discovery.iter_python_files())
+    assert first == second
+    assert profiler.counters == {"directories_listed": 2, "directories_cached": 2}
+
+    # Adding a file changes the directory mtime, so it is listed again
+    _write(tmp_path, "pkg/c.py")
+    assert str(tmp_path / "pkg" / "c.py") in discovery.iter_python_files()
+
+
+def test_list_entries_and_is_excluded(tmp_path):
+    _write(tmp_path, "a.py")
+    _write(tmp_path, "notes.txt")
+    _write(tmp_path, "dist/out.py")
+    _write(tmp_path, ".gitignore", "dist/\n*.txt\n")
+    discovery = FileDiscovery(str(tmp_path))
+
+    assert sorted(entry.name for entry in discovery.list_entries(str(tmp_path))) == ["a.py"]
+    assert discovery.list_entries(str(tmp_path / "dist")) == []
+    assert discovery.is_excluded(str(tmp_path / "dist" / "out.py"))
+    assert not discovery.is_excluded(str(tmp_path / "a.py"))
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from deepcsim.api import events
+from deepcsim.api.server import app
+from deepcsim.core.scanner import scan_directory
+
+
+def _parse(body):
+    parsed = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        parsed.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return parsed
+
+
+def test_scan_stream_sends_progress_results_then_done(project):
+    directory = str(project)
+    expected = scan_directory(directory, 60.0)["results"]
+
+    for compact in (False, True):
+        response = TestClient(app).get(
+            "/scan-project/stream", params={"directory": directory, "threshold": 60, "compact": compact})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        stream = _parse(response.text)
+
+        names = [event for event, _ in stream]
+        assert names[0] == "progress"
+        assert names[-2:] == ["progress", "done"]
+        assert stream[-1][1] == {"status": "completed", "error": None, "count": len(expected)}
+        assert stream[-2][1]["phase"] == "done"
+
+        results = [data for event, data in stream if event == "result"]
+        assert [(r["file1"], r["file2"]) for r in results] == [(r["file1"], r["file2"]) for r in expected]
+        if compact:
+            # Side table rows are sent before the results referring to them
+            known = set()
+            for event, data in stream:
+                if event == "functions":
+                    known.update(row["id"] for row in data)
+                elif event == "result":
+                    assert {c["func1"] for c in data["comparisons"]} <= known
+        else:
+            assert results == expected
+
+
+def test_scan_stream_cancels_scan_when_client_disconnects(monkeypatch, tmp_path):
+    started = []
+
+    def endless_scan(directory, threshold, progress=None, table=None):
+        started.append(progress)
+        pair = 0
+        while True:
+            progress.check()
+            pair += 1
+            yield {"file1": "a.py", "file2": f"{pair}.py", "comparisons": []}
+            time.sleep(0.001)
+
+    monkeypatch.setattr(events, "iter_scan_directory", endless_scan)
+
+    # TestClient reads whole bodies, so the ASGI disconnect is sent by hand
+    async def stream_until_first_result():
+        first_result = asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await first_result.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and b"event: result" in message.get("body", b""):
+                first_result.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/scan-project/stream", "raw_path": b"/scan-project/stream",
+            "root_path": "", "query_string": f"directory={tmp_path}".encode(), "headers": [],
+            "server": ("testserver", 80), "client": ("testclient", 50000),
+        }
+        await asyncio.wait_for(app(scope, receive, send), timeout=10)
+
+    asyncio.run(stream_until_first_result())
+
+    (progress,) = started
+    assert progress.cancelled
+    deadline = time.time() + 5
+    while any(thread.name == "deepcsim-stream" for thread in threading.enumerate()) and time.time() < deadline:
+        time.sleep(0.02)
+    assert not any(thread.name == "deepcsim-stream" for thread in threading.enumerate())
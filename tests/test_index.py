@@ -0,0 +1,33 @@
+from deepcsim.core.index import CandidateIndex, SimilarityIndex
+from deepcsim.core.similarity import SimilarityCalculator
+
+
+def test_similarity_index_query_matches_brute_force(functions):
+    index = SimilarityIndex()
+    for func in functions:
+        index.add(func, func.name)
+
+    for query_id, query in enumerate(functions):
+        scores = [
+            (SimilarityCalculator.calculate_all(query, func), func_id)
+            for func_id, func in enumerate(functions)
+            if func_id != query_id
+        ]
+        scores.sort(key=lambda item: (-item[0]['composite'], item[1]))
+        for k in (1, 3, 10):
+            results = index.query(query, k, exclude={query_id})
+            assert [(r["similarity"], r["id"]) for r in results] == scores[:k]
+            assert [r["key"] for r in results] == [functions[i].name for _, i in scores[:k]]
+
+
+def test_candidate_owner_pairs_match_function_pairs(functions):
+    for threshold in (60.0, 80.0):
+        index = CandidateIndex(threshold)
+        for func_id, func in enumerate(functions * 3):
+            index.add(func, owner=func_id % 4)
+
+        streamed = list(index.iter_candidate_function_pairs())
+        assert streamed and len(streamed) == len(set(streamed))
+        owners = {tuple(sorted((index.owners[i], index.owners[j]))) for i, j in streamed}
+        assert index.candidate_owner_pairs() == owners
+        assert index.candidate_owner_pairs(probe_owners={1}) == {pair for pair in owners if 1 in pair}
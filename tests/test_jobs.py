@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from deepcsim.api import jobs, services
+from deepcsim.api.server import app
+from deepcsim.core.scanner import scan_directory
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def job_manager():
+    """Run each test with a fresh job manager."""
+    services.stop_job_manager()
+    yield
+    services.stop_job_manager()
+
+
+@pytest.fixture
+def blocking_scan(monkeypatch):
+    """Replace the scan with one yielding two results, then waiting until released to check for a cancel."""
+    release = threading.Event()
+    started = []
+
+    def scan(directory, threshold, progress=None, table=None):
+        started.append(directory)
+        for pair in range(2):
+            yield {"file1": f"{directory}/a.py", "file2": f"{directory}/{pair}.py", "comparisons": []}
+        release.wait()
+        progress.check()
+
+    monkeypatch.setattr(jobs, "iter_scan_directory", scan)
+    yield release, started
+    release.set()
+
+
+def _wait_for(job_id, condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if condition(job) or time.time() > deadline:
+            return job
+        time.sleep(0.01)
+
+
+def test_scan_job_is_polled_with_an_offset(project):
+    directory = str(project)
+    expected = scan_directory(directory, 60.0)["results"]
+
+    response = client.post("/scan-project", json={"directory": directory, "threshold": 60})
+    assert response.status_code == 202
+    created = response.json()
+    assert created["url"] == f"/jobs/{created['job_id']}"
+    assert created["status"] in ("queued", "running")
+
+    job = _wait_for(created["job_id"], lambda job: job["status"] == "completed")
+    assert job["status"] == "completed" and job["error"] is None
+    assert job["count"] == len(expected) > 1
+    assert job["results"] == expected
+    assert job["progress"]["phase"] == "done"
+
+    job = client.get(created["url"], params={"offset": 1}).json()
+    assert job["offset"] == 1 and job["count"] == len(expected)
+    assert job["results"] == expected[1:]
+    job = client.get(created["url"], params={"offset": 1, "limit": 1}).json()
+    assert job["results"] == expected[1:2]
+
+    listed = client.get("/jobs").json()
+    assert [item["id"] for item in listed] == [created["job_id"]]
+    assert "results" not in listed[0]
+
+    assert client.get("/jobs/unknown").status_code == 404
+    assert client.delete("/jobs/unknown").status_code == 404
+    assert client.post("/scan-project", json={"directory": str(project / "missing")}).status_code == 400
+
+
+def test_cancelled_job_stops_once_the_scan_notices(blocking_scan, tmp_path):
+    release, _ = blocking_scan
+    job_id = client.post("/scan-project", json={"directory": str(tmp_path)}).json()["job_id"]
+    job = _wait_for(job_id, lambda job: job["count"] == 2)
+    assert job["status"] == "running" and not job["cancel_requested"]
+
+    # The running scan only stops at its next check, so the job is still running
+    assert client.delete(f"/jobs/{job_id}").json() == {"job_id": job_id, "status": "running"}
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "running" and job["cancel_requested"]
+
+    release.set()
+    job = _wait_for(job_id, lambda job: job["status"] != "running")
+    assert job["status"] == "cancelled" and job["cancel_requested"]
+    assert job["finished"] is not None
+    # Results found before the cancel are kept
+    assert job["count"] == 2
+
+
+def test_jobs_beyond_max_running_are_queued(blocking_scan, tmp_path):
+    release, started = blocking_scan
+    ids = [client.post("/scan-project", json={"directory": str(tmp_path)}).json()["job_id"]
+           for _ in range(jobs.MAX_RUNNING_JOBS + 2)]
+    for job_id in ids[:jobs.MAX_RUNNING_JOBS]:
+        assert _wait_for(job_id, lambda job: job["status"] == "running")["status"] == "running"
+    time.sleep(0.05)
+    assert len(started) == jobs.MAX_RUNNING_JOBS
+    assert [client.get(f"/jobs/{job_id}").json()["status"] for job_id in ids[jobs.MAX_RUNNING_JOBS:]] == \
+        ["queued", "queued"]
+
+    # A queued job is cancelled at once and never starts
+    queued = ids[jobs.MAX_RUNNING_JOBS]
+    assert client.delete(f"/jobs/{queued}").json() == {"job_id": queued, "status": "cancelled"}
+
+    release.set()
+    for job_id in ids:
+        _wait_for(job_id, lambda job: job["status"] not in ("queued", "running"))
+    statuses = [client.get(f"/jobs/{job_id}").json()["status"] for job_id in ids]
+    assert statuses == ["completed"] * jobs.MAX_RUNNING_JOBS + ["cancelled", "completed"]
+    assert len(started) == jobs.MAX_RUNNING_JOBS + 1
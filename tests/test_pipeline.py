@@ -0,0 +1,31 @@
+from deepcsim.core.pipeline import READ_BATCH, iter_analyze_sources, iter_read_sources
+from deepcsim.core.scanner import _analyze_files, _iter_python_files, scan_directory
+
+
+def test_read_stage_keeps_order(tmp_path):
+    paths = []
+    for i in range(READ_BATCH * 5 + 3):
+        path = tmp_path / f"m{i}.py"
+        path.write_text(f"X = {i}\n")
+        paths.append(str(path))
+    paths.insert(7, str(tmp_path / "missing.py"))
+
+    for readers in (1, 3):
+        read = list(iter_read_sources(iter(paths), readers, sources={paths[0]: "given"}))
+        assert [path for path, _ in read] == paths
+        assert read[0][1] == "given" and read[7][1] is None
+        assert read[8][1] == "X = 7\n"
+
+
+def test_analyze_stage_matches_serial(project):
+    directory = str(project)
+    items = [(path, open(path).read(), i) for i, path in enumerate(_iter_python_files(directory))]
+
+    serial = list(iter_analyze_sources(items, workers=1))
+    assert list(iter_analyze_sources(iter(items), workers=2)) == serial
+    assert [tag for _, _, tag, _ in serial] == list(range(len(items)))
+
+    # Lazy paths stream through every stage with the same result
+    paths = list(_iter_python_files(directory))
+    assert _analyze_files(iter(paths), readers=4) == _analyze_files(paths, readers=1)
+    assert scan_directory(directory, 60.0, readers=4) == scan_directory(directory, 60.0, readers=1)
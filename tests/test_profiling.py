@@ -0,0 +1,37 @@
+from deepcsim.core import profiling
+from deepcsim.core.profiling import Profiler
+from deepcsim.core.scanner import scan_directory
+
+
+def test_profiled_scan_records_phases_and_counts(project):
+    directory = str(project)
+    expected = scan_directory(directory, 60.0, prune=False)
+
+    phases = []
+    with profiling.profiling(Profiler(top_files=2, callback=lambda *event: phases.append(event[0]))) as profiler:
+        assert scan_directory(directory, 60.0, prune=False) == expected
+    assert profiling.current() is None
+
+    report = profiler.report()
+    counters = report["counters"]
+    assert counters["files_read"] == counters["files_analyzed"] > 2
+    assert counters["bytes_read"] > 0 and counters["functions"] > 0
+    n = counters["files_analyzed"]
+    assert counters["file_pairs_scored"] <= n * (n - 1) // 2
+    assert {"scan.discover", "scan.read", "scan.analyze", "analyze.parse", "scan.compare"} <= set(report["phases"])
+    assert report["phases"]["analyze.parse"]["calls"] == n
+    assert set(phases) == set(report["phases"])
+    slowest = report["slowest_files"]
+    assert len(slowest) == 2 and slowest[0]["seconds"] >= slowest[1]["seconds"]
+
+    text = profiler.prometheus()
+    assert "# TYPE deepcsim_phase_seconds_total counter" in text
+    assert 'deepcsim_phase_calls_total{phase="scan.analyze"} 1' in text
+    assert f"deepcsim_files_read_total {counters['files_read']}" in text
+
+
+def test_profiling_is_off_by_default():
+    assert profiling.current() is None
+    # Disabled phases share one no-op context
+    assert profiling.phase("scan.read") is profiling.phase("scan.compare")
+    profiling.count("files_read")
@@ -0,0 +1,83 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from deepcsim.api import responses
+from deepcsim.api.responses import COMPRESS_MIN_BYTES, json_response
+
+
+SMALL = {"name": "add", "similarity": 87.5, "lines": [1, 2], "note": "é"}
+LARGE = {"results": [{"file1": f"pkg/module_{i}.py", "similarity": i / 3} for i in range(COMPRESS_MIN_BYTES // 20)]}
+
+app = FastAPI()
+
+
+@app.get("/small")
+def small(request: Request):
+    return json_response(request, SMALL)
+
+
+@app.get("/large")
+def large(request: Request):
+    return json_response(request, LARGE)
+
+
+client = TestClient(app)
+
+
+def test_json_response_is_compact_by_default():
+    response = client.get("/small", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == json.dumps(SMALL, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # Too small to be worth compressing
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+@pytest.mark.parametrize("pretty", ["1", "true", "yes"])
+def test_json_response_indents_on_pretty(pretty):
+    response = client.get("/small", params={"pretty": pretty})
+    assert response.text == json.dumps(SMALL, ensure_ascii=False, indent=4, separators=(", ", ": "))
+    assert response.json() == SMALL
+
+
+def test_json_response_compresses_large_bodies_with_gzip(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+    response = client.get("/large", headers={"Accept-Encoding": "br;q=1.0, gzip;q=0.8"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < COMPRESS_MIN_BYTES
+    assert response.json() == LARGE
+
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert len(response.content) >= COMPRESS_MIN_BYTES
+    assert response.json() == LARGE
+
+
+def test_json_response_prefers_brotli_when_installed():
+    # httpx decodes brotli bodies itself when brotli is installed
+    pytest.importorskip("brotli")
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == LARGE
+
+
+def test_encode_body_uses_brotli_when_accepted(monkeypatch):
+    class FakeBrotli:
+        @staticmethod
+        def compress(body, quality):
+            assert quality == responses.BROTLI_QUALITY
+            return b"br:" + gzip.compress(body)
+
+    monkeypatch.setattr(responses, "brotli", FakeBrotli)
+    body = b"x" * COMPRESS_MIN_BYTES
+    encoded, encoding = responses.encode_body(body, "gzip, br")
+    assert encoding == "br" and gzip.decompress(encoded[len(b"br:"):]) == body
+    assert responses.encode_body(body, "gzip")[1] == "gzip"
+    assert responses.encode_body(body[:-1], "gzip, br") == (body[:-1], None)
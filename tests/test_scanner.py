@@ -0,0 +1,157 @@
+import tracemalloc
+
+import pytest
+
+from deepcsim.bench.corpus import generate_sources, write_corpus
+from deepcsim.core.incremental import ScanState
+from deepcsim.core.progress import ScanCancelled, ScanProgress
+from deepcsim.core.project_index import ProjectIndex
+from deepcsim.core.scanner import (
+    _analyze_directory,
+    _iter_candidate_file_pairs,
+    find_exact_duplicates,
+    find_matches_for_file,
+    iter_scan_directory,
+    scan_directory,
+)
+
+
+def test_parallel_scan_matches_serial(project):
+    directory = str(project)
+
+    serial = scan_directory(directory, threshold=60.0)
+    parallel = scan_directory(directory, threshold=60.0, workers=2)
+
+    assert serial["count"] > 0
+    assert parallel == serial
+
+
+def test_pruned_scan_matches_brute_force(project):
+    directory = str(project)
+
+    for threshold in (40.0, 80.0, 95.0):
+        pruned = scan_directory(directory, threshold=threshold, prune=True)
+        brute_force = scan_directory(directory, threshold=threshold, prune=False)
+        assert pruned == brute_force
+
+
+def test_pruned_pairs_stream_in_bounded_memory(tmp_path):
+    # Copies of a few functions: nearly every file pair is a candidate
+    sources, _ = generate_sources(files=150, functions_per_file=2, clone_rate=1.0, mutation_rate=0.3)
+    write_corpus(str(tmp_path), sources)
+    reports = _analyze_directory(str(tmp_path))
+
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in _iter_candidate_file_pairs(reports, 70.0))
+        streamed = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        pairs = list(_iter_candidate_file_pairs(reports, 70.0))
+        materialized = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert count == len(pairs) > 10000
+    assert streamed < materialized / 3
+
+
+def test_incremental_scan_matches_full_scan(tmp_path, project):
+    directory = str(project)
+    source_a, source_b = (project / "pkg0" / "a.py").read_text(), (project / "pkg0" / "b.py").read_text()
+    state = ScanState()
+
+    first = scan_directory(directory, threshold=60.0, state=state)
+    assert first == scan_directory(directory, threshold=60.0)
+    assert len(state.changed) == 8
+
+    (project / "pkg1" / "b.py").write_text(source_a + "\ndef extra(v):\n    return v\n")
+    (project / "pkg2" / "a.py").unlink()
+    (project / "pkg3" / "c.py").write_text(source_b)
+
+    state.save(str(tmp_path / "state.bin"))
+    state = ScanState.load(str(tmp_path / "state.bin"))
+    second = scan_directory(directory, threshold=60.0, state=state)
+    assert second == scan_directory(directory, threshold=60.0)
+    assert state.changed == {
+        str(project / "pkg1" / "b.py"),
+        str(project / "pkg3" / "c.py"),
+    }
+
+
+def test_project_index_matches_find_matches_for_file(project):
+    directory = str(project)
+    target = str(project / "pkg0" / "a.py")
+    source_a, source_b = (project / "pkg0" / "a.py").read_text(), (project / "pkg0" / "b.py").read_text()
+    index = ProjectIndex(directory, max_age=None)
+
+    assert index.find_matches(target, 40.0) == find_matches_for_file(target, directory, 40.0)
+
+    (project / "pkg0" / "a.py").write_text(source_b + "\ndef extra(v):\n    return v\n")
+    (project / "pkg3" / "b.py").unlink()
+    index.update_paths([target, str(project / "pkg3" / "b.py")])
+
+    assert index.find_matches(target, 40.0) == find_matches_for_file(target, directory, 40.0)
+    assert index.status()["files"] == 7
+
+    # A new file listed before others keeps its place; a path gone before it is read is dropped
+    (project / "pkg0" / "c.py").write_text(source_a)
+    index.update_paths([str(project / "pkg0" / "c.py"), str(project / "pkg9" / "gone.py")])
+    assert index.find_matches(target, 40.0) == find_matches_for_file(target, directory, 40.0)
+    assert index.status()["files"] == 8
+
+
+def test_iter_scan_directory_streams_scan_results(project):
+    directory = str(project)
+
+    for prune in (True, False):
+        streamed = iter_scan_directory(directory, threshold=60.0, prune=prune)
+        assert list(streamed) == scan_directory(directory, threshold=60.0)["results"]
+
+
+def test_compact_scan_references_full_results(project):
+    directory = str(project)
+
+    full = scan_directory(directory, threshold=60.0)
+    compact = scan_directory(directory, threshold=60.0, compact=True, function_threshold=0.0)
+    functions = compact["functions"]
+
+    assert compact["count"] == full["count"]
+    for full_entry, compact_entry in zip(full["results"], compact["results"]):
+        assert compact_entry["similarity"] == full_entry["similarity"]
+        assert [
+            (functions[c["func1"]]["name"], functions[c["func2"]]["name"], c["similarity"])
+            for c in compact_entry["comparisons"]
+        ] == [
+            (c["func1_name"], c["func2_name"], c["similarity"])
+            for c in full_entry["comparisons"]
+        ]
+
+
+def test_scan_progress_counts_and_cancellation(project):
+    directory = str(project)
+
+    progress = ScanProgress()
+    results = list(iter_scan_directory(directory, threshold=60.0, progress=progress))
+    assert progress.phase == "done"
+    assert progress.files_parsed == progress.files_total == 8
+    assert progress.pairs_scored == progress.pairs_total
+    assert progress.pairs_reported == len(results)
+
+    progress = ScanProgress()
+    progress.cancel()
+    with pytest.raises(ScanCancelled):
+        list(iter_scan_directory(directory, threshold=60.0, progress=progress))
+
+
+def test_exact_duplicates_and_skip_identical(project):
+    directory = str(project)
+
+    groups = find_exact_duplicates(directory)
+    assert sorted(len(group["files"]) for group in groups["files"]) == [4, 4]
+    assert sorted(len(group["functions"]) for group in groups["functions"]) == [4, 4, 8]
+
+    results = scan_directory(directory, threshold=60.0, skip_identical=True)
+    assert results["identical"] == groups["files"]
+    kept = {path for group in groups["files"] for path in group["files"][:1]}
+    for res in results["results"]:
+        assert {res["file1"], res["file2"]} <= kept
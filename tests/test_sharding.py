@@ -0,0 +1,71 @@
+import json
+import shutil
+
+import pytest
+
+from deepcsim.core.scanner import scan_directory
+from deepcsim.core.sharding import (
+    block_count,
+    file_block,
+    merge_shards,
+    parse_shard,
+    scan_shard,
+    shard_block_pairs,
+)
+
+
+def test_merged_shards_match_scan_directory(project):
+    directory = str(project)
+
+    for shard_count in (1, 2, 5):
+        for prune in (True, False):
+            shards = [
+                json.loads(json.dumps(scan_shard(directory, shard, shard_count, 60.0, prune=prune)))
+                for shard in range(1, shard_count + 1)
+            ]
+            assert merge_shards(shards[::-1]) == scan_directory(directory, 60.0)
+
+
+def test_merge_rejects_incomplete_shards(project):
+    directory = str(project)
+    shards = [scan_shard(directory, shard, 3, 60.0) for shard in (1, 2)]
+
+    with pytest.raises(ValueError, match="Missing shards: 3/3"):
+        merge_shards(shards)
+    with pytest.raises(ValueError, match="given twice"):
+        merge_shards(shards + shards[:1])
+    assert parse_shard("3/16") == (3, 16)
+    with pytest.raises(ValueError):
+        parse_shard("0/4")
+
+
+def test_shards_from_different_checkouts_merge_onto_one_directory(tmp_path, project):
+    directory = str(project)
+    elsewhere = shutil.copytree(directory, str(tmp_path / "elsewhere"))
+    shards = [scan_shard(directory, 1, 2, 60.0), scan_shard(elsewhere, 2, 2, 60.0)]
+
+    assert all(not entry["file1"].startswith(str(tmp_path))
+               for shard in shards for entry in shard["results"])
+    assert merge_shards(shards) == scan_directory(directory, 60.0)
+    assert merge_shards(shards, elsewhere) == scan_directory(elsewhere, 60.0)
+
+
+def test_shards_get_balanced_file_pairs():
+    paths = [f"/src/pkg{i % 7}/module_{i}.py" for i in range(1000)]
+    for shard_count in (2, 5, 16):
+        blocks = block_count(shard_count)
+        block_sizes = [0] * blocks
+        for path in paths:
+            block_sizes[file_block("/src", path, blocks)] += 1
+
+        loads = []
+        covered = set()
+        for shard in range(1, shard_count + 1):
+            block_pairs = shard_block_pairs(shard, shard_count, block_sizes)
+            assert not covered & block_pairs
+            covered |= block_pairs
+            loads.append(sum(block_sizes[a] * (block_sizes[a] - 1) // 2 if a == b
+                             else block_sizes[a] * block_sizes[b] for a, b in block_pairs))
+        assert len(covered) == blocks * (blocks + 1) // 2
+        assert sum(loads) == len(paths) * (len(paths) - 1) // 2
+        assert max(loads) < 1.25 * min(loads)
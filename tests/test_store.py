@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from deepcsim.core.batch import MetricsMatrix
+from deepcsim.core.scanner import _analyze_directory, scan_directory, scan_store, write_directory_store
+from deepcsim.core.store import MetricsStore
+
+
+def test_store_round_trips_metrics_and_scores(tmp_path, project):
+    directory = str(project)
+    store = write_directory_store(directory, str(tmp_path / "store"))
+    file_reports = _analyze_directory(directory)
+
+    assert store.paths == list(file_reports)
+    functions = []
+    for path, report in file_reports.items():
+        assert store.file_functions(path) == report["functions"]
+        functions.extend(report["functions"].values())
+
+    indices = range(len(functions))
+    assert MetricsMatrix.from_store(store).score_block(indices, indices) == \
+        MetricsMatrix(functions).score_block(indices, indices)
+
+
+def test_scan_store_matches_scan_directory(tmp_path, project):
+    directory = str(project)
+    write_directory_store(directory, str(tmp_path / "store"))
+    store = MetricsStore(str(tmp_path / "store"))
+
+    for threshold in (40.0, 95.0):
+        assert scan_store(store, threshold) == scan_directory(directory, threshold)
+    assert scan_store(store, 60.0, compact=True) == scan_directory(directory, 60.0, compact=True)
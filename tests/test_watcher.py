@@ -0,0 +1,62 @@
+import time
+
+from deepcsim.core.watcher import IndexWatcher, create_watcher
+
+
+def test_watchers_report_changed_python_files(tmp_path):
+    (tmp_path / "a.py").write_text("def f():\n    return 1\n")
+    (tmp_path / "b.py").write_text("def g():\n    return 2\n")
+
+    for polling in (True, False):
+        watcher = create_watcher(str(tmp_path), polling=polling)
+
+        (tmp_path / "a.py").write_text("def f():\n    return 10\n")
+        (tmp_path / "c.py").write_text("def h():\n    return 3\n")
+        (tmp_path / "notes.txt").write_text("ignored")
+        changed = watcher.poll(0.1)
+        watcher.close()
+
+        assert changed == {str(tmp_path / "a.py"), str(tmp_path / "c.py")}
+        (tmp_path / "c.py").unlink()
+
+
+class _FailingIndex:
+    """Index stub whose first update fails."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.updates = []
+
+    def indexed_paths(self):
+        return []
+
+    def update_paths(self, paths):
+        self.updates.append(paths)
+        if len(self.updates) == 1:
+            raise OSError("disk error")
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_index_watcher_survives_failed_updates(tmp_path):
+    index = _FailingIndex(str(tmp_path))
+    watcher = IndexWatcher(index, polling=True, interval=0.05).start()
+    try:
+        (tmp_path / "a.py").write_text("def f():\n    return 1\n")
+        assert _wait_for(lambda: watcher.errors == 1)
+        assert watcher.status()["last_error"] == "OSError: disk error"
+
+        # The file of the failed update is retried without a new event
+        assert _wait_for(lambda: len(index.updates) >= 2)
+        assert index.updates[1] == [str(tmp_path / "a.py")]
+
+        (tmp_path / "b.py").write_text("def g():\n    return 2\n")
+        assert _wait_for(lambda: [str(tmp_path / "b.py")] in index.updates)
+        assert watcher.status()["running"] and watcher.status()["errors"] == 1
+    finally:
+        watcher.stop()